@@ -0,0 +1,7 @@
+"""
+Motore di pianificazione nutrizionale (senza dipendenze da Streamlit).
+
+Il modulo principale è ``nutrition.engine``: espone le funzioni di calcolo
+e ``plan_day(profile, training)``, importabili da worker, script e test
+senza avviare l'interfaccia.
+"""
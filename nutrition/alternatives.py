@@ -0,0 +1,376 @@
+"""
+Pasti alternativi: le k combinazioni di alimenti della tabella che si
+avvicinano di più ai target di CHO, PRO e FAT di un pasto.
+
+    alternative_meals("Pranzo", 90, 40, 20, k=10)
+    # [MealOption(portions={...}, macros=(...), error_kcal=..., score=...), ...]
+
+Vincoli:
+
+- solo alimenti delle categorie ammesse per il tipo di pasto
+  (``rules.MEAL_CATEGORIES``), al massimo ``max_per_category`` per categoria;
+- da ``min_items`` a ``max_items`` alimenti;
+- porzioni entro i limiti delle regole (``rules.PORTION_BOUNDS``), con un
+  minimo di metà della porzione base: niente alimenti a 0 g.
+
+Le porzioni di ogni combinazione vengono dal solver dell'app
+(``solver.solve_portions``). Punteggio, più basso è meglio: errore dei
+macro in kcal, sqrt(sum_m w_m (macro_m - target_m)^2) con i pesi del
+solver, più ``item_penalty`` kcal per alimento (a parità di errore vince il
+pasto più semplice).
+
+Ricerca: branch and bound per livelli (pasti da 1, 2, ... alimenti). Le
+combinazioni hanno indici crescenti, quindi nessun doppione. Ogni nodo
+memorizza le somme parziali dei macro alle porzioni minime e massime: il
+figlio le ottiene con una somma, senza ricalcolare il nodo. Limite
+inferiore dell'errore per un nodo e tutte le sue estensioni:
+
+- i macro non scendono sotto la somma alle porzioni minime;
+- non superano la somma alle massime più i migliori contributi ancora
+  possibili con gli alimenti successivi (tabella per suffisso, precalcolata
+  una volta per tabella e tipo di pasto).
+
+I nodi il cui limite (più la penalità degli alimenti) non batte il k-esimo
+punteggio trovato vengono scartati con tutti i discendenti. A ogni livello
+i candidati si risolvono in blocchi dal limite più basso, una chiamata
+vettoriale al solver per blocco; i risultati per target uguali restano in
+cache.
+
+Da riga di comando:
+
+    python -m nutrition.alternatives "Pranzo" 90 40 20 -k 10
+"""
+
+import argparse
+import heapq
+import sys
+import time
+from dataclasses import dataclass, replace
+from functools import lru_cache
+
+import numpy as np
+
+from .fooddb import get_food_table
+from .profiling import span
+from .rules import FOOD_CATEGORIES, MEAL_CATEGORIES, classify_meal_name, compile_rules
+from .solver import MACRO_WEIGHTS, meal_macros, solve_portions
+
+DEFAULT_K = 10
+DEFAULT_MIN_ITEMS = 2
+DEFAULT_MAX_ITEMS = 4
+# Limite al numero di alimenti per pasto (dimensione della tabella per suffisso)
+MAX_ITEMS_LIMIT = 6
+# kcal di punteggio per ogni alimento del pasto
+ITEM_PENALTY = 5.0
+# Porzione minima come frazione della porzione base
+MIN_PORTION_FACTOR = 0.5
+
+# Pasti risolti per chiamata al solver; figli generati per blocco (il primo
+# blocco è piccolo, poi raddoppia fino al massimo)
+SOLVE_BLOCK = 512
+FIRST_EXPAND_BLOCK = 4096
+EXPAND_BLOCK = 131072
+
+
+@dataclass(frozen=True)
+class MealOption:
+    """Un pasto alternativo: porzioni in grammi, macro ottenuti, errore e punteggio."""
+    portions: dict
+    macros: tuple
+    error_kcal: float
+    score: float
+
+
+@dataclass(frozen=True)
+class _Candidates:
+    """Alimenti ammessi per un tipo di pasto, con limiti e tabella per suffisso."""
+    foods: tuple
+    composition: np.ndarray  # (n, 3) macro per grammo
+    base: np.ndarray
+    lower: np.ndarray
+    upper: np.ndarray
+    category: np.ndarray  # codice di categoria, -1 = senza categoria (nessun limite)
+    n_categories: int
+    low: np.ndarray  # (n, 3) macro alla porzione minima
+    high: np.ndarray  # (n, 3) macro alla porzione massima
+    reach: np.ndarray  # (n + 1, MAX_ITEMS_LIMIT + 1, 3), vedi _suffix_reach
+
+
+def _suffix_reach(high, max_items):
+    """
+    reach[i, r, m]: massimo del macro m con al più r alimenti scelti tra
+    quelli di indice >= i (somma degli r valori più alti, macro per macro).
+    """
+    n = len(high)
+    reach = np.zeros((n + 1, max_items + 1, 3))
+    best = np.zeros((max_items, 3))  # migliori valori del suffisso, decrescenti
+    for i in range(n - 1, -1, -1):
+        best = -np.sort(-np.vstack([best, high[i]]), axis=0)[:max_items]
+        reach[i, 1:] = np.cumsum(best, axis=0)
+    return reach
+
+
+@lru_cache(maxsize=32)
+def _candidates(table, meal_type, include_uncategorized):
+    rules = compile_rules(table)
+    allowed = MEAL_CATEGORIES.get(meal_type, ())
+    code_of = {category: code for code, category in enumerate(allowed)}
+    ids, codes = [], []
+    for food_id, food in enumerate(table.names):
+        category = FOOD_CATEGORIES.get(food)
+        if category in code_of:
+            ids.append(food_id)
+            codes.append(code_of[category])
+        elif category is None and include_uncategorized:
+            ids.append(food_id)
+            codes.append(-1)
+
+    specs = np.array([rules.portion(meal_type, food_id) for food_id in ids], dtype=np.float64).reshape(-1, 3)
+    base, lower, upper = specs.T
+    lower = np.minimum(np.maximum(lower, base * MIN_PORTION_FACTOR), upper)
+    composition = np.asarray(table.macros, dtype=np.float64)[ids].reshape(-1, 3) / 100.0
+    low = composition * lower[:, None]
+    high = composition * upper[:, None]
+    return _Candidates(
+        foods=tuple(table.names[food_id] for food_id in ids),
+        composition=composition,
+        base=base,
+        lower=lower,
+        upper=upper,
+        category=np.array(codes, dtype=np.int64),
+        n_categories=max(len(allowed), 1),
+        low=low,
+        high=high,
+        reach=_suffix_reach(high, MAX_ITEMS_LIMIT),
+    )
+
+
+def _bound(cand, low, high, last, remaining, targets):
+    """Errore minimo (kcal) raggiungibile dai nodi aggiungendo al più ``remaining`` alimenti."""
+    reach = high + cand.reach[last + 1, remaining]
+    over = np.maximum(low - targets, 0.0)
+    under = np.maximum(targets - reach, 0.0)
+    return np.sqrt((MACRO_WEIGHTS * (over ** 2 + under ** 2)).sum(axis=1))
+
+
+def _score_bound(cand, low, high, last, size, extra, targets, item_penalty, threshold):
+    """
+    Punteggio minimo dei pasti ottenuti dai nodi aggiungendo r alimenti, r in
+    ``extra``; le r con la sola penalità già oltre ``threshold`` non si calcolano.
+    """
+    bounds = [
+        _bound(cand, low, high, last, r, targets) + item_penalty * (size + r)
+        for r in extra if item_penalty * (size + r) < threshold
+    ]
+    return np.min(bounds, axis=0) if bounds else np.full(len(low), np.inf)
+
+
+class _TopK:
+    """I k migliori pasti trovati (max-heap sul punteggio) e la soglia di taglio."""
+
+    def __init__(self, cand, targets, k, item_penalty):
+        self.cand = cand
+        self.targets = targets
+        self.k = k
+        self.item_penalty = item_penalty
+        self.heap = []
+        self.seq = 0
+
+    @property
+    def threshold(self):
+        return -self.heap[0][0] if len(self.heap) >= self.k else np.inf
+
+    def evaluate(self, sets, low, high):
+        """Risolve i pasti ``sets`` (stessa dimensione) dal limite più basso, in blocchi."""
+        cand, targets = self.cand, self.targets
+        size = sets.shape[1]
+        penalty = self.item_penalty * size
+        lb = _bound(cand, low, high, sets[:, -1], 0, targets) + penalty
+        order = np.flatnonzero(lb < self.threshold)
+        order = order[np.argsort(lb[order], kind="stable")]
+        for start in range(0, len(order), SOLVE_BLOCK):
+            block = order[start:start + SOLVE_BLOCK]
+            block = block[lb[block] < self.threshold]
+            if not len(block):
+                break
+            idx = sets[block]
+            composition = cand.composition[idx]
+            grams = solve_portions(
+                composition, cand.base[idx], cand.lower[idx], cand.upper[idx],
+                np.tile(targets, (len(idx), 1)),
+            )
+            macros = meal_macros(composition, grams)
+            errors = np.sqrt((MACRO_WEIGHTS * (macros - targets) ** 2).sum(axis=1))
+            scores = errors + penalty
+            for i in np.argsort(scores, kind="stable"):
+                if scores[i] >= self.threshold:
+                    break
+                entry = (-scores[i], -self.seq, errors[i], idx[i], grams[i], macros[i])
+                self.seq += 1
+                if len(self.heap) < self.k:
+                    heapq.heappush(self.heap, entry)
+                else:
+                    heapq.heapreplace(self.heap, entry)
+
+    def results(self):
+        """[(punteggio, errore, indici, grammi, macro)] dal migliore."""
+        return [
+            (-neg_score, error, idx, grams, macros)
+            for neg_score, _, error, idx, grams, macros in sorted(self.heap, reverse=True)
+        ]
+
+
+def _search(cand, targets, k, min_items, max_items, max_per_category, item_penalty):
+    """Branch and bound per livelli; ritorna i risultati di ``_TopK``."""
+    n = len(cand.foods)
+    if n == 0 or k <= 0:
+        return []
+    top = _TopK(cand, targets, k, item_penalty)
+
+    # Livello 1: ogni alimento da solo
+    sets = np.arange(n)[:, None]
+    low = cand.low.copy()
+    high = cand.high.copy()
+    counts = np.zeros((n, cand.n_categories), dtype=np.int16)
+    categorized = cand.category >= 0
+    counts[np.flatnonzero(categorized), cand.category[categorized]] = 1
+    if min_items == 1:
+        top.evaluate(sets, low, high)
+
+    for size in range(1, max_items):
+        # Espansione dei nodi dal limite più basso: i figli di ogni blocco
+        # vengono risolti subito, così la soglia si stringe prima dei blocchi
+        # successivi e dei livelli più profondi.
+        last = sets[:, -1]
+        remaining = max_items - size
+        lb = _score_bound(cand, low, high, last, size, range(1, remaining + 1), targets, item_penalty, top.threshold)
+        parents = np.flatnonzero((lb < top.threshold) & (last < n - 1))
+        parents = parents[np.argsort(lb[parents], kind="stable")]
+        # Blocchi di figli crescenti: i primi, piccoli, fissano presto la soglia
+        ends = np.cumsum(n - 1 - last[parents])
+        parts = []
+        start, block = 0, FIRST_EXPAND_BLOCK
+        while start < len(parents):
+            stop = max(int(np.searchsorted(ends, (ends[start - 1] if start else 0) + block)), start + 1)
+            chunk = parents[start:stop]
+            start, block = stop, min(block * 2, EXPAND_BLOCK)
+            chunk = chunk[lb[chunk] < top.threshold]
+            if not len(chunk):
+                break
+            widths = n - 1 - last[chunk]
+            parent = np.repeat(chunk, widths)
+            offsets = np.arange(len(parent)) - np.repeat(np.cumsum(widths) - widths, widths)
+            food = last[parent] + 1 + offsets
+            category = cand.category[food]
+            ok = (category < 0) | (counts[parent, np.maximum(category, 0)] < max_per_category)
+            parent, food, category = parent[ok], food[ok], category[ok]
+            child_low = low[parent] + cand.low[food]
+            child_high = high[parent] + cand.high[food]
+            child_lb = _score_bound(
+                cand, child_low, child_high, food, size + 1, range(remaining), targets, item_penalty, top.threshold,
+            )
+            ok = child_lb < top.threshold
+            parent, food, category = parent[ok], food[ok], category[ok]
+            if not len(parent):
+                continue
+            child_sets = np.hstack([sets[parent], food[:, None]])
+            child_low, child_high = child_low[ok], child_high[ok]
+            child_counts = counts[parent]
+            rows = np.flatnonzero(category >= 0)
+            child_counts[rows, category[rows]] += 1
+            if size + 1 >= min_items:
+                top.evaluate(child_sets, child_low, child_high)
+            parts.append((child_sets, child_low, child_high, child_counts))
+        if not parts:
+            break
+        sets, low, high, counts = (np.concatenate(column) for column in zip(*parts))
+
+    return top.results()
+
+
+@lru_cache(maxsize=256)
+def _cached_options(table, meal_type, targets, k, min_items, max_items,
+                    max_per_category, item_penalty, include_uncategorized):
+    cand = _candidates(table, meal_type, include_uncategorized)
+    found = _search(
+        cand, np.array(targets), k, min_items, max_items, max_per_category, item_penalty,
+    )
+    return tuple(
+        MealOption(
+            portions={cand.foods[i]: g for i, g in zip(idx.tolist(), grams.tolist())},
+            macros=tuple(macros.tolist()),
+            error_kcal=float(error),
+            score=float(score),
+        )
+        for score, error, idx, grams, macros in found
+    )
+
+
+def search_meals(meal_type, cho, pro, fat, k=DEFAULT_K, min_items=DEFAULT_MIN_ITEMS,
+                 max_items=DEFAULT_MAX_ITEMS, max_per_category=1, item_penalty=ITEM_PENALTY,
+                 include_uncategorized=False):
+    """
+    Le ``k`` migliori combinazioni per un tipo di pasto (``rules.MEAL_CATEGORIES``),
+    in ordine di punteggio. ``include_uncategorized`` ammette anche gli
+    alimenti senza categoria (es. database esterno), senza limite per categoria.
+    """
+    if not 1 <= min_items <= max_items <= MAX_ITEMS_LIMIT:
+        raise ValueError(f"serve 1 <= min_items <= max_items <= {MAX_ITEMS_LIMIT}")
+    # Target arrotondati a 0.1 g: chiavi stabili per la cache
+    targets = (round(float(cho), 1), round(float(pro), 1), round(float(fat), 1))
+    with span("alternative_meals", meal_type=meal_type, k=k):
+        options = _cached_options(
+            get_food_table(), meal_type, targets, int(k), int(min_items), int(max_items),
+            int(max_per_category), float(item_penalty), bool(include_uncategorized),
+        )
+    # Porzioni copiate: le opzioni in cache non escono mai, il chiamante può modificarle
+    return [replace(option, portions=dict(option.portions)) for option in options]
+
+
+def alternative_meals(meal_name, cho, pro, fat, k=DEFAULT_K, **constraints):
+    """Come ``search_meals``, con il tipo di pasto ricavato dal nome (es. "Pranzo")."""
+    return search_meals(classify_meal_name(meal_name), cho, pro, fat, k=k, **constraints)
+
+
+# =========================
+#  RIGA DI COMANDO
+# =========================
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m nutrition.alternatives", description="Pasti alternativi")
+    parser.add_argument("meal", help='nome del pasto, es. "Pranzo"')
+    parser.add_argument("cho", type=float)
+    parser.add_argument("pro", type=float)
+    parser.add_argument("fat", type=float)
+    parser.add_argument("-k", type=int, default=DEFAULT_K, help="numero di alternative")
+    parser.add_argument("--min-items", type=int, default=DEFAULT_MIN_ITEMS)
+    parser.add_argument("--max-items", type=int, default=DEFAULT_MAX_ITEMS)
+    parser.add_argument("--max-per-category", type=int, default=1)
+    parser.add_argument("--item-penalty", type=float, default=ITEM_PENALTY)
+    parser.add_argument("--uncategorized", action="store_true", help="ammetti alimenti senza categoria")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    try:
+        options = alternative_meals(
+            args.meal, args.cho, args.pro, args.fat, k=args.k,
+            min_items=args.min_items, max_items=args.max_items,
+            max_per_category=args.max_per_category, item_penalty=args.item_penalty,
+            include_uncategorized=args.uncategorized,
+        )
+    except ValueError as exc:
+        print(exc, file=sys.stderr)
+        return 1
+    elapsed = (time.perf_counter() - start) * 1e3
+
+    for rank, option in enumerate(options, 1):
+        foods = ", ".join(f"{food} {grams:.0f} g" for food, grams in option.portions.items())
+        cho, pro, fat = option.macros
+        print(f"{rank:2d}. {foods}")
+        print(f"    CHO {cho:.0f} g, PRO {pro:.0f} g, FAT {fat:.0f} g, errore {option.error_kcal:.1f} kcal")
+    print(f"{len(options)} alternative in {elapsed:.1f} ms", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
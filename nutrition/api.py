@@ -0,0 +1,403 @@
+"""
+API HTTP/JSON asyncio per i client mobili, solo libreria standard.
+
+    python -m nutrition.api --host 127.0.0.1 --port 8080 [--workers N]
+
+Endpoint:
+
+    GET  /health               {"status": "ok"}
+    POST /v1/day-plan          un record (vedi ``nutrition.schema``) → piano del giorno
+    POST /v1/day-plans         {"records": [...]} → {"results": [...]}, stesso ordine;
+                               i record non validi diventano {"id"?, "error": "..."}
+    POST /v1/meal-suggestion   {"meal_name", "cho", "pro", "fat", "training_time"?}
+                               → {"portions": {...}, "macros": [cho, pro, fat]}
+    POST /v1/hydration         campi di Training → acqua/sodio (null senza seduta)
+
+Errori: ``{"error": "..."}`` con status 400, 404, 405, 411, 413 o 431;
+500 (registrato nel log ``nutrition.api``) per errori interni del calcolo.
+
+Il calcolo non gira mai sull'event loop: va in un executor (pool di processi
+di default). Le richieste singole concorrenti di piani e pasti sono raccolte
+per al massimo ``BATCH_DELAY`` secondi (o ``MAX_BATCH`` voci) e calcolate
+insieme con un solo solve; il bulk è diviso in blocchi distribuiti sul pool.
+Sull'event loop restano solo parsing HTTP, validazione e concatenazione del
+JSON già serializzato dai worker. Connessioni HTTP/1.1 keep-alive (anche in
+pipeline), chiuse dopo ``IDLE_TIMEOUT`` secondi senza richieste.
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+from contextlib import suppress
+from http import HTTPStatus
+
+from .engine import plan_hydration, suggest_meals
+from .schema import (
+    dumps,
+    hydration_to_dict,
+    inputs_from_record,
+    meal_request_from_dict,
+    plan_records,
+    training_from_dict,
+)
+
+MAX_BATCH = 256
+BATCH_DELAY = 0.002
+BULK_CHUNK = 256
+MAX_BULK_RECORDS = 20_000
+MAX_BODY_BYTES = 16 * 1024 * 1024
+MAX_HEADER_BYTES = 64 * 1024
+IDLE_TIMEOUT = 75.0
+BACKLOG = 4096
+
+_log = logging.getLogger(__name__)
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+# =========================
+#  LAVORO NEI WORKER
+# =========================
+# Funzioni di modulo (serializzabili con pickle per il pool di processi).
+
+def _plan_texts(records):
+    """
+    (ok, testo JSON) per record: il piano, oppure {"id"?, "error"} per i
+    record non validi. Se il blocco fallisce, i record si ricalcolano uno per
+    uno: l'eccezione resta solo al record che la causa.
+    """
+    try:
+        results = plan_records(records)
+    except Exception:
+        if len(records) == 1:
+            raise
+        return [_plan_text_or_error(record) for record in records]
+    texts = []
+    for record, result in zip(records, results):
+        if isinstance(result, ValueError):
+            error = {"error": str(result)}
+            if isinstance(record, dict) and record.get("id") is not None:
+                error = {"id": record["id"], **error}
+            texts.append((False, dumps(error)))
+        else:
+            texts.append((True, result))
+    return texts
+
+
+def _plan_text_or_error(record):
+    try:
+        return _plan_texts([record])[0]
+    except Exception as exc:
+        return exc
+
+
+def _meal_texts(requests):
+    return [
+        dumps({"portions": portions, "macros": list(macros)})
+        for portions, macros in suggest_meals(requests)
+    ]
+
+
+def _warm_up():
+    # Carica tabella alimenti e regole nel worker prima della prima richiesta
+    _meal_texts([("Pranzo", 50.0, 30.0, 10.0, "Sera")])
+    return os.getpid()
+
+
+class _Batcher:
+    """
+    Raccoglie le richieste concorrenti e le calcola insieme nell'executor:
+    ``fn(items)`` ritorna un risultato per item, nello stesso ordine; un
+    risultato che è un'eccezione va solo alla richiesta del suo item.
+    """
+
+    def __init__(self, fn, executor, max_batch=MAX_BATCH, delay=BATCH_DELAY):
+        self.fn = fn
+        self.executor = executor
+        self.max_batch = max_batch
+        self.delay = delay
+        self._items = []
+        self._futures = []
+        self._timer = None
+
+    def submit(self, item):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._items.append(item)
+        self._futures.append(future)
+        if len(self._items) >= self.max_batch:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.delay, self._flush)
+        return future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        items, futures = self._items, self._futures
+        self._items, self._futures = [], []
+        if items:
+            task = asyncio.get_running_loop().run_in_executor(self.executor, self.fn, items)
+            task.add_done_callback(lambda done: self._resolve(done, futures))
+
+    @staticmethod
+    def _resolve(task, futures):
+        error = task.exception() if not task.cancelled() else asyncio.CancelledError()
+        results = task.result() if error is None else [None] * len(futures)
+        for future, result in zip(futures, results):
+            if future.done():  # client disconnesso
+                continue
+            if error is None and not isinstance(result, BaseException):
+                future.set_result(result)
+            else:
+                future.set_exception(error if error is not None else result)
+
+
+# =========================
+#  SERVIZIO
+# =========================
+
+class PlanningAPI:
+    """
+    Server HTTP dell'API. ``executor`` di default: pool di ``workers``
+    processi (numero di CPU); per test in-process si può passare un
+    ThreadPoolExecutor, con ``workers`` = i suoi worker da preriscaldare
+    (default 1).
+    """
+
+    def __init__(self, executor=None, workers=None):
+        self._own_executor = executor is None
+        if executor is None:
+            # Importato qui: multiprocessing non serve a chi passa il proprio executor
+            from concurrent.futures import ProcessPoolExecutor
+
+            workers = workers or os.cpu_count() or 1
+            executor = ProcessPoolExecutor(max_workers=workers)
+        self.workers = workers or 1
+        self.executor = executor
+        self._plans = _Batcher(_plan_texts, self.executor)
+        self._meals = _Batcher(_meal_texts, self.executor)
+        self._server = None
+        self._connections = {}  # task -> writer, per chiudere le connessioni aperte
+        self._routes = {
+            "/health": ("GET", self._health),
+            "/v1/day-plan": ("POST", self._day_plan),
+            "/v1/day-plans": ("POST", self._day_plans),
+            "/v1/meal-suggestion": ("POST", self._meal_suggestion),
+            "/v1/hydration": ("POST", self._hydration),
+        }
+
+    async def start(self, host="127.0.0.1", port=8080):
+        """Avvia il server; ritorna l'``asyncio.Server`` (porta 0 = porta libera)."""
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*(
+            loop.run_in_executor(self.executor, _warm_up)
+            for _ in range(self.workers)
+        ))
+        self._server = await asyncio.start_server(
+            self._connection, host, port, backlog=BACKLOG, limit=MAX_HEADER_BYTES,
+        )
+        return self._server
+
+    @property
+    def port(self):
+        return self._server.sockets[0].getsockname()[1]
+
+    async def close(self):
+        if self._server is not None:
+            self._server.close()
+            for writer in self._connections.values():
+                writer.close()
+            await asyncio.gather(*self._connections, return_exceptions=True)
+            await self._server.wait_closed()
+        if self._own_executor:
+            self.executor.shutdown(wait=True)
+
+    # ---------- endpoint ----------
+
+    async def _health(self, body):
+        return '{"status":"ok"}'
+
+    async def _day_plan(self, body):
+        data = _json(body)
+        # Validato prima del batch: un record non valido non entra nel solve degli altri
+        try:
+            inputs_from_record(data)
+        except ValueError as exc:
+            raise HTTPError(400, str(exc)) from None
+        ok, text = await self._plans.submit(data)
+        if not ok:
+            raise HTTPError(400, json.loads(text)["error"])
+        return text
+
+    async def _day_plans(self, body):
+        data = _json(body)
+        records = data.get("records") if isinstance(data, dict) else None
+        if not isinstance(records, list):
+            raise HTTPError(400, 'atteso {"records": [...]}')
+        if len(records) > MAX_BULK_RECORDS:
+            raise HTTPError(413, f"al massimo {MAX_BULK_RECORDS} record per richiesta")
+        loop = asyncio.get_running_loop()
+        chunks = await asyncio.gather(*(
+            loop.run_in_executor(self.executor, _plan_texts, records[i:i + BULK_CHUNK])
+            for i in range(0, len(records), BULK_CHUNK)
+        ))
+        return '{"results":[' + ",".join(text for chunk in chunks for _, text in chunk) + "]}"
+
+    async def _meal_suggestion(self, body):
+        try:
+            request = meal_request_from_dict(_json(body))
+        except ValueError as exc:
+            raise HTTPError(400, str(exc)) from None
+        return await self._meals.submit(request)
+
+    async def _hydration(self, body):
+        data = _json(body)
+        if isinstance(data, dict) and "training" in data and len(data) == 1:
+            data = data["training"]
+        if not isinstance(data, dict):
+            raise HTTPError(400, "atteso un oggetto JSON con i campi dell'allenamento")
+        try:
+            training = training_from_dict(data)
+        except ValueError as exc:
+            raise HTTPError(400, str(exc)) from None
+        return dumps(hydration_to_dict(plan_hydration(training)))
+
+    # ---------- HTTP ----------
+
+    async def _dispatch(self, method, target, body):
+        path = target.split("?", 1)[0]
+        route = self._routes.get(path)
+        if route is None:
+            raise HTTPError(404, f"percorso sconosciuto: {path}")
+        expected, handler = route
+        if method != expected:
+            raise HTTPError(405, f"metodo {method} non ammesso, usare {expected}")
+        return await handler(body)
+
+    async def _connection(self, reader, writer):
+        task = asyncio.current_task()
+        self._connections[task] = writer
+        try:
+            while True:
+                try:
+                    head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), IDLE_TIMEOUT)
+                except asyncio.LimitOverrunError:
+                    _write(writer, 431, _error("header troppo grandi"), keep_alive=False)
+                    break
+                except (asyncio.IncompleteReadError, asyncio.TimeoutError, ConnectionError):
+                    break
+
+                keep_alive = False
+                try:
+                    method, target, keep_alive, length = _parse_head(head)
+                    body = await reader.readexactly(length) if length else b""
+                    status, payload = 200, await self._dispatch(method, target, body)
+                except HTTPError as exc:
+                    status, payload = exc.status, _error(str(exc))
+                    keep_alive = keep_alive and exc.status not in (411, 413)
+                except Exception:
+                    # Errore nel calcolo o nel worker: risposta 500, la connessione resta valida
+                    _log.exception("errore interno su %s", head.split(b"\r\n", 1)[0].decode("latin-1"))
+                    status, payload = 500, _error("errore interno")
+                _write(writer, status, payload, keep_alive)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            del self._connections[task]
+            writer.close()
+            with suppress(ConnectionError):
+                await writer.wait_closed()
+
+
+def _json(body):
+    try:
+        return json.loads(body)
+    except ValueError as exc:
+        raise HTTPError(400, f"JSON non valido: {exc}") from None
+    except RecursionError:
+        raise HTTPError(400, "JSON non valido: annidamento troppo profondo") from None
+
+
+def _error(message):
+    return dumps({"error": message})
+
+
+def _parse_head(head):
+    """(metodo, target, keep-alive, content-length) dalla testata della richiesta."""
+    request_line, *header_lines = head.decode("latin-1").split("\r\n")
+    parts = request_line.split(" ")
+    if len(parts) != 3 or not parts[2].startswith("HTTP/1."):
+        raise HTTPError(400, "richiesta HTTP non valida")
+    method, target, version = parts
+    headers = {}
+    for line in header_lines:
+        if line:
+            name, _, value = line.partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+    connection = headers.get("connection", "").lower()
+    if version == "HTTP/1.0":
+        keep_alive = connection == "keep-alive"
+    else:
+        keep_alive = connection != "close"
+    if "transfer-encoding" in headers:
+        raise HTTPError(411, "serve Content-Length (chunked non supportato)")
+    try:
+        length = int(headers.get("content-length", "0"))
+    except ValueError:
+        raise HTTPError(400, "Content-Length non valido") from None
+    if length < 0:
+        raise HTTPError(400, "Content-Length non valido")
+    if length > MAX_BODY_BYTES:
+        raise HTTPError(413, f"corpo oltre {MAX_BODY_BYTES} byte")
+    return method, target, keep_alive, length
+
+
+def _write(writer, status, payload, keep_alive):
+    body = payload.encode("utf-8")
+    head = (
+        f"HTTP/1.1 {status} {HTTPStatus(status).phrase}\r\n"
+        "Content-Type: application/json; charset=utf-8\r\n"
+        f"Content-Length: {len(body)}\r\n"
+        f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n"
+        "\r\n"
+    )
+    writer.write(head.encode("latin-1") + body)
+
+
+async def serve(host, port, workers=None):
+    api = PlanningAPI(workers=workers)
+    server = await api.start(host, port)
+    print(f"API in ascolto su http://{host}:{api.port}", file=sys.stderr)
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        await api.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m nutrition.api", description="API HTTP di pianificazione")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("-w", "--workers", type=int, default=None, help="processi worker (default: numero di CPU)")
+    args = parser.parse_args(argv)
+    with suppress(KeyboardInterrupt):
+        asyncio.run(serve(args.host, args.port, args.workers))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,124 @@
+"""
+Planner vettoriale (NumPy) per migliaia/milioni di giornate-atleta.
+
+Stessi numeri delle funzioni scalari di ``nutrition.engine``: le tabelle
+categoriali sono le stesse (``nutrition.tables``, lette senza copia), e la
+parte numerica ripete le stesse operazioni nello stesso ordine.
+
+Gli input categoriali possono essere sequenze di stringhe (opzioni dell'app)
+oppure array interi di codici già codificati con ``encode`` (percorso veloce:
+nessuna conversione di stringhe, solo gather e aritmetica).
+"""
+
+from typing import NamedTuple
+
+import numpy as np
+
+from . import tables as _t
+from .engine import calculate_bmr
+from .options import ACTIVITY_LEVELS, GOALS, IMPORTANCE_LEVELS, SEX_OPTIONS, TRAINING_TYPES
+
+# =========================
+#  TABELLE CATEGORIALI
+# =========================
+# Viste NumPy senza copia sulle tabelle precalcolate di nutrition.tables
+# (sola lettura). Ogni tabella ha una voce in più in coda (indice
+# len(opzioni)) per i valori non riconosciuti, come nelle funzioni scalari.
+
+# Offset della formula di Mifflin-St Jeor: BMR(0, 0, 0, sesso)
+BMR_SEX_OFFSET = np.array([calculate_bmr(0, 0, 0, sex) for sex in SEX_OPTIONS + (None,)], dtype=np.float64)
+BMR_SEX_OFFSET.setflags(write=False)
+ACTIVITY_FACTOR = np.frombuffer(_t.ACTIVITY_FACTOR, dtype=np.float64)
+TRAINING_MET = np.frombuffer(_t.TRAINING_MET, dtype=np.float64)
+GOAL_KCAL_DELTA = np.frombuffer(_t.GOAL_KCAL_DELTA, dtype=np.float64)
+PRO_G_PER_KG = np.frombuffer(_t.PRO_G_PER_KG, dtype=np.float64)
+FAT_G_PER_KG = np.frombuffer(_t.FAT_G_PER_KG, dtype=np.float64)
+# CHO g/kg indicizzati per [tipo allenamento, importanza, obiettivo]
+CHO_G_PER_KG = np.frombuffer(_t.CHO_G_PER_KG, dtype=np.float64).reshape(
+    _t.N_TRAINING_TYPES, _t.N_IMPORTANCE, _t.N_GOALS
+)
+
+
+# =========================
+#  CODIFICA INPUT
+# =========================
+
+_OPTION_INDEX = {
+    ACTIVITY_LEVELS: _t.ACTIVITY_INDEX,
+    GOALS: _t.GOAL_INDEX,
+    TRAINING_TYPES: _t.TRAINING_TYPE_INDEX,
+    IMPORTANCE_LEVELS: _t.IMPORTANCE_INDEX,
+}
+
+
+def encode(values, options):
+    """
+    Converte una sequenza di opzioni (stringhe) in codici interni int8.
+    I valori non presenti in ``options`` ricevono il codice ``len(options)``
+    (voce "sconosciuto" delle tabelle).
+    Se ``values`` è già un array intero viene solo validato.
+    """
+    arr = np.asarray(values)
+    if arr.dtype.kind in "iu":
+        if arr.size and (arr.min() < 0 or arr.max() > len(options)):
+            raise ValueError(f"codici fuori intervallo 0..{len(options)}")
+        return arr
+    uniques, inverse = np.unique(arr.astype(str), return_inverse=True)
+    index = _OPTION_INDEX.get(tuple(options)) or {opt: i for i, opt in enumerate(options)}
+    lookup = np.array([index.get(u, len(options)) for u in uniques], dtype=np.int8)
+    return lookup[inverse.reshape(arr.shape)]
+
+
+# =========================
+#  PIANO BATCH
+# =========================
+
+class BatchPlan(NamedTuple):
+    """Risultati colonnari, un elemento per giornata-atleta."""
+    bmr: np.ndarray
+    base_tdee: np.ndarray
+    training_kcal: np.ndarray
+    day_tdee: np.ndarray
+    target_kcal: np.ndarray
+    cho_g: np.ndarray
+    pro_g: np.ndarray
+    fat_g: np.ndarray
+
+
+def plan_batch(weight, height, age, sex, activity, goal, training_type, duration, importance):
+    """
+    Energia e macro per N giornate in un solo passaggio vettoriale.
+
+    weight (kg), height (cm), age (anni), duration (ore): array numerici.
+    sex, activity, goal, training_type, importance: stringhe delle opzioni
+    dell'app oppure codici da ``encode``.
+    Equivale a chiamare per ogni riga calculate_bmr → activity_factor →
+    training_energy_cost → goal_kcal_delta → choose_*_g_per_kg.
+    """
+    weight = np.asarray(weight, dtype=np.float64)
+    height = np.asarray(height, dtype=np.float64)
+    age = np.asarray(age, dtype=np.float64)
+    duration = np.asarray(duration, dtype=np.float64)
+
+    sex_c = encode(sex, SEX_OPTIONS)
+    act_c = encode(activity, ACTIVITY_LEVELS)
+    goal_c = encode(goal, GOALS)
+    type_c = encode(training_type, TRAINING_TYPES)
+    imp_c = encode(importance, IMPORTANCE_LEVELS)
+
+    bmr = 10 * weight + 6.25 * height - 5 * age + BMR_SEX_OFFSET[sex_c]
+    base_tdee = bmr * ACTIVITY_FACTOR[act_c]
+    training_kcal = TRAINING_MET[type_c] * weight * duration
+    day_tdee = base_tdee + training_kcal
+    target_kcal = day_tdee + GOAL_KCAL_DELTA[goal_c]
+
+    return BatchPlan(
+        bmr=bmr,
+        base_tdee=base_tdee,
+        training_kcal=training_kcal,
+        day_tdee=day_tdee,
+        target_kcal=target_kcal,
+        cho_g=CHO_G_PER_KG[type_c, imp_c, goal_c] * weight,
+        pro_g=PRO_G_PER_KG[goal_c] * weight,
+        fat_g=FAT_G_PER_KG[goal_c] * weight,
+    )
@@ -0,0 +1,392 @@
+"""
+Benchmark del motore e dell'app, con confronto tra due esecuzioni.
+
+    python -m nutrition.bench run -o bench.json [--quick] [--full] [--no-app] [-k filtro]
+    python -m nutrition.bench compare base.json bench.json [--threshold 0.10]
+    python -m nutrition.bench startup [--budget-ms 60] [-m nutrition.engine ...]
+
+Gruppi:
+
+- ``scalar``: funzioni di supporto da ``calculate_bmr`` a ``suggest_meal``,
+  ognuna su tutti i valori delle sue opzioni categoriali;
+- ``day``: ``plan_day`` (un giorno alla volta) e ``plan_days`` (in blocco) su
+  tutte le combinazioni di sesso, attività, obiettivo, tipo, importanza e
+  orario (temperatura e sudorazione, che toccano solo l'idratazione,
+  ruotano sulle combinazioni; ``--full`` usa il prodotto completo);
+- ``app``: esecuzione completa di ``smart_nutrition_app.py`` con ``AppTest``
+  di Streamlit (primo run e rerun dopo la modifica di un widget).
+
+I tempi sono per chiamata (per giorno nel gruppo ``day``): ogni misura è
+ripetuta ``repeats`` volte con un numero di cicli calibrato, e si salvano
+min, mediana, media e deviazione standard. ``compare`` segnala una
+regressione quando sia la mediana sia il minimo peggiorano oltre la soglia
+(il solo minimo o la sola mediana sono troppo sensibili al rumore); exit
+code 1 se ce n'è almeno una.
+
+``startup`` controlla l'avvio a freddo dei punti di ingresso di calcolo:
+ogni modulo di ``STARTUP_MODULES`` è importato in un processo nuovo con
+``python -X importtime`` e il suo tempo cumulativo (il minimo su
+``--repeats`` processi) deve stare nel budget; inoltre nessuno deve
+importare dipendenze pesanti (``HEAVY_MODULES``: Streamlit, NumPy, ...),
+che vanno caricate dalla funzione che le usa. Exit code 1 se un modulo
+sfora o importa una dipendenza pesante.
+"""
+
+import argparse
+import itertools
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+from . import engine
+from .options import (
+    ACTIVITY_LEVELS,
+    GOALS,
+    IMPORTANCE_LEVELS,
+    SEX_OPTIONS,
+    SWEAT_RATES,
+    TEMP_CONDITIONS,
+    TRAINING_TIMES,
+    TRAINING_TYPES,
+)
+
+APP_PATH = Path(__file__).resolve().parent.parent / "smart_nutrition_app.py"
+DEFAULT_THRESHOLD = 0.10
+WARMUP_CALLS = 3
+
+# Punti di ingresso senza interfaccia: motore, schema JSON, generazione offline
+STARTUP_MODULES = ("nutrition.engine", "nutrition.schema", "nutrition.cli")
+STARTUP_BUDGET_MS = 60.0
+STARTUP_REPEATS = 5
+# Pacchetti che nessun punto di ingresso deve importare all'avvio
+HEAVY_MODULES = ("streamlit", "numpy", "pandas", "pyarrow")
+
+
+# =========================
+#  MISURA
+# =========================
+
+def measure(fn, calls=1, min_time=0.2, repeats=5):
+    """
+    Tempi per chiamata di ``fn()`` (che esegue ``calls`` chiamate).
+    Il numero di cicli è calibrato perché ogni ripetizione duri ~``min_time``.
+    """
+    # Riscaldamento: cache, import pigri, allocatore di memoria a regime
+    for _ in range(WARMUP_CALLS):
+        fn()
+    loops = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(loops):
+            fn()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time or loops >= 1 << 20:
+            break
+        loops = max(loops * 2, int(loops * min_time / max(elapsed, 1e-9)))
+
+    samples = [elapsed]
+    for _ in range(repeats - 1):
+        start = time.perf_counter()
+        for _ in range(loops):
+            fn()
+        samples.append(time.perf_counter() - start)
+    per_call = [s / (loops * calls) for s in samples]
+    return {
+        "loops": loops,
+        "calls": calls,
+        "repeats": repeats,
+        "min": min(per_call),
+        "median": statistics.median(per_call),
+        "mean": statistics.fmean(per_call),
+        "stdev": statistics.stdev(per_call) if len(per_call) > 1 else 0.0,
+    }
+
+
+def _sweep(fn, args_list):
+    """Callable che chiama ``fn(*args)`` per ogni elemento di ``args_list``."""
+    args_list = [tuple(args) for args in args_list]
+
+    def run():
+        for args in args_list:
+            fn(*args)
+    return run, len(args_list)
+
+
+# =========================
+#  BENCHMARK
+# =========================
+
+def scalar_benchmarks():
+    """(nome, callable, chiamate per esecuzione) per le funzioni di supporto."""
+    meals = engine.meal_pattern("Sera")
+    portions = engine.base_portions_for("pranzo")
+    meal_names = [name for t in TRAINING_TIMES for name, _ in engine.meal_pattern(t)]
+    cases = {
+        "calculate_bmr": (engine.calculate_bmr, [(70.0, 175.0, 35, sex) for sex in SEX_OPTIONS]),
+        "activity_factor": (engine.activity_factor, [(a,) for a in ACTIVITY_LEVELS]),
+        "training_energy_cost": (engine.training_energy_cost, [(70.0, 1.5, t) for t in TRAINING_TYPES]),
+        "choose_cho_g_per_kg": (engine.choose_cho_g_per_kg,
+                                list(itertools.product(TRAINING_TYPES, IMPORTANCE_LEVELS, GOALS))),
+        "choose_protein_g_per_kg": (engine.choose_protein_g_per_kg, [(g,) for g in GOALS]),
+        "choose_fat_g_per_kg": (engine.choose_fat_g_per_kg, [(g,) for g in GOALS]),
+        "goal_kcal_delta": (engine.goal_kcal_delta, [(g,) for g in GOALS]),
+        "meal_pattern": (engine.meal_pattern, [(t,) for t in TRAINING_TIMES]),
+        "meal_times_suggestion": (engine.meal_times_suggestion, [(t,) for t in TRAINING_TIMES]),
+        "split_protein_fat_across_meals": (engine.split_protein_fat_across_meals, [(140.0, 56.0, meals)]),
+        "hydration_rate": (engine.hydration_rate, list(itertools.product(TEMP_CONDITIONS, SWEAT_RATES))),
+        "sodium_rate": (engine.sodium_rate, [(s,) for s in SWEAT_RATES]),
+        "classify_meal_type": (engine.classify_meal_type, [(name, "Sera") for name in meal_names]),
+        "base_portions_for": (engine.base_portions_for,
+                              [(engine.classify_meal_type(name, "Sera"),) for name in meal_names]),
+        "macros_for_portions": (engine.macros_for_portions, [(portions,)]),
+        "suggest_meal": (engine.suggest_meal, [(name, 80.0, 30.0, 15.0, "Sera") for name in meal_names]),
+    }
+    for name, (fn, args_list) in cases.items():
+        run, calls = _sweep(fn, args_list)
+        yield f"scalar/{name}", run, calls
+
+
+def day_combinations(full=False):
+    """Coppie (Profile, Training) su tutte le combinazioni categoriali."""
+    profiles = [
+        engine.Profile(sex=sex, activity_level=activity, goal=goal)
+        for sex, activity, goal in itertools.product(SEX_OPTIONS, ACTIVITY_LEVELS, GOALS)
+    ]
+    sessions = list(itertools.product(TRAINING_TYPES, IMPORTANCE_LEVELS, TRAINING_TIMES))
+    climates = list(itertools.product(TEMP_CONDITIONS, SWEAT_RATES))
+    if full:
+        combos = itertools.product(profiles, sessions, climates)
+    else:
+        combos = (
+            (profile, session, climates[i % len(climates)])
+            for i, (profile, session) in enumerate(itertools.product(profiles, sessions))
+        )
+    return [
+        (profile, engine.Training(training_type=t, session_importance=imp, training_time=time_,
+                                  temp_condition=temp, sweat_rate=sweat))
+        for profile, (t, imp, time_), (temp, sweat) in combos
+    ]
+
+
+def day_benchmarks(full=False, step=1):
+    days = day_combinations(full)[::step]
+
+    def one_at_a_time():
+        for profile, training in days:
+            engine.plan_day(profile, training)
+
+    def batched():
+        engine.plan_days(days)
+
+    yield "day/plan_day", one_at_a_time, len(days)
+    yield "day/plan_days", batched, len(days)
+
+
+def app_benchmarks():
+    """Esecuzioni complete dello script Streamlit con AppTest."""
+    from streamlit.testing.v1 import AppTest
+
+    def first_run():
+        AppTest.from_file(str(APP_PATH), default_timeout=60).run()
+
+    at = AppTest.from_file(str(APP_PATH), default_timeout=60)
+    at.run()
+    weights = itertools.cycle([68.0, 70.5, 72.0])
+
+    def rerun_after_change():
+        at.number_input[1].set_value(next(weights)).run()
+
+    yield "app/first_run", first_run, 1
+    yield "app/rerun_widget_change", rerun_after_change, 1
+
+
+# =========================
+#  AVVIO A FREDDO
+# =========================
+
+def import_time(module, repeats=STARTUP_REPEATS):
+    """
+    (ms cumulativi, pacchetti importati) di ``import module`` in un processo
+    nuovo, da ``-X importtime``: il minimo su ``repeats`` processi.
+    """
+    best = None
+    packages = set()
+    for _ in range(repeats):
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+            cwd=APP_PATH.parent, capture_output=True, text=True, timeout=60,
+        )
+        if result.returncode != 0:
+            raise RuntimeError(f"import {module} fallito:\n{result.stderr[-2000:]}")
+        cumulative = None
+        # "import time: <self us> | <cumulativo us> | <indentazione><modulo>"
+        for line in result.stderr.splitlines():
+            _, _, fields = line.partition("import time:")
+            parts = fields.split("|")
+            if len(parts) != 3 or not parts[1].strip().isdigit():
+                continue
+            name = parts[2].strip()
+            packages.add(name.partition(".")[0])
+            if name == module:
+                cumulative = int(parts[1]) / 1e3
+        if cumulative is None:
+            raise RuntimeError(f"{module} non compare nell'output di -X importtime (già importato da site?)")
+        best = cumulative if best is None else min(best, cumulative)
+    return best, packages
+
+
+def check_startup(modules=STARTUP_MODULES, budget_ms=STARTUP_BUDGET_MS, repeats=STARTUP_REPEATS, out=sys.stderr):
+    """Controlla budget e dipendenze pesanti di ogni modulo; ritorna la lista dei problemi."""
+    problems = []
+    for module in modules:
+        ms, packages = import_time(module, repeats)
+        heavy = sorted(packages.intersection(HEAVY_MODULES))
+        status = "ok"
+        if ms > budget_ms:
+            status = "oltre il budget"
+            problems.append(f"{module}: {ms:.1f} ms > {budget_ms:g} ms")
+        if heavy:
+            status = "dipendenze pesanti"
+            problems.append(f"{module}: importa {', '.join(heavy)} all'avvio")
+        print(f"{module:30s} {ms:7.1f} ms  {status}" + (f" ({', '.join(heavy)})" if heavy else ""), file=out)
+    return problems
+
+
+# =========================
+#  ESECUZIONE E CONFRONTO
+# =========================
+
+def _metadata():
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=APP_PATH.parent,
+            capture_output=True, text=True, timeout=10,
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    import numpy
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "numpy": numpy.__version__,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "commit": commit,
+    }
+
+
+def run_benchmarks(quick=False, full=False, app=True, pattern=None, out=sys.stderr):
+    """Esegue i benchmark; ritorna il dizionario dei risultati (come nel JSON)."""
+    min_time, repeats = (0.05, 3) if quick else (0.2, 5)
+    suites = [
+        (scalar_benchmarks(), min_time, repeats),
+        (day_benchmarks(full, step=10 if quick else 1), min_time, repeats),
+    ]
+    if app:
+        suites.append((app_benchmarks(), 0.0, 3 if quick else 10))
+
+    results = {}
+    for benchmarks, suite_min_time, suite_repeats in suites:
+        for name, fn, calls in benchmarks:
+            if pattern and pattern not in name:
+                continue
+            stats = measure(fn, calls, suite_min_time, suite_repeats)
+            results[name] = stats
+            print(f"{name:45s} {_fmt(stats['median'])}/chiamata  (min {_fmt(stats['min'])}, "
+                  f"{stats['loops']}x{stats['calls']} chiamate, {stats['repeats']} ripetizioni)", file=out)
+    return {"meta": _metadata(), "results": results}
+
+
+def compare(base, new, threshold=DEFAULT_THRESHOLD):
+    """
+    Confronta due risultati. Ritorna una lista di
+    (nome, mediana base, mediana nuova, variazione, stato) con stato in
+    "regressione", "miglioramento", "invariato", "nuovo" o "rimosso".
+    """
+    rows = []
+    base_results, new_results = base["results"], new["results"]
+    for name in sorted(set(base_results) | set(new_results)):
+        if name not in new_results:
+            rows.append((name, base_results[name]["median"], None, None, "rimosso"))
+            continue
+        if name not in base_results:
+            rows.append((name, None, new_results[name]["median"], None, "nuovo"))
+            continue
+        b, n = base_results[name], new_results[name]
+        change = n["median"] / b["median"] - 1.0
+        change_min = n["min"] / b["min"] - 1.0
+        if change > threshold and change_min > threshold:
+            status = "regressione"
+        elif change < -threshold and change_min < -threshold:
+            status = "miglioramento"
+        else:
+            status = "invariato"
+        rows.append((name, b["median"], n["median"], change, status))
+    return rows
+
+
+def _fmt(seconds):
+    if seconds is None:
+        return "-"
+    for unit, scale in (("s", 1.0), ("ms", 1e-3), ("µs", 1e-6)):
+        if seconds >= scale:
+            return f"{seconds / scale:.3g} {unit}"
+    return f"{seconds / 1e-9:.3g} ns"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m nutrition.bench", description="Benchmark del motore e dell'app")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    run = sub.add_parser("run", help="esegue i benchmark e salva i risultati JSON")
+    run.add_argument("-o", "--output", default="bench.json")
+    run.add_argument("--quick", action="store_true", help="meno ripetizioni, un giorno ogni 10")
+    run.add_argument("--full", action="store_true", help="prodotto completo delle opzioni nel gruppo day")
+    run.add_argument("--no-app", action="store_true", help="salta i rerun Streamlit (AppTest)")
+    run.add_argument("-k", dest="pattern", help="solo i benchmark il cui nome contiene il testo")
+
+    cmp_ = sub.add_parser("compare", help="confronta due file di risultati")
+    cmp_.add_argument("base")
+    cmp_.add_argument("new")
+    cmp_.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                      help="variazione relativa oltre cui segnalare (default 0.10 = 10%%)")
+
+    startup = sub.add_parser("startup", help="tempo di import dei punti di ingresso (-X importtime)")
+    startup.add_argument("-m", "--module", action="append", dest="modules",
+                         help=f"modulo da controllare, ripetibile (default: {', '.join(STARTUP_MODULES)})")
+    startup.add_argument("--budget-ms", type=float, default=STARTUP_BUDGET_MS)
+    startup.add_argument("--repeats", type=int, default=STARTUP_REPEATS)
+
+    args = parser.parse_args(argv)
+    if args.command == "startup":
+        problems = check_startup(args.modules or STARTUP_MODULES, args.budget_ms, args.repeats)
+        for problem in problems:
+            print(problem, file=sys.stderr)
+        return 1 if problems else 0
+    if args.command == "run":
+        data = run_benchmarks(quick=args.quick, full=args.full, app=not args.no_app, pattern=args.pattern)
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2)
+        print(f"{len(data['results'])} benchmark salvati in {args.output}", file=sys.stderr)
+        return 0
+
+    with open(args.base, encoding="utf-8") as f:
+        base = json.load(f)
+    with open(args.new, encoding="utf-8") as f:
+        new = json.load(f)
+    rows = compare(base, new, args.threshold)
+    for name, b, n, change, status in rows:
+        change_text = f"{change:+.1%}" if change is not None else ""
+        print(f"{name:45s} {_fmt(b):>10s} → {_fmt(n):>10s} {change_text:>8s}  {status}")
+    regressions = [row for row in rows if row[4] == "regressione"]
+    print(f"{len(regressions)} regressioni (soglia {args.threshold:.0%})", file=sys.stderr)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
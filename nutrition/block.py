@@ -0,0 +1,185 @@
+"""
+Pianificazione di blocchi di allenamento di più giorni (7–28) con ricalcolo
+incrementale.
+
+Ogni giorno del blocco è un ``plan_day(profile, training)``: il risultato è
+memorizzato con chiave gli input del giorno (dataclass immutabili, quindi
+hashabili). Modificare una seduta ricalcola solo quel giorno e gli aggregati
+che ne dipendono:
+
+- totali settimanali (settimana = 7 giorni consecutivi dall'inizio del blocco);
+- bilancio energetico mobile su ``window`` giorni, dove il bilancio di un
+  giorno è kcal dei macro prescritti − TDEE del giorno.
+
+Gli aggregati toccati da un giorno sono al massimo una settimana e
+``window`` finestre mobili: il costo di una modifica è quello di un giorno.
+"""
+
+from collections import OrderedDict
+from dataclasses import dataclass, replace
+
+from .engine import plan_day
+
+DAYS_PER_WEEK = 7
+
+
+@dataclass(frozen=True)
+class WeekTotals:
+    """Somme di una settimana del blocco."""
+    week: int
+    days: int
+    target_kcal: float
+    day_tdee: float
+    training_kcal: float
+    cho_g: float
+    pro_g: float
+    fat_g: float
+    energy_balance: float
+
+
+def energy_balance(plan):
+    """Bilancio del giorno: kcal dei macro prescritti − TDEE del giorno."""
+    return plan.macro_total_kcal - plan.day_tdee
+
+
+class BlockPlanner:
+    """
+    Blocco di giorni per un atleta: ``profile`` comune, una ``Training`` per
+    giorno. I piani dei giorni sono in cache (LRU di ``cache_size`` voci) per
+    (profilo, allenamento): giorni identici, o un ritorno a input già visti,
+    non ricalcolano nulla.
+    """
+
+    def __init__(self, profile, trainings, window=DAYS_PER_WEEK, cache_size=256):
+        if window < 1:
+            raise ValueError("window deve essere >= 1")
+        self.window = window
+        self._profile = profile
+        self._trainings = list(trainings)
+        self._cache = OrderedDict()
+        self._cache_size = cache_size
+        self.computed = 0  # numero di plan_day effettivamente eseguiti
+        self._rebuild()
+
+    # ---------- piani dei giorni ----------
+
+    def _plan(self, training):
+        key = (self._profile, training)
+        plan = self._cache.get(key)
+        if plan is not None:
+            self._cache.move_to_end(key)
+            return plan
+        plan = plan_day(self._profile, training)
+        self.computed += 1
+        self._cache[key] = plan
+        if len(self._cache) > self._cache_size:
+            self._cache.popitem(last=False)
+        return plan
+
+    def _rebuild(self):
+        self._plans = [self._plan(t) for t in self._trainings]
+        self._balance = [energy_balance(p) for p in self._plans]
+        self._weeks = [self._week_totals(w) for w in range(self.n_weeks)]
+        self._rolling = [self._window_sum(i) for i in range(len(self._plans))]
+
+    # ---------- aggregati ----------
+
+    def _week_totals(self, week):
+        plans = self._plans[week * DAYS_PER_WEEK:(week + 1) * DAYS_PER_WEEK]
+        return WeekTotals(
+            week=week,
+            days=len(plans),
+            target_kcal=sum(p.target_kcal for p in plans),
+            day_tdee=sum(p.day_tdee for p in plans),
+            training_kcal=sum(p.training_kcal for p in plans),
+            cho_g=sum(p.total_cho_g for p in plans),
+            pro_g=sum(p.total_pro_g for p in plans),
+            fat_g=sum(p.total_fat_g for p in plans),
+            energy_balance=sum(self._balance[week * DAYS_PER_WEEK:(week + 1) * DAYS_PER_WEEK]),
+        )
+
+    def _window_sum(self, day):
+        # Somma esatta sulla finestra (non delta accumulati: niente deriva numerica)
+        return sum(self._balance[max(0, day - self.window + 1):day + 1])
+
+    # ---------- accesso ----------
+
+    def __len__(self):
+        return len(self._plans)
+
+    @property
+    def profile(self):
+        return self._profile
+
+    @property
+    def n_weeks(self):
+        return -(-len(self._plans) // DAYS_PER_WEEK)
+
+    @property
+    def trainings(self):
+        return tuple(self._trainings)
+
+    @property
+    def days(self):
+        """Piani di tutti i giorni (tupla di DayPlan)."""
+        return tuple(self._plans)
+
+    def day(self, index):
+        return self._plans[index]
+
+    def week(self, week):
+        return self._weeks[week]
+
+    def weeks(self):
+        return tuple(self._weeks)
+
+    def rolling_balance(self, day):
+        """Bilancio energetico cumulato sugli ultimi ``window`` giorni fino a ``day``."""
+        return self._rolling[day]
+
+    def rolling_balances(self):
+        return tuple(self._rolling)
+
+    # ---------- modifiche ----------
+
+    def set_day(self, index, training):
+        """
+        Sostituisce l'allenamento di un giorno. Ricalcola solo quel giorno,
+        la sua settimana e le finestre mobili che lo contengono.
+        Ritorna False se l'allenamento era già quello.
+        """
+        if index < 0:
+            index += len(self._plans)
+        if self._trainings[index] == training:
+            return False
+        self._trainings[index] = training
+        plan = self._plan(training)
+        self._plans[index] = plan
+        self._balance[index] = energy_balance(plan)
+
+        week = index // DAYS_PER_WEEK
+        self._weeks[week] = self._week_totals(week)
+        for day in range(index, min(index + self.window, len(self._plans))):
+            self._rolling[day] = self._window_sum(day)
+        return True
+
+    def update_day(self, index, **changes):
+        """Come ``set_day`` ma modificando solo alcuni campi della Training."""
+        return self.set_day(index, replace(self._trainings[index], **changes))
+
+    def set_profile(self, profile):
+        """
+        Cambia il profilo dell'atleta: tutti i giorni dipendono dal profilo,
+        quindi si ricalcola il blocco (i giorni con input uguali una volta sola).
+        """
+        if profile == self._profile:
+            return False
+        self._profile = profile
+        self._rebuild()
+        return True
+
+
+def plan_block(profile, trainings, window=DAYS_PER_WEEK):
+    """Pianifica un blocco di giorni; scorciatoia per ``BlockPlanner``."""
+    return BlockPlanner(profile, trainings, window=window)
+
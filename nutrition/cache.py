@@ -0,0 +1,416 @@
+"""
+Cache dei piani indirizzata per contenuto, condivisa tra sessioni e processi.
+
+    cache = get_plan_cache()
+    plan = cache.plan_day(profile, training)     # come engine.plan_day
+    cache.suggest_meals(requests)                # come engine.suggest_meals
+    cache.stats()                                # {"plan": CacheStats, "meal": CacheStats}
+
+Chiave: hash BLAKE2 di (tipo, impronta dei dati, input normalizzati in JSON
+canonico). Normalizzazione: i numeri diventano float arrotondati a
+``DIGITS`` decimali (70 e 70.0 coincidono); senza seduta CHO/ora,
+temperatura e sudorazione non cambiano il piano e restano fuori dalla
+chiave (il DayPlan restituito riporta comunque profile/training passati).
+
+Impronta dei dati: tabella alimenti (nomi, nutrienti, matrice) e sorgenti
+dei moduli di calcolo (FOODS_DB e template, regole, solver, tabelle). Se
+cambiano, cambiano tutte le chiavi: le voci vecchie non vengono più lette.
+Nel livello SQLite restano finché non scadono: più processi con versioni
+diverse del codice possono condividere lo stesso file senza cancellarsi le
+voci a vicenda. Le voci di un'altra impronta sono rimosse dopo
+``STALE_FINGERPRINT_AGE`` secondi senza accessi (oltre che dal limite di
+voci per ultimo accesso).
+
+Livelli, entrambi con scadenza opzionale ``$NUTRITION_CACHE_TTL`` (secondi):
+
+- memoria: LRU del processo, ``$NUTRITION_CACHE_SIZE`` voci (default 4096,
+  0 = disattivato);
+- SQLite (opzionale): file locale ``$NUTRITION_CACHE_DB`` condiviso dai
+  processi della macchina (worker Streamlit, API, CLI), in modalità WAL, al
+  massimo ``$NUTRITION_CACHE_DB_SIZE`` voci (default 100000) rimosse per
+  ultimo accesso. I valori sono pickle: usare solo file locali fidati.
+
+Gli errori SQLite (database bloccato, disco pieno, ...) non interrompono il
+calcolo: la voce è trattata come miss e contata in ``errors``. Una voce che
+non si legge più (pickle di una versione precedente delle classi) è un miss
+e viene eliminata. I risultati
+restituiti sono condivisi tra le chiamate e non vanno modificati.
+"""
+
+import hashlib
+import json
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from collections import Counter, OrderedDict
+from dataclasses import dataclass, fields, replace
+from functools import lru_cache
+from pathlib import Path
+
+from .db import ConnectionPool
+from .engine import plan_days, suggest_meals
+from .profiling import span
+
+CACHE_DB_ENV = "NUTRITION_CACHE_DB"
+CACHE_SIZE_ENV = "NUTRITION_CACHE_SIZE"
+CACHE_DB_SIZE_ENV = "NUTRITION_CACHE_DB_SIZE"
+CACHE_TTL_ENV = "NUTRITION_CACHE_TTL"
+
+DEFAULT_MAX_ENTRIES = 4096
+DEFAULT_DB_MAX_ENTRIES = 100_000
+DIGITS = 9
+# Inserimenti SQLite tra due potature (scadenze e limite di voci)
+PRUNE_EVERY = 256
+# Secondi senza accessi dopo cui si rimuovono le voci di un'altra impronta
+STALE_FINGERPRINT_AGE = 7 * 24 * 3600
+# Parametri per query ``IN (...)``, sotto il limite storico di SQLite (999)
+_SQL_CHUNK = 500
+# Moduli i cui sorgenti determinano il risultato dei piani
+_FINGERPRINT_MODULES = ("engine", "foods", "options", "reference", "rules", "solver", "tables")
+KINDS = ("plan", "meal")
+
+
+# =========================
+#  CHIAVI
+# =========================
+
+def data_fingerprint(table=None):
+    """Impronta di tabella alimenti e codice di calcolo (hex)."""
+    # NumPy e tabella alimenti solo al primo uso della cache, non all'import
+    import numpy as np
+
+    from .fooddb import get_food_table
+
+    table = table if table is not None else get_food_table()
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update("\n".join(table.names).encode("utf-8") + b"\0")
+    digest.update("\n".join(table.nutrients).encode("utf-8") + b"\0")
+    digest.update(np.ascontiguousarray(table.matrix, dtype="<f4").tobytes())
+    package = Path(__file__).parent
+    for name in _FINGERPRINT_MODULES:
+        digest.update((package / f"{name}.py").read_bytes())
+    return digest.hexdigest()
+
+
+def _canonical(value):
+    if isinstance(value, bool) or value is None or isinstance(value, str):
+        return value
+    if isinstance(value, (int, float)):
+        return round(float(value), DIGITS)
+    return [_canonical(item) for item in value]
+
+
+def plan_inputs(profile, training):
+    """Input normalizzati di un piano: solo ciò che ne cambia il risultato."""
+    if not training.has_session:
+        training = replace(training, cho_per_hour=0, temp_condition="", sweat_rate="")
+    return [
+        [_canonical(getattr(obj, f.name)) for f in fields(obj)]
+        for obj in (profile, training)
+    ]
+
+
+def cache_key(kind, fingerprint, inputs):
+    text = json.dumps([kind, fingerprint, _canonical(inputs)], ensure_ascii=False, separators=(",", ":"))
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).hexdigest()
+
+
+# =========================
+#  LIVELLI
+# =========================
+
+class MemoryTier:
+    """LRU in memoria con scadenza opzionale (thread-safe: una sessione Streamlit per thread)."""
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, ttl=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.evictions = 0
+        self._entries = OrderedDict()  # chiave -> (scadenza monotona o None, valore)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        """Valore in cache o None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires is not None and expires < time.monotonic():
+                del self._entries[key]
+                self.evictions += 1
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        if self.max_entries <= 0:
+            return
+        expires = time.monotonic() + self.ttl if self.ttl is not None else None
+        with self._lock:
+            self._entries[key] = (expires, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class SQLiteTier:
+    """Voci in un file SQLite condiviso tra processi (pool di ``nutrition.db``)."""
+
+    def __init__(self, path, fingerprint, max_entries=DEFAULT_DB_MAX_ENTRIES, ttl=None):
+        self.path = str(path)
+        self.fingerprint = fingerprint
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.evictions = 0
+        self.errors = 0
+        self.pool = ConnectionPool(path)
+        self._lock = threading.Lock()
+        self._puts = 0
+        with self.pool.connection() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS plan_cache ("
+                " key TEXT PRIMARY KEY, kind TEXT NOT NULL, fingerprint TEXT NOT NULL,"
+                " value BLOB NOT NULL, created REAL NOT NULL, accessed REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS plan_cache_accessed ON plan_cache (accessed)")
+            self.evictions += self._prune_stale(conn, time.time())
+
+    def __len__(self):
+        with self.pool.connection() as conn:
+            return conn.execute("SELECT COUNT(*) FROM plan_cache").fetchone()[0]
+
+    def get_many(self, keys):
+        """{chiave: valore} per le chiavi presenti e non scadute."""
+        found = {}
+        broken = []
+        now = time.time()
+        try:
+            with self.pool.connection() as conn:
+                for i in range(0, len(keys), _SQL_CHUNK):
+                    chunk = keys[i:i + _SQL_CHUNK]
+                    rows = conn.execute(
+                        f"SELECT key, value, created FROM plan_cache WHERE key IN ({','.join('?' * len(chunk))})",
+                        chunk,
+                    ).fetchall()
+                    for key, blob, created in rows:
+                        if self.ttl is not None and created + self.ttl < now:
+                            continue
+                        try:
+                            found[key] = pickle.loads(blob)
+                        except Exception:
+                            # Blob illeggibile o di un'altra versione delle classi (AttributeError,
+                            # TypeError, ImportError, ...): miss, e la voce si elimina
+                            self.errors += 1
+                            broken.append((key,))
+            if found or broken:
+                with self.pool.transaction() as conn:
+                    conn.executemany("UPDATE plan_cache SET accessed = ? WHERE key = ?", [(now, key) for key in found])
+                    conn.executemany("DELETE FROM plan_cache WHERE key = ?", broken)
+        except sqlite3.Error:
+            self.errors += 1
+        return found
+
+    def put_many(self, kind, items):
+        """Inserisce o sostituisce le voci ``{chiave: valore}``."""
+        now = time.time()
+        rows = [
+            (key, kind, self.fingerprint, pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL), now, now)
+            for key, value in items.items()
+        ]
+        try:
+            with self.pool.transaction() as conn:
+                conn.executemany("INSERT OR REPLACE INTO plan_cache VALUES (?, ?, ?, ?, ?, ?)", rows)
+            with self._lock:
+                self._puts += len(rows)
+                prune = self._puts >= PRUNE_EVERY
+                if prune:
+                    self._puts = 0
+            if prune:
+                with self.pool.transaction() as conn:
+                    self._prune(conn, now)
+        except sqlite3.Error:
+            self.errors += 1
+
+    def _prune_stale(self, conn, now):
+        """Rimuove le voci di altre impronte senza accessi da ``STALE_FINGERPRINT_AGE`` secondi."""
+        return conn.execute(
+            "DELETE FROM plan_cache WHERE accessed < ? AND fingerprint != ?",
+            (now - STALE_FINGERPRINT_AGE, self.fingerprint),
+        ).rowcount
+
+    def _prune(self, conn, now):
+        removed = self._prune_stale(conn, now)
+        if self.ttl is not None:
+            removed += conn.execute("DELETE FROM plan_cache WHERE created < ?", (now - self.ttl,)).rowcount
+        excess = conn.execute("SELECT COUNT(*) FROM plan_cache").fetchone()[0] - self.max_entries
+        if excess > 0:
+            removed += conn.execute(
+                "DELETE FROM plan_cache WHERE key IN (SELECT key FROM plan_cache ORDER BY accessed LIMIT ?)",
+                (excess,),
+            ).rowcount
+        self.evictions += removed
+
+    def clear(self):
+        with self.pool.connection() as conn:
+            conn.execute("DELETE FROM plan_cache")
+
+    def close(self):
+        self.pool.close()
+
+
+# =========================
+#  CACHE DEI PIANI
+# =========================
+
+@dataclass(frozen=True)
+class CacheStats:
+    """Ricerche di un tipo di voce (piani o pasti) dall'avvio del processo."""
+    memory_hits: int = 0
+    disk_hits: int = 0
+    misses: int = 0
+
+    @property
+    def hits(self):
+        return self.memory_hits + self.disk_hits
+
+    @property
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+
+class PlanCache:
+    """Piani del giorno e suggerimenti dei pasti in cache (memoria → SQLite → calcolo)."""
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, ttl=None, db_path=None,
+                 db_max_entries=DEFAULT_DB_MAX_ENTRIES, fingerprint=None):
+        self.fingerprint = fingerprint or data_fingerprint()
+        self.memory = MemoryTier(max_entries, ttl)
+        self.disk = SQLiteTier(db_path, self.fingerprint, db_max_entries, ttl) if db_path else None
+        self._counts = Counter()
+        self._lock = threading.Lock()
+
+    def _get_many(self, kind, keys):
+        unique = list(dict.fromkeys(keys))
+        values = {}
+        for key in unique:
+            value = self.memory.get(key)
+            if value is not None:
+                values[key] = value
+        in_memory = set(values)
+        missing = [key for key in unique if key not in values]
+        if self.disk is not None and missing:
+            from_disk = self.disk.get_many(missing)
+            for key, value in from_disk.items():
+                self.memory.put(key, value)
+            values.update(from_disk)
+        with self._lock:
+            for key in keys:
+                if key in in_memory:
+                    self._counts[kind, "memory_hits"] += 1
+                elif key in values:
+                    self._counts[kind, "disk_hits"] += 1
+                else:
+                    self._counts[kind, "misses"] += 1
+        return values
+
+    def _put_many(self, kind, items):
+        for key, value in items.items():
+            self.memory.put(key, value)
+        if self.disk is not None and items:
+            self.disk.put_many(kind, items)
+
+    def suggest_meals(self, requests):
+        """Come ``engine.suggest_meals``; i pasti mancanti in un solo solve."""
+        requests = list(requests)
+        keys = [cache_key("meal", self.fingerprint, request) for request in requests]
+        with span("meal_cache", meals=len(requests)):
+            values = self._get_many("meal", keys)
+        todo = {}
+        for key, request in zip(keys, requests):
+            if key not in values:
+                todo.setdefault(key, request)
+        if todo:
+            computed = dict(zip(todo, suggest_meals(list(todo.values()))))
+            self._put_many("meal", computed)
+            values.update(computed)
+        return [values[key] for key in keys]
+
+    def suggest_meal(self, meal_name, cho_target, pro_target, fat_target, training_time):
+        return self.suggest_meals([(meal_name, cho_target, pro_target, fat_target, training_time)])[0]
+
+    def plan_days(self, days):
+        """Come ``engine.plan_days``: i giorni mancanti sono calcolati insieme."""
+        days = list(days)
+        keys = [cache_key("plan", self.fingerprint, plan_inputs(profile, training)) for profile, training in days]
+        with span("plan_cache", days=len(days)):
+            values = self._get_many("plan", keys)
+        todo = {}
+        for key, day in zip(keys, days):
+            if key not in values:
+                todo.setdefault(key, day)
+        if todo:
+            computed = dict(zip(todo, plan_days(todo.values(), suggest=self.suggest_meals)))
+            self._put_many("plan", computed)
+            values.update(computed)
+        plans = []
+        for key, (profile, training) in zip(keys, days):
+            plan = values[key]
+            if plan.profile != profile or plan.training != training:
+                plan = replace(plan, profile=profile, training=training)
+            plans.append(plan)
+        return plans
+
+    def plan_day(self, profile, training):
+        return self.plan_days([(profile, training)])[0]
+
+    def stats(self):
+        """{tipo: CacheStats} per "plan" e "meal"."""
+        with self._lock:
+            return {
+                kind: CacheStats(
+                    memory_hits=self._counts[kind, "memory_hits"],
+                    disk_hits=self._counts[kind, "disk_hits"],
+                    misses=self._counts[kind, "misses"],
+                )
+                for kind in KINDS
+            }
+
+    @property
+    def evictions(self):
+        return self.memory.evictions + (self.disk.evictions if self.disk is not None else 0)
+
+    @property
+    def errors(self):
+        return self.disk.errors if self.disk is not None else 0
+
+    def clear(self):
+        """Svuota entrambi i livelli e azzera i contatori."""
+        self.memory.clear()
+        if self.disk is not None:
+            self.disk.clear()
+        with self._lock:
+            self._counts.clear()
+
+
+@lru_cache(maxsize=None)
+def get_plan_cache():
+    """Cache del processo, configurata dalle variabili d'ambiente (vedi sopra)."""
+    ttl = os.environ.get(CACHE_TTL_ENV)
+    return PlanCache(
+        max_entries=int(os.environ.get(CACHE_SIZE_ENV, DEFAULT_MAX_ENTRIES)),
+        ttl=float(ttl) if ttl else None,
+        db_path=os.environ.get(CACHE_DB_ENV) or None,
+        db_max_entries=int(os.environ.get(CACHE_DB_SIZE_ENV, DEFAULT_DB_MAX_ENTRIES)),
+    )
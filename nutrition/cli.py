@@ -0,0 +1,147 @@
+"""
+Generazione offline dei piani: JSONL in ingresso, JSONL in uscita.
+
+    python -m nutrition.cli atleti.jsonl -o piani.jsonl
+    cat atleti.jsonl | python -m nutrition.cli --workers 8 > piani.jsonl
+
+Ogni riga in ingresso è un record (vedi ``nutrition.schema``); ogni riga in
+uscita è il piano completo del giorno (energia, macro, pasti con porzioni,
+idratazione/sodio), stessi calcoli delle sezioni 3–4B dell'app, oppure
+``{"id": ..., "line": n, "error": "..."}`` per i record non validi.
+L'ordine dell'output è quello dell'input.
+
+Le righe sono lette a blocchi di ``--chunk-size``: ogni blocco è elaborato
+con una sola chiamata a ``plan_records`` (un solo solve per tutti i pasti
+del blocco, record identici calcolati una volta). Con ``--workers N`` i blocchi
+vanno a un pool di processi, con al massimo ``2 * N`` blocchi in volo: la
+memoria resta limitata qualunque sia la lunghezza dell'input.
+"""
+
+import argparse
+import io
+import json
+import os
+import sys
+from collections import deque
+from itertools import islice
+
+from .schema import dumps, plan_records
+
+DEFAULT_CHUNK_SIZE = 512
+# Blocchi in volo per worker: abbastanza per non lasciare worker fermi
+IN_FLIGHT_PER_WORKER = 2
+
+
+def _error_line(record_id, line_no, exc):
+    return dumps({"id": record_id, "line": line_no, "error": str(exc)}) + "\n"
+
+
+def plan_lines(first_line, lines):
+    """
+    Elabora un blocco di righe JSONL (``first_line`` = numero della prima).
+    Ritorna (testo di output, piani, errori); le righe vuote sono ignorate.
+    """
+    outputs = [""] * len(lines)
+    records = []
+    positions = []
+    errors = 0
+    for i, line in enumerate(lines):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as exc:
+            outputs[i] = _error_line(None, first_line + i, exc)
+            errors += 1
+            continue
+        except RecursionError:
+            outputs[i] = _error_line(None, first_line + i, ValueError("annidamento troppo profondo"))
+            errors += 1
+            continue
+        records.append(record)
+        positions.append(i)
+
+    planned = 0
+    for i, record, result in zip(positions, records, plan_records(records)):
+        if isinstance(result, ValueError):
+            record_id = record.get("id") if isinstance(record, dict) else None
+            outputs[i] = _error_line(record_id, first_line + i, result)
+            errors += 1
+        else:
+            outputs[i] = result + "\n"
+            planned += 1
+    return "".join(outputs), planned, errors
+
+
+def _chunks(lines, size):
+    first_line = 1
+    while True:
+        chunk = list(islice(lines, size))
+        if not chunk:
+            return
+        yield first_line, chunk
+        first_line += len(chunk)
+
+
+def run(lines, out, workers=1, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Elabora un iterabile di righe JSONL scrivendo su ``out`` in ordine.
+    Ritorna (piani, errori).
+    """
+    planned = errors = 0
+
+    def emit(result):
+        nonlocal planned, errors
+        text, n_plans, n_errors = result
+        out.write(text)
+        planned += n_plans
+        errors += n_errors
+
+    if workers <= 1:
+        for first_line, chunk in _chunks(lines, chunk_size):
+            emit(plan_lines(first_line, chunk))
+        return planned, errors
+
+    # Importato qui: multiprocessing costa all'avvio anche a chi non usa il pool
+    from concurrent.futures import ProcessPoolExecutor
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        for first_line, chunk in _chunks(lines, chunk_size):
+            pending.append(pool.submit(plan_lines, first_line, chunk))
+            if len(pending) >= workers * IN_FLIGHT_PER_WORKER:
+                emit(pending.popleft().result())
+        while pending:
+            emit(pending.popleft().result())
+    return planned, errors
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m nutrition.cli", description="Piani giornalieri da JSONL")
+    parser.add_argument("input", nargs="?", default="-", help="file JSONL (default: stdin)")
+    parser.add_argument("-o", "--output", default="-", help="file JSONL di output (default: stdout)")
+    parser.add_argument("-w", "--workers", type=int, default=1,
+                        help="processi worker (0 = numero di CPU, 1 = nessun pool)")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="righe per blocco")
+    args = parser.parse_args(argv)
+    if args.chunk_size < 1:
+        parser.error("--chunk-size deve essere >= 1")
+    workers = args.workers or os.cpu_count() or 1
+
+    if args.input == "-":
+        source = io.TextIOWrapper(sys.stdin.buffer, encoding="utf-8")
+    else:
+        source = open(args.input, encoding="utf-8")
+    if args.output == "-":
+        sink = io.TextIOWrapper(sys.stdout.buffer, encoding="utf-8", write_through=False)
+    else:
+        sink = open(args.output, "w", encoding="utf-8")
+    with source, sink:
+        planned, errors = run(source, sink, workers=workers, chunk_size=args.chunk_size)
+
+    print(f"{planned} piani, {errors} errori", file=sys.stderr)
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,80 @@
+"""
+Connessioni SQLite condivise da cache (``nutrition.cache``) e registro
+(``nutrition.store``).
+
+Ogni file ha un pool di connessioni per processo: un thread (sessione
+Streamlit, worker) prende una connessione libera e la restituisce, così le
+connessioni e le loro istruzioni preparate (cache di ``sqlite3`` per
+connessione) sopravvivono ai rerun. Modalità WAL: più processi leggono
+mentre uno scrive. Le connessioni sono in autocommit: le scritture di più
+righe usano ``transaction``, che prende subito il lock di scrittura
+(``BEGIN IMMEDIATE``): una lettura-modifica-scrittura nella transazione non
+può basarsi su dati che un altro processo sta riscrivendo.
+"""
+
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+BUSY_TIMEOUT = 5.0
+# Istruzioni preparate tenute in cache per connessione
+CACHED_STATEMENTS = 256
+
+
+def connect(path):
+    conn = sqlite3.connect(
+        str(path),
+        timeout=BUSY_TIMEOUT,
+        isolation_level=None,
+        check_same_thread=False,
+        cached_statements=CACHED_STATEMENTS,
+    )
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA foreign_keys=ON")
+    return conn
+
+
+class ConnectionPool:
+    """Connessioni riusabili verso un file SQLite (una per thread attivo)."""
+
+    def __init__(self, path):
+        self.path = str(path)
+        self._free = []
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def connection(self):
+        with self._lock:
+            conn = self._free.pop() if self._free else None
+        if conn is None:
+            conn = connect(self.path)
+        try:
+            yield conn
+        finally:
+            with self._lock:
+                self._free.append(conn)
+
+    @contextmanager
+    def transaction(self):
+        """
+        Connessione in una transazione di scrittura: COMMIT all'uscita,
+        ROLLBACK se errore. Il lock di scrittura si prende all'inizio (attesa
+        fino a ``BUSY_TIMEOUT``), non alla prima scrittura: con WAL una
+        transazione differita che ha già letto fallirebbe con
+        SQLITE_BUSY_SNAPSHOT se un altro processo scrive nel frattempo.
+        """
+        with self.connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+
+    def close(self):
+        with self._lock:
+            free, self._free = self._free, []
+        for conn in free:
+            conn.close()
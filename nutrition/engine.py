@@ -0,0 +1,517 @@
+"""
+Motore di pianificazione della giornata: BMR/TDEE, macro, distribuzione
+dei CHO sui pasti, suggerimenti di piatto unico e idratazione.
+
+Nessuna dipendenza da Streamlit: ``plan_day(profile, training)`` calcola
+tutto ciò che l'app mostra nelle sezioni 1–4B e può essere usato da worker,
+job batch e test.
+"""
+
+import sys
+from dataclasses import dataclass, fields
+from typing import NamedTuple, Optional
+
+from . import tables as _t
+from .profiling import span
+from .options import (  # noqa: F401  (riesportate per app e script)
+    ACTIVITY_LEVELS,
+    GOALS,
+    IMPORTANCE_LEVELS,
+    NO_TRAINING_TIME,
+    REST_DAY,
+    SEX_OPTIONS,
+    SWEAT_RATES,
+    TEMP_CONDITIONS,
+    TRAINING_TIMES,
+    TRAINING_TYPES,
+)
+from .rules import classify_meal_name, compile_rules
+
+# Traduzione pratica in borracce da 500 ml e compresse da 300 mg
+BOTTLE_SIZE_L = 0.5
+PILL_NA_MG = 300
+
+# =========================
+#  FUNZIONI DI SUPPORTO
+# =========================
+
+def calculate_bmr(weight, height, age, sex):
+    """
+    Calcolo BMR con Mifflin-St Jeor.
+    weight in kg, height in cm, age in anni
+    """
+    if sex == "Maschio":
+        bmr = 10 * weight + 6.25 * height - 5 * age + 5
+    else:  # Femmina
+        bmr = 10 * weight + 6.25 * height - 5 * age - 161
+    return bmr
+
+def activity_factor(level):
+    """
+    Fattore di attività quotidiana NON sportiva.
+    """
+    return _t.ACTIVITY_FACTOR[_t.ACTIVITY_INDEX.get(level, len(ACTIVITY_LEVELS))]
+
+def training_energy_cost(weight, duration_hours, training_type):
+    """
+    Stima molto semplificata del costo energetico dell'allenamento:
+    MET grezzi per tipo di attività, moltiplicati per peso e durata.
+    1 MET ~ 1 kcal/kg/h
+    """
+    met = _t.TRAINING_MET[_t.TRAINING_TYPE_INDEX.get(training_type, len(TRAINING_TYPES))]
+    return met * weight * duration_hours
+
+def choose_cho_g_per_kg(training_type, session_importance, goal):
+    """
+    Sceglie i g/kg di CHO in base al tipo di giorno,
+    importanza della seduta e obiettivo (mantenimento/dimagrimento/costruzione).
+    I range sono indicativi e basati sulle linee guida classiche.
+    """
+    value = _t.CHO_BY_KEY.get((training_type, session_importance, goal))
+    if value is not None:
+        return value
+    return _t.CHO_G_PER_KG[_t.cho_offset(
+        _t.TRAINING_TYPE_INDEX.get(training_type, len(TRAINING_TYPES)),
+        _t.IMPORTANCE_INDEX.get(session_importance, len(IMPORTANCE_LEVELS)),
+        _t.GOAL_INDEX.get(goal, len(GOALS)),
+    )]
+
+def choose_protein_g_per_kg(goal):
+    """
+    Proteine g/kg: valori per atleta endurance volume alto, >40 anni, con obiettivo di controllo peso.
+    """
+    return _t.PRO_G_PER_KG[_t.GOAL_INDEX.get(goal, len(GOALS))]
+
+def choose_fat_g_per_kg(goal):
+    """
+    Grassi g/kg: minimo per salute + piccolo aggiustamento in base all'obiettivo.
+    """
+    return _t.FAT_G_PER_KG[_t.GOAL_INDEX.get(goal, len(GOALS))]
+
+def goal_kcal_delta(goal):
+    """
+    Aggiustamento calorico giornaliero in base all'obiettivo.
+    """
+    return _t.GOAL_KCAL_DELTA[_t.GOAL_INDEX.get(goal, len(GOALS))]
+
+def meal_pattern(training_time):
+    """
+    Ritorna i pasti e le percentuali di CHO_fuori allenamento
+    in base all'orario principale dell'allenamento.
+    Le percentuali sommano a 1.0. Tupla immutabile di (pasto, percentuale).
+    """
+    return _t.MEAL_PATTERNS[_t.TRAINING_TIME_INDEX.get(training_time, len(TRAINING_TIMES))]
+
+def meal_times_suggestion(training_time):
+    """
+    Suggerisce orari indicativi per i pasti in base all'orario principale dell'allenamento.
+    Ritorna una mappa (sola lettura) {nome_pasto: orario_stringa}.
+    """
+    return _t.MEAL_TIMES[_t.TRAINING_TIME_INDEX.get(training_time, len(TRAINING_TIMES))]
+
+def split_protein_fat_across_meals(total_pro, total_fat, meals):
+    """
+    Distribuisce proteine e grassi in modo semplice:
+    - proteine: più uniformi
+    - grassi: leggermente più su pasti principali (colazione/pranzo/cena)
+    """
+    n_meals = len(meals)
+    pro_per_meal = total_pro / n_meals
+
+    # Distribuzione grassi: pasti principali un po' più alti
+    # Peso base per ogni pasto
+    weights = []
+    for name, _ in meals:
+        if "Spuntino" in name:
+            weights.append(0.5)
+        else:
+            weights.append(1.0)
+    weight_sum = sum(weights)
+    fat_per_unit = total_fat / weight_sum
+    fat_allocation = tuple(w * fat_per_unit for w in weights)
+
+    return pro_per_meal, fat_allocation
+
+
+def hydration_rate(temp_condition, sweat_rate):
+    """Stima dei litri di acqua/ora in base a temperatura e sudorazione.
+    Ritorna L/h."""
+    value = _t.HYDRATION_BY_KEY.get((temp_condition, sweat_rate))
+    if value is not None:
+        return value
+    return _t.HYDRATION_RATE[_t.hydration_offset(
+        _t.TEMP_INDEX.get(temp_condition, len(TEMP_CONDITIONS)),
+        _t.SWEAT_INDEX.get(sweat_rate, len(SWEAT_RATES)),
+    )]
+
+def sodium_rate(sweat_rate):
+    """
+    Stima dei mg di sodio/ora in base alla sudorazione.
+    Ritorna mg/h.
+    """
+    return _t.SODIUM_RATE[_t.SWEAT_INDEX.get(sweat_rate, len(SWEAT_RATES))]
+
+def classify_meal_type(meal_name, training_time):
+    """
+    Classifica il tipo di pasto in base al nome e all'orario allenamento,
+    per scegliere il template corretto (regole in ``nutrition.rules``).
+    """
+    return classify_meal_name(meal_name)
+
+
+def base_portions_for(meal_type):
+    """
+    Porzioni base in grammi per ogni alimento del template del tipo di pasto
+    (punto di partenza del solver delle porzioni).
+    """
+    from .fooddb import get_food_table
+
+    template = compile_rules(get_food_table()).template(meal_type)
+    return dict(zip(template.foods, template.base))
+
+
+def macros_for_portions(portions_dict):
+    """
+    Macro totali (cho, pro, fat) di un dizionario {alimento: grammi}:
+    un prodotto vettore–matrice sulla tabella alimenti.
+    Gli alimenti non presenti nel database vengono ignorati.
+    """
+    from .fooddb import get_food_table
+
+    table = get_food_table()
+    return table.macros_for(table.ids(portions_dict), list(portions_dict.values()))
+
+
+def suggest_meals(requests):
+    """
+    Versione batch di ``suggest_meal``: tutti i pasti (di uno o più giorni)
+    vengono porzionati con una sola chiamata al solver.
+    requests: sequenza di (meal_name, cho_target, pro_target, fat_target, training_time).
+    Ritorna una lista di ``MealSuggestion`` (porzioni, (cho, pro, fat)) nello stesso ordine.
+    """
+    from .fooddb import get_food_table
+    from .solver import meal_macros, pack_meals, solve_portions
+
+    requests = list(requests)
+    if not requests:
+        return []
+
+    with span("suggest_meals", meals=len(requests)):
+        table = get_food_table()
+        rules = compile_rules(table)
+        specs = []
+        for meal_name, cho_target, pro_target, fat_target, training_time in requests:
+            template = rules.template(classify_meal_type(meal_name, training_time))
+            specs.append((
+                template.foods,
+                template.food_ids,
+                template.base,
+                template.lower,
+                template.upper,
+                (cho_target, pro_target, fat_target),
+            ))
+
+        with span("solve_portions", meals=len(specs)):
+            packed = pack_meals([spec[1:] for spec in specs], table.macros)
+            solved = solve_portions(*packed)
+            macros = meal_macros(packed[0], solved)
+
+        results = []
+        for (foods, *_), row, meal_totals in zip(specs, solved.tolist(), macros.tolist()):
+            results.append(MealSuggestion(dict(zip(foods, row)), tuple(meal_totals)))
+        return results
+
+
+def suggest_meal(meal_name, cho_target, pro_target, fat_target, training_time):
+    """
+    Genera un 'piatto unico' indicativo per il pasto, usando i tuoi alimenti preferiti.
+    Le porzioni del template vengono adattate insieme ai target di CHO, PRO e FAT
+    (minimi quadrati con limiti per alimento, vedi ``nutrition.solver``).
+    Ritorna ``MealSuggestion``, una coppia:
+      - dizionario {alimento: grammi}
+      - macro stimati totali (cho, pro, fat)
+    """
+    with span("suggest_meal", meal=meal_name):
+        return suggest_meals([(meal_name, cho_target, pro_target, fat_target, training_time)])[0]
+
+
+# =========================
+#  PIANO DELLA GIORNATA
+# =========================
+# Record immutabili con __slots__ (nessun __dict__ per istanza). I nomi di
+# pasti e alimenti sono stringhe condivise (quelle di tabelle e template, o
+# ``sys.intern`` dopo pickle). Il risparmio per DayPlan è piccolo (~9%: il
+# grosso sono float e dizionari delle porzioni); per tenere in memoria
+# molti piani serve la forma colonnare di ``nutrition.planarray``.
+
+def _interned_portions(portions):
+    return {sys.intern(food): grams for food, grams in portions.items()}
+
+
+class MealSuggestion(NamedTuple):
+    """Piatto unico suggerito: porzioni {alimento: grammi} e macro (cho, pro, fat)."""
+    portions: dict
+    macros: tuple
+
+    def __reduce__(self):
+        return _meal_suggestion, tuple(self)
+
+
+def _meal_suggestion(portions, macros):
+    """Ricostruzione dopo pickle (cache SQLite, processi worker) con nomi condivisi."""
+    return MealSuggestion(_interned_portions(portions), macros)
+
+
+@dataclass(frozen=True, slots=True)
+class Profile:
+    """Profilo atleta (sezione 1)."""
+    age: int = 35
+    sex: str = "Maschio"
+    weight: float = 70.0
+    height: float = 175.0
+    activity_level: str = "Medio"
+    goal: str = "Leggero dimagrimento"
+
+
+@dataclass(frozen=True, slots=True)
+class Training:
+    """Allenamento del giorno (sezione 2) e parametri di sezione 4/4B."""
+    training_type: str = "Z2 / Endurance moderato"
+    session_importance: str = "Media"
+    duration_hours: float = 1.5
+    training_time: str = "Mattina presto"
+    cho_per_hour: float = 60
+    temp_condition: str = "Temperato"
+    sweat_rate: str = "Media"
+
+    @property
+    def has_session(self):
+        """True se c'è una seduta con durata > 0 (CHO durante, idratazione)."""
+        return self.training_type != REST_DAY and self.duration_hours > 0
+
+    @property
+    def effective_training_time(self):
+        """Orario usato per pattern e orari dei pasti."""
+        return self.training_time if self.training_type != REST_DAY else NO_TRAINING_TIME
+
+
+@dataclass(frozen=True, slots=True)
+class MealPlan:
+    """Un pasto: target teorici e piatto unico suggerito."""
+    name: str
+    perc: float
+    time: str
+    cho: float
+    pro: float
+    fat: float
+    portions: dict
+    macros: tuple
+
+    def __reduce__(self):
+        return _meal_plan, tuple(getattr(self, name) for name in _MEAL_FIELDS)
+
+
+def _meal_plan(name, perc, time, cho, pro, fat, portions, macros):
+    """Ricostruzione dopo pickle con nomi di pasto, orario e alimenti condivisi."""
+    return MealPlan(sys.intern(name), perc, sys.intern(time), cho, pro, fat, _interned_portions(portions), macros)
+
+
+_MEAL_FIELDS = tuple(f.name for f in fields(MealPlan))
+
+
+@dataclass(frozen=True, slots=True)
+class HydrationPlan:
+    """Acqua e sodio per la seduta (sezione 4B)."""
+    l_per_hour: float
+    total_liters: float
+    na_mg_per_hour: float
+    total_na_mg: float
+    bottles: float
+    pills: float
+
+
+@dataclass(frozen=True, slots=True)
+class EnergyPlan:
+    """Energia e macro totali del giorno (risultato di ``plan_energy``)."""
+    bmr: float
+    act_factor: float
+    base_tdee: float
+    training_kcal: float
+    day_tdee: float
+    delta_kcal: float
+    target_kcal: float
+    cho_g_per_kg: float
+    pro_g_per_kg: float
+    fat_g_per_kg: float
+    total_cho_g: float
+    total_pro_g: float
+    total_fat_g: float
+    macro_total_kcal: float
+
+
+ENERGY_FIELDS = tuple(f.name for f in fields(EnergyPlan))
+
+
+@dataclass(frozen=True, slots=True)
+class DayPlan:
+    """Risultato completo di ``plan_day``."""
+    profile: Profile
+    training: Training
+    bmr: float
+    act_factor: float
+    base_tdee: float
+    training_kcal: float
+    day_tdee: float
+    delta_kcal: float
+    target_kcal: float
+    cho_g_per_kg: float
+    pro_g_per_kg: float
+    fat_g_per_kg: float
+    total_cho_g: float
+    total_pro_g: float
+    total_fat_g: float
+    macro_total_kcal: float
+    cho_during_total: float
+    cho_outside: float
+    meals: tuple
+    hydration: Optional[HydrationPlan]
+
+
+def plan_hydration(training):
+    """
+    Acqua e sodio per la seduta. Ritorna None se non è previsto allenamento.
+    """
+    if not training.has_session:
+        return None
+    with span("hydration"):
+        hours = training.duration_hours
+        l_per_hour = hydration_rate(training.temp_condition, training.sweat_rate)
+        total_liters = l_per_hour * hours
+        na_mg_per_hour = sodium_rate(training.sweat_rate)
+        total_na_mg = na_mg_per_hour * hours
+        return HydrationPlan(
+            l_per_hour=l_per_hour,
+            total_liters=total_liters,
+            na_mg_per_hour=na_mg_per_hour,
+            total_na_mg=total_na_mg,
+            bottles=total_liters / BOTTLE_SIZE_L,
+            pills=total_na_mg / PILL_NA_MG,
+        )
+
+
+def plan_energy(profile, training):
+    """
+    Sezioni 1–3: energia e macro totali del giorno. Non dipende da CHO/ora,
+    temperatura e sudorazione né richiede il calcolo delle porzioni.
+    """
+    weight = profile.weight
+
+    # Energia
+    with span("bmr_tdee"):
+        bmr = calculate_bmr(weight, profile.height, profile.age, profile.sex)
+        act_factor = activity_factor(profile.activity_level)
+        base_tdee = bmr * act_factor
+        training_kcal = training_energy_cost(weight, training.duration_hours, training.training_type)
+        day_tdee = base_tdee + training_kcal
+        delta_kcal = goal_kcal_delta(profile.goal)
+        target_kcal = day_tdee + delta_kcal
+
+    # Macro
+    with span("macro_selection"):
+        pro_g_per_kg = choose_protein_g_per_kg(profile.goal)
+        total_pro_g = pro_g_per_kg * weight
+        fat_g_per_kg = choose_fat_g_per_kg(profile.goal)
+        total_fat_g = fat_g_per_kg * weight
+        cho_g_per_kg = choose_cho_g_per_kg(training.training_type, training.session_importance, profile.goal)
+        total_cho_g = cho_g_per_kg * weight
+        macro_total_kcal = total_pro_g * 4 + total_fat_g * 9 + total_cho_g * 4
+
+    return EnergyPlan(
+        bmr=bmr,
+        act_factor=act_factor,
+        base_tdee=base_tdee,
+        training_kcal=training_kcal,
+        day_tdee=day_tdee,
+        delta_kcal=delta_kcal,
+        target_kcal=target_kcal,
+        cho_g_per_kg=cho_g_per_kg,
+        pro_g_per_kg=pro_g_per_kg,
+        fat_g_per_kg=fat_g_per_kg,
+        total_cho_g=total_cho_g,
+        total_pro_g=total_pro_g,
+        total_fat_g=total_fat_g,
+        macro_total_kcal=macro_total_kcal,
+    )
+
+
+def _plan_energy_and_macros(profile, training):
+    """Sezioni 1–4 senza le porzioni: campi del DayPlan e richieste per i pasti."""
+    energy = plan_energy(profile, training)
+
+    # CHO durante e fuori allenamento, distribuzione sui pasti
+    with span("meal_distribution"):
+        if training.has_session:
+            cho_during_total = training.cho_per_hour * training.duration_hours
+        else:
+            cho_during_total = 0.0
+        cho_outside = max(energy.total_cho_g - cho_during_total, 0)
+
+        meals = meal_pattern(training.effective_training_time)
+        pro_per_meal, fat_allocation = split_protein_fat_across_meals(energy.total_pro_g, energy.total_fat_g, meals)
+        requests = [
+            (name, cho_outside * perc, pro_per_meal, fat_allocation[i], training.training_time)
+            for i, (name, perc) in enumerate(meals)
+        ]
+
+    fields = dict(
+        profile=profile,
+        training=training,
+        **{name: getattr(energy, name) for name in ENERGY_FIELDS},
+        cho_during_total=cho_during_total,
+        cho_outside=cho_outside,
+    )
+    return fields, meals, requests
+
+
+def plan_days(days, suggest=None):
+    """
+    Piani per più giornate: ``days`` è una sequenza di (profile, training).
+    I pasti di tutte le giornate sono porzionati con una sola chiamata al
+    solver; ogni DayPlan è identico a quello di ``plan_day``.
+    ``suggest`` sostituisce ``suggest_meals`` (stessa firma), es. con una cache.
+    """
+    days = list(days)
+    with span("plan_days", days=len(days)):
+        return _plan_days(days, suggest or suggest_meals)
+
+
+def _plan_days(days, suggest):
+    drafts = [_plan_energy_and_macros(profile, training) for profile, training in days]
+    suggestions = iter(suggest([req for _, _, requests in drafts for req in requests]))
+
+    plans = []
+    for fields, meals, requests in drafts:
+        training = fields["training"]
+        meal_times = meal_times_suggestion(training.effective_training_time)
+        meal_plans = []
+        for (name, perc), (_, cho_meal, pro_meal, fat_meal, _), (portions, macros) in zip(meals, requests, suggestions):
+            meal_plans.append(MealPlan(
+                name=name,
+                perc=perc,
+                time=meal_times.get(name, ""),
+                cho=cho_meal,
+                pro=pro_meal,
+                fat=fat_meal,
+                portions=portions,
+                macros=macros,
+            ))
+        plans.append(DayPlan(**fields, meals=tuple(meal_plans), hydration=plan_hydration(training)))
+    return plans
+
+
+def plan_day(profile, training):
+    """
+    Calcola il piano completo della giornata (sezioni 1–4B dell'app).
+    Funzione pura: stessi input → stesso DayPlan.
+    """
+    return plan_days([(profile, training)])[0]
@@ -0,0 +1,461 @@
+"""
+Esportazione dei piani giornalieri: CSV/Parquet per l'analisi, iCalendar
+per il calendario, report HTML stampabile (PDF dal browser con "Stampa →
+Salva come PDF": stili di stampa A4 inclusi, nessuna dipendenza in più).
+
+Ogni writer consuma un iterabile di voci ``(chiave, giorno, DayPlan)``
+(chiave = id dell'atleta o del record, può essere None) e scrive man mano:
+nessun documento viene costruito per intero in memoria.
+
+- CSV e Parquet: una riga per alimento di ogni pasto (``ROW_FIELDS``), con
+  i target del pasto, le kcal del giorno e l'idratazione della seduta
+  ripetuti; il Parquet (``pyarrow``, opzionale) scrive un row group ogni
+  ``PARQUET_ROW_GROUP`` righe;
+- iCalendar: un evento per pasto nella finestra di ``meal_times_suggestion``
+  (primo intervallo "hh:mm–hh:mm" del testo; senza orari, evento di tutto il
+  giorno) più un evento di tutto il giorno per l'allenamento con CHO durante,
+  acqua e sodio;
+- HTML: una sezione per piano (energia, pasti con porzioni, idratazione),
+  una pagina stampata per piano.
+
+Esportazione in blocco da riga di comando, a memoria costante: i record
+JSONL (come per ``nutrition.cli``, più un ``date`` facoltativo) o gli atleti
+del registro (``nutrition.store``) vengono pianificati a blocchi di
+``--chunk-size`` e scritti subito.
+
+    python -m nutrition.export csv atleti.jsonl piani.csv
+    python -m nutrition.export parquet atleti.jsonl piani.parquet
+    python -m nutrition.export ics --store athletes.sqlite squadra.ics --date 2026-03-02
+    python -m nutrition.export html atleti.jsonl report.html
+"""
+
+import argparse
+import csv
+import hashlib
+import json
+import re
+import sys
+from datetime import date, datetime, timedelta, timezone
+from html import escape
+from itertools import islice
+
+from .engine import plan_days
+from .schema import inputs_from_record
+
+DEFAULT_CHUNK_SIZE = 512
+PARQUET_ROW_GROUP = 65536
+
+ROW_FIELDS = (
+    "id", "date", "target_kcal", "total_cho_g", "total_pro_g", "total_fat_g", "cho_during_total",
+    "meal", "meal_time", "meal_cho", "meal_pro", "meal_fat", "food", "grams",
+    "l_per_hour", "total_liters", "na_mg_per_hour", "total_na_mg",
+)
+# Tipi delle colonne per Parquet (gli altri campi sono numeri float64)
+_STRING_FIELDS = {"id", "meal", "meal_time", "food"}
+
+# Prima finestra oraria nel testo di meal_times_suggestion, es. "12:30–13:30"
+_WINDOW = re.compile(r"(\d{1,2})[:.](\d{2})\s*[–-]\s*(\d{1,2})[:.](\d{2})")
+
+
+# =========================
+#  RIGHE (CSV / PARQUET)
+# =========================
+
+def plan_rows(key, day, plan):
+    """Righe ``ROW_FIELDS`` di un piano: una per alimento di ogni pasto."""
+    hydration = plan.hydration
+    water = (
+        (hydration.l_per_hour, hydration.total_liters, hydration.na_mg_per_hour, hydration.total_na_mg)
+        if hydration is not None else (None, None, None, None)
+    )
+    head = (
+        None if key is None else str(key), day, plan.target_kcal,
+        plan.total_cho_g, plan.total_pro_g, plan.total_fat_g, plan.cho_during_total,
+    )
+    for meal in plan.meals:
+        for food, grams in meal.portions.items():
+            yield head + (meal.name, meal.time, meal.cho, meal.pro, meal.fat, food, grams) + water
+
+
+def write_csv(entries, out):
+    """CSV con intestazione ``ROW_FIELDS`` su un file di testo. Ritorna il numero di piani."""
+    writer = csv.writer(out, lineterminator="\n")
+    writer.writerow(ROW_FIELDS)
+    count = 0
+    for key, day, plan in entries:
+        writer.writerows(plan_rows(key, day, plan))
+        count += 1
+    return count
+
+
+def write_parquet(entries, path, row_group=PARQUET_ROW_GROUP):
+    """Parquet a row group di ``row_group`` righe (richiede ``pyarrow``). Ritorna il numero di piani."""
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise RuntimeError("l'esportazione Parquet richiede pyarrow (pip install pyarrow)") from None
+
+    schema = pa.schema([
+        (name, pa.string() if name in _STRING_FIELDS else pa.float64()) for name in ROW_FIELDS
+    ])
+    schema = schema.set(ROW_FIELDS.index("date"), pa.field("date", pa.date32()))
+    columns = [[] for _ in ROW_FIELDS]
+    count = 0
+
+    def flush(writer):
+        writer.write_table(pa.Table.from_arrays(
+            [pa.array(values, type=field.type) for values, field in zip(columns, schema)], schema=schema,
+        ))
+        for values in columns:
+            values.clear()
+
+    with pq.ParquetWriter(str(path), schema) as writer:
+        for key, day, plan in entries:
+            for row in plan_rows(key, day, plan):
+                for values, value in zip(columns, row):
+                    values.append(value)
+            count += 1
+            if len(columns[0]) >= row_group:
+                flush(writer)
+        if columns[0] or not count:
+            flush(writer)
+    return count
+
+
+# =========================
+#  ICALENDAR
+# =========================
+
+# Caratteri di controllo non ammessi nel testo iCalendar (RFC 5545, 3.3.11: solo HTAB)
+_ICS_CONTROL = re.compile(r"[\x00-\x08\x0a-\x1f\x7f]")
+# Chiavi usate così come sono nello UID; le altre diventano un hash
+_UID_SAFE = re.compile(r"[A-Za-z0-9._-]{1,64}")
+
+
+def _ics_text(value):
+    """Testo di una proprietà iCalendar (RFC 5545, 3.3.11), senza caratteri di controllo."""
+    text = str(value).replace("\r\n", "\n").replace("\r", "\n")
+    text = text.replace("\\", "\\\\").replace(";", "\\;").replace(",", "\\,").replace("\n", "\\n")
+    return _ICS_CONTROL.sub("", text)
+
+
+def _uid_key(key):
+    """Parte dello UID per la chiave di un record: la chiave se sicura, altrimenti il suo hash (stabile)."""
+    key = str(key)
+    if _UID_SAFE.fullmatch(key):
+        return key
+    return "h" + hashlib.blake2b(key.encode("utf-8"), digest_size=10).hexdigest()
+
+
+def _ics_line(line):
+    """Piegatura a 75 ottetti (RFC 5545, 3.1), senza spezzare caratteri UTF-8."""
+    data = line.encode("utf-8")
+    if len(data) <= 75:
+        return line + "\r\n"
+    parts = []
+    limit = 75
+    while data:
+        cut = min(limit, len(data))
+        while cut < len(data) and (data[cut] & 0xC0) == 0x80:
+            cut -= 1
+        parts.append(data[:cut].decode("utf-8"))
+        data = data[cut:]
+        limit = 74  # le righe di continuazione iniziano con uno spazio
+    return "\r\n ".join(parts) + "\r\n"
+
+
+def meal_window(day, time_text):
+    """(inizio, fine) datetime della prima finestra "hh:mm–hh:mm" nel testo, o None."""
+    match = _WINDOW.search(time_text)
+    if match is None:
+        return None
+    h1, m1, h2, m2 = map(int, match.groups())
+    if h1 > 23 or h2 > 23 or m1 > 59 or m2 > 59:
+        return None
+    start = datetime(day.year, day.month, day.day, h1, m1)
+    end = datetime(day.year, day.month, day.day, h2, m2)
+    if end <= start:
+        end += timedelta(days=1)
+    return start, end
+
+
+def _ics_event(uid, stamp, day, window, summary, description):
+    lines = ["BEGIN:VEVENT", f"UID:{uid}", f"DTSTAMP:{stamp}"]
+    if window is None:
+        lines.append(f"DTSTART;VALUE=DATE:{day:%Y%m%d}")
+        lines.append(f"DTEND;VALUE=DATE:{day + timedelta(days=1):%Y%m%d}")
+    else:
+        lines.append(f"DTSTART:{window[0]:%Y%m%dT%H%M%S}")
+        lines.append(f"DTEND:{window[1]:%Y%m%dT%H%M%S}")
+    lines.append(f"SUMMARY:{_ics_text(summary)}")
+    lines.append(f"DESCRIPTION:{_ics_text(description)}")
+    lines.append("END:VEVENT")
+    return "".join(_ics_line(line) for line in lines)
+
+
+def plan_events(key, day, plan, stamp=None):
+    """Testo iCalendar degli eventi (VEVENT) di un piano."""
+    stamp = stamp or datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    prefix = f"{_uid_key(key)}-" if key is not None else ""
+    who = f"{key}: " if key is not None else ""
+    events = []
+    for i, meal in enumerate(plan.meals):
+        cho, pro, fat = meal.macros
+        portions = "\n".join(f"{grams:.0f} g di {food}" for food, grams in meal.portions.items())
+        events.append(_ics_event(
+            uid=f"{prefix}{day:%Y%m%d}-{i}@smart-nutrition",
+            stamp=stamp,
+            day=day,
+            window=meal_window(day, meal.time),
+            summary=f"{who}{meal.name} – {cho:.0f} g CHO, {pro:.0f} g PRO, {fat:.0f} g FAT",
+            description=f"{meal.time}\n\n{portions}",
+        ))
+    if plan.hydration is not None:
+        h = plan.hydration
+        events.append(_ics_event(
+            uid=f"{prefix}{day:%Y%m%d}-training@smart-nutrition",
+            stamp=stamp,
+            day=day,
+            window=None,
+            summary=f"{who}{plan.training.training_type}: {plan.cho_during_total:.0f} g CHO, "
+                    f"{h.total_liters:.1f} L, {h.total_na_mg:.0f} mg Na",
+            description=(
+                f"CHO durante: {plan.training.cho_per_hour:g} g/h\n"
+                f"Acqua: {h.l_per_hour:.2f} L/h ({h.bottles:.1f} borracce)\n"
+                f"Sodio: {h.na_mg_per_hour:.0f} mg/h ({h.pills:.1f} compresse)"
+            ),
+        ))
+    return "".join(events)
+
+
+def write_ics(entries, out):
+    """Calendario iCalendar su un file di testo (aperto con ``newline=""``). Ritorna il numero di piani."""
+    stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    out.write("BEGIN:VCALENDAR\r\nVERSION:2.0\r\nPRODID:-//Smart Nutrition//Day Planner//IT\r\nCALSCALE:GREGORIAN\r\n")
+    count = 0
+    for key, day, plan in entries:
+        out.write(plan_events(key, day, plan, stamp))
+        count += 1
+    out.write("END:VCALENDAR\r\n")
+    return count
+
+
+# =========================
+#  REPORT HTML
+# =========================
+
+_HTML_HEAD = """<!DOCTYPE html>
+<html lang="it">
+<head>
+<meta charset="utf-8">
+<title>{title}</title>
+<style>
+body {{ font-family: system-ui, sans-serif; margin: 2rem; color: #222; }}
+section {{ margin-bottom: 3rem; }}
+table {{ border-collapse: collapse; margin: 0.5rem 0 1rem; }}
+th, td {{ border: 1px solid #ccc; padding: 0.25rem 0.5rem; text-align: left; vertical-align: top; }}
+td.n {{ text-align: right; }}
+ul {{ margin: 0; padding-left: 1.2rem; }}
+@page {{ size: A4; margin: 15mm; }}
+@media print {{
+  body {{ margin: 0; }}
+  section {{ break-after: page; margin: 0; }}
+  section:last-of-type {{ break-after: auto; }}
+}}
+</style>
+</head>
+<body>
+"""
+
+
+def plan_html(key, day, plan):
+    """Sezione HTML stampabile di un piano."""
+    title = f"{escape(str(key))} – " if key is not None else ""
+    meals = "\n".join(
+        "<tr>"
+        f"<td>{escape(meal.name)}</td><td>{escape(meal.time)}</td>"
+        f'<td class="n">{meal.cho:.0f}</td><td class="n">{meal.pro:.0f}</td><td class="n">{meal.fat:.0f}</td>'
+        "<td><ul>"
+        + "".join(f"<li>{grams:.0f} g di {escape(food)}</li>" for food, grams in meal.portions.items())
+        + "</ul></td></tr>"
+        for meal in plan.meals
+    )
+    if plan.hydration is not None:
+        h = plan.hydration
+        hydration = (
+            f"<p>CHO durante l'allenamento: <b>{plan.cho_during_total:.0f} g</b> "
+            f"({plan.training.cho_per_hour:g} g/h). "
+            f"Acqua: <b>{h.l_per_hour:.2f} L/h</b>, totale {h.total_liters:.2f} L ({h.bottles:.1f} borracce). "
+            f"Sodio: <b>{h.na_mg_per_hour:.0f} mg/h</b>, totale {h.total_na_mg:.0f} mg ({h.pills:.1f} compresse).</p>"
+        )
+    else:
+        hydration = "<p>Nessun allenamento previsto.</p>"
+    return (
+        f"<section>\n<h2>{title}{day:%d/%m/%Y}</h2>\n"
+        f"<p>{escape(plan.training.training_type)} · {plan.training.duration_hours:.2f} h · "
+        f"{escape(plan.profile.goal)}</p>\n"
+        "<table><tr><th>Kcal target</th><th>TDEE</th><th>CHO</th><th>PRO</th><th>FAT</th></tr>"
+        f'<tr><td class="n">{plan.target_kcal:.0f}</td><td class="n">{plan.day_tdee:.0f}</td>'
+        f'<td class="n">{plan.total_cho_g:.0f} g</td><td class="n">{plan.total_pro_g:.0f} g</td>'
+        f'<td class="n">{plan.total_fat_g:.0f} g</td></tr></table>\n'
+        "<h3>Pasti</h3>\n"
+        "<table><tr><th>Pasto</th><th>Orario</th><th>CHO (g)</th><th>PRO (g)</th><th>FAT (g)</th>"
+        f"<th>Porzioni</th></tr>\n{meals}\n</table>\n"
+        f"<h3>Allenamento</h3>\n{hydration}\n</section>\n"
+    )
+
+
+def write_html(entries, out, title="Piani nutrizionali"):
+    """Report HTML (una pagina stampata per piano) su un file di testo. Ritorna il numero di piani."""
+    out.write(_HTML_HEAD.format(title=escape(title)))
+    out.write(f"<h1>{escape(title)}</h1>\n")
+    count = 0
+    for key, day, plan in entries:
+        out.write(plan_html(key, day, plan))
+        count += 1
+    out.write("</body>\n</html>\n")
+    return count
+
+
+# (writer, modalità di apertura del file: "t" testo, "b" percorso gestito dal writer)
+FORMATS = {
+    "csv": (write_csv, "t"),
+    "parquet": (write_parquet, "b"),
+    "ics": (write_ics, "t"),
+    "html": (write_html, "t"),
+}
+
+
+# =========================
+#  SORGENTI IN BLOCCO
+# =========================
+
+def entries_from_lines(lines, day, chunk_size=DEFAULT_CHUNK_SIZE, on_error=None):
+    """
+    Voci da righe JSONL (record di ``nutrition.schema`` più ``date``
+    facoltativo, default ``day``), pianificate a blocchi di ``chunk_size``.
+    I record non validi vanno a ``on_error(numero di riga, errore)``: una
+    riga, qualunque sia l'errore, non interrompe l'esportazione.
+    """
+    line_no = 0
+    lines = iter(lines)
+    while True:
+        chunk = list(islice(lines, chunk_size))
+        if not chunk:
+            return
+        numbers, keys, days, inputs = [], [], [], []
+        for line in chunk:
+            line_no += 1
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+                if not isinstance(record, dict):
+                    raise ValueError("il record deve essere un oggetto JSON")
+                record = dict(record)
+                record_day = _record_day(record.pop("date")) if "date" in record else day
+                key, profile, training = inputs_from_record(record)
+            except Exception as exc:
+                _report(on_error, line_no, exc)
+                continue
+            numbers.append(line_no)
+            keys.append(key)
+            days.append(record_day)
+            inputs.append((profile, training))
+        if not inputs:
+            continue
+        try:
+            plans = plan_days(inputs)
+        except Exception:
+            # Un record che fa fallire il blocco: piani uno per uno, l'errore resta alla sua riga
+            plans = []
+            for number, day_inputs in zip(numbers, inputs):
+                try:
+                    plans.append(plan_days([day_inputs])[0])
+                except Exception as exc:
+                    _report(on_error, number, exc)
+                    plans.append(None)
+        for key, record_day, plan in zip(keys, days, plans):
+            if plan is not None:
+                yield key, record_day, plan
+
+
+def _report(on_error, line_no, exc):
+    if on_error is not None:
+        on_error(line_no, exc)
+
+
+def _record_day(value):
+    if not isinstance(value, str):
+        raise ValueError(f"date: attesa una data ISO (AAAA-MM-GG), trovato {value!r}")
+    return date.fromisoformat(value)
+
+
+def entries_from_store(store, day, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Voci per tutti gli atleti del registro (profilo e allenamento salvati) nel giorno ``day``."""
+    athletes = store.iter_athletes(batch_size=chunk_size)
+    while True:
+        chunk = list(islice(athletes, chunk_size))
+        if not chunk:
+            return
+        plans = plan_days([(athlete.profile, athlete.training) for athlete in chunk])
+        for athlete, plan in zip(chunk, plans):
+            yield athlete.athlete_id, day, plan
+
+
+# =========================
+#  RIGA DI COMANDO
+# =========================
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m nutrition.export", description="Esportazione dei piani")
+    parser.add_argument("format", choices=sorted(FORMATS))
+    parser.add_argument("input", nargs="?", help="record JSONL, - per stdin (oppure --store)")
+    parser.add_argument("output", help="file di uscita")
+    parser.add_argument("--store", help="registro atleti SQLite da esportare al posto dei record")
+    parser.add_argument("--date", type=date.fromisoformat, default=None, help="giorno dei piani (default oggi)")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    args = parser.parse_args(argv)
+    if (args.input is None) == (args.store is None):
+        parser.error("serve un file di record oppure --store")
+
+    day = args.date or date.today()
+    errors = 0
+
+    def report(line_no, exc):
+        nonlocal errors
+        errors += 1
+        print(f"riga {line_no}: {exc}", file=sys.stderr)
+
+    store = source = None
+    if args.store is not None:
+        from .store import AthleteStore
+
+        store = AthleteStore(args.store)
+        entries = entries_from_store(store, day, args.chunk_size)
+    else:
+        source = sys.stdin if args.input == "-" else open(args.input, encoding="utf-8")
+        entries = entries_from_lines(source, day, args.chunk_size, on_error=report)
+
+    writer, mode = FORMATS[args.format]
+    try:
+        if mode == "b":
+            count = writer(entries, args.output)
+        else:
+            with open(args.output, "w", encoding="utf-8", newline="") as out:
+                count = writer(entries, out)
+    except RuntimeError as exc:
+        print(exc, file=sys.stderr)
+        return 1
+    finally:
+        if source is not None and source is not sys.stdin:
+            source.close()
+        if store is not None:
+            store.close()
+    print(f"{count} piani esportati in {args.output} ({errors} record non validi)", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
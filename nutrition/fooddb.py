@@ -0,0 +1,307 @@
+"""
+Database alimenti colonnare: matrice alimento x nutriente (per 100 g) con id
+interi, salvabile in un file binario compatto e mappato in memoria.
+
+Formato del file (little endian):
+
+    header (64 byte)   magic "NFDB", versione, n_alimenti, n_nutrienti,
+                       offset/lunghezza di nomi alimenti, nomi nutrienti e matrice
+    nomi alimenti      UTF-8 separati da "\\n" (id = posizione)
+    nomi nutrienti     UTF-8 separati da "\\n"; le prime tre colonne sono
+                       sempre cho, pro, fat
+    matrice            float32 (n_alimenti, n_nutrienti), allineata a 64 byte
+
+La matrice è aperta con ``np.memmap`` in sola lettura: le pagine restano
+nella cache del sistema operativo e sono condivise tra sessioni Streamlit e
+processi worker, senza copie per processo.
+
+Uso da riga di comando per convertire un dump CSV (es. tabelle CREA/BDA):
+
+    python -m nutrition.fooddb import alimenti.csv alimenti.nfdb \\
+        --name-column Alimento --map cho=Carboidrati --map pro=Proteine --map fat=Lipidi
+    python -m nutrition.fooddb info alimenti.nfdb
+"""
+
+import argparse
+import csv
+import os
+import re
+import struct
+import sys
+from array import array
+from functools import lru_cache
+
+import numpy as np
+
+from .foods import FOODS_DB
+
+MAGIC = b"NFDB"
+VERSION = 1
+HEADER = struct.Struct("<4sIIIQQQQQQ")
+HEADER_SIZE = 64
+ALIGNMENT = 64
+
+# Le prime colonne della matrice, nell'ordine usato dal resto del motore
+MACROS = ("cho", "pro", "fat")
+
+# Variabile d'ambiente per usare un database esterno al posto di FOODS_DB
+FOOD_DB_ENV = "NUTRITION_FOOD_DB"
+
+# Valori non numerici tipici delle tabelle di composizione (tracce, n.d.)
+_MISSING_VALUES = {"", "-", "tr", "tracce", "n.d.", "nd", "na", "n/a"}
+# Con decimale "," il punto separa solo le migliaia (1.234 = 1234, 1.234,5)
+_GROUPED_NUMBER = re.compile(r"[+-]?\d{1,3}(\.\d{3})+(,\d*)?")
+# Delimitatore se il campione non basta a dedurlo (es. una sola colonna)
+DEFAULT_DELIMITER = ","
+
+
+class FoodTable:
+    """
+    Tabella di composizione: ``matrix[id]`` sono i nutrienti per 100 g
+    dell'alimento ``names[id]``; ``macros`` è la vista (n, 3) di cho/pro/fat.
+    """
+
+    def __init__(self, names, nutrients, matrix):
+        # Nomi internati: le porzioni di tutti i piani condividono le stesse stringhe
+        names = tuple(sys.intern(name) for name in names)
+        nutrients = tuple(nutrients)
+        if nutrients[:len(MACROS)] != MACROS:
+            raise ValueError(f"le prime colonne devono essere {MACROS}, trovate {nutrients[:3]}")
+        if matrix.shape != (len(names), len(nutrients)):
+            raise ValueError(f"matrice {matrix.shape} incoerente con {len(names)} alimenti e {len(nutrients)} nutrienti")
+        self.names = names
+        self.nutrients = nutrients
+        self.matrix = matrix
+        self.macros = matrix[:, :len(MACROS)]
+        self._ids = {name: i for i, name in enumerate(names)}
+        self._columns = {nutrient: j for j, nutrient in enumerate(nutrients)}
+
+    def __len__(self):
+        return len(self.names)
+
+    def __contains__(self, name):
+        return name in self._ids
+
+    def id_of(self, name, default=None):
+        """Id intero dell'alimento (o ``default`` se assente)."""
+        return self._ids.get(name, default)
+
+    def ids(self, names):
+        """Array di id; gli alimenti assenti ricevono -1."""
+        return np.fromiter((self._ids.get(name, -1) for name in names), dtype=np.int64)
+
+    def column(self, nutrient):
+        """Vista della colonna di un nutriente (per 100 g)."""
+        return self.matrix[:, self._columns[nutrient]]
+
+    def nutrients_for(self, food_ids, grams):
+        """
+        Nutrienti totali di un pasto: un solo prodotto vettore–matrice
+        (grammi / 100) @ righe della matrice. Gli id negativi sono ignorati.
+        """
+        food_ids = np.asarray(food_ids, dtype=np.int64)
+        grams = np.where(food_ids >= 0, np.asarray(grams, dtype=np.float64), 0.0)
+        return (grams / 100.0) @ self.matrix[np.maximum(food_ids, 0)]
+
+    def macros_for(self, food_ids, grams):
+        """Tupla (cho, pro, fat) totali per gli alimenti e i grammi indicati."""
+        food_ids = np.asarray(food_ids, dtype=np.int64)
+        grams = np.where(food_ids >= 0, np.asarray(grams, dtype=np.float64), 0.0)
+        return tuple(((grams / 100.0) @ self.macros[np.maximum(food_ids, 0)]).tolist())
+
+    @classmethod
+    def from_mapping(cls, foods):
+        """Tabella in memoria da un dizionario tipo FOODS_DB."""
+        extra = sorted({key for values in foods.values() for key in values} - set(MACROS))
+        nutrients = MACROS + tuple(extra)
+        matrix = np.array(
+            [[float(values.get(nutrient, 0.0)) for nutrient in nutrients] for values in foods.values()],
+            dtype=np.float32,
+        ).reshape(len(foods), len(nutrients))
+        return cls(foods.keys(), nutrients, matrix)
+
+    def save(self, path):
+        """Scrive la tabella nel formato binario NFDB."""
+        write_table(path, self.names, self.nutrients, self.matrix)
+
+
+def _aligned(offset):
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+def write_table(path, names, nutrients, matrix):
+    """Scrive nomi e matrice (n_alimenti, n_nutrienti) in un file NFDB."""
+    for name in names:
+        if "\n" in name:
+            raise ValueError(f"nome alimento con a capo: {name!r}")
+    names_blob = "\n".join(names).encode("utf-8")
+    nutrients_blob = "\n".join(nutrients).encode("utf-8")
+    matrix = np.ascontiguousarray(matrix, dtype="<f4")
+
+    names_offset = HEADER_SIZE
+    nutrients_offset = names_offset + len(names_blob)
+    matrix_offset = _aligned(nutrients_offset + len(nutrients_blob))
+
+    header = HEADER.pack(
+        MAGIC, VERSION, len(names), len(nutrients),
+        names_offset, len(names_blob),
+        nutrients_offset, len(nutrients_blob),
+        matrix_offset, matrix.nbytes,
+    )
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(header.ljust(HEADER_SIZE, b"\0"))
+        f.write(names_blob)
+        f.write(nutrients_blob)
+        f.write(b"\0" * (matrix_offset - nutrients_offset - len(nutrients_blob)))
+        f.write(matrix.tobytes())
+    os.replace(tmp_path, path)
+
+
+def load_table(path):
+    """Apre un file NFDB: matrice mappata in memoria in sola lettura."""
+    with open(path, "rb") as f:
+        raw = f.read(HEADER_SIZE)
+        (magic, version, n_foods, n_nutrients,
+         names_offset, names_size,
+         nutrients_offset, nutrients_size,
+         matrix_offset, matrix_size) = HEADER.unpack_from(raw)
+        if magic != MAGIC:
+            raise ValueError(f"{path}: non è un file NFDB")
+        if version != VERSION:
+            raise ValueError(f"{path}: versione NFDB {version} non supportata")
+        f.seek(names_offset)
+        names = f.read(names_size).decode("utf-8").split("\n") if n_foods else []
+        f.seek(nutrients_offset)
+        nutrients = f.read(nutrients_size).decode("utf-8").split("\n")
+
+    if matrix_size != n_foods * n_nutrients * 4:
+        raise ValueError(f"{path}: dimensione matrice incoerente")
+    if n_foods:
+        matrix = np.memmap(path, dtype="<f4", mode="r", offset=matrix_offset, shape=(n_foods, n_nutrients))
+    else:
+        matrix = np.zeros((0, n_nutrients), dtype="<f4")
+    return FoodTable(names, nutrients, matrix)
+
+
+@lru_cache(maxsize=None)
+def get_food_table():
+    """
+    Tabella alimenti del processo, caricata una sola volta: il file indicato
+    da $NUTRITION_FOOD_DB se presente, altrimenti FOODS_DB.
+    """
+    path = os.environ.get(FOOD_DB_ENV)
+    if path:
+        return load_table(path)
+    return FoodTable.from_mapping(FOODS_DB)
+
+
+# =========================
+#  IMPORT DA CSV
+# =========================
+
+def _parse_number(text, decimal):
+    text = text.strip()
+    if text.lower() in _MISSING_VALUES:
+        return 0.0
+    if decimal != ".":
+        if "." in text:
+            # "1.234" con decimale "," è 1234; "1.5" è ambiguo e va rifiutato
+            if decimal != "," or not _GROUPED_NUMBER.fullmatch(text):
+                raise ValueError(f"numero ambiguo con decimale {decimal!r}: {text!r}")
+            text = text.replace(".", "")
+        text = text.replace(decimal, ".")
+    return float(text)
+
+
+def import_csv(csv_path, out_path, name_column, columns, delimiter=None, decimal=None, encoding="utf-8-sig"):
+    """
+    Converte un dump CSV in un file NFDB leggendo una riga alla volta.
+
+    columns: dizionario {nutriente: colonna CSV}; deve contenere cho, pro e
+    fat, gli altri nutrienti vengono aggiunti dopo nell'ordine dato.
+    delimiter/decimal: se None vengono dedotti (";" e "," per i CSV italiani;
+    ``DEFAULT_DELIMITER`` se il delimitatore non si deduce). Con decimale ","
+    il punto vale solo come separatore delle migliaia (1.234 = 1234).
+    Righe con nome duplicato: vale la prima. Ritorna il numero di alimenti.
+    """
+    missing = [m for m in MACROS if m not in columns]
+    if missing:
+        raise ValueError(f"mancano le colonne per {missing}")
+    nutrients = MACROS + tuple(n for n in columns if n not in MACROS)
+
+    with open(csv_path, newline="", encoding=encoding) as f:
+        if delimiter is None:
+            try:
+                delimiter = csv.Sniffer().sniff(f.read(64 * 1024), delimiters=",;\t|").delimiter
+            except csv.Error:
+                delimiter = DEFAULT_DELIMITER
+            f.seek(0)
+        if decimal is None:
+            decimal = "," if delimiter == ";" else "."
+        reader = csv.DictReader(f, delimiter=delimiter)
+        absent = [c for c in (name_column, *columns.values()) if c not in (reader.fieldnames or ())]
+        if absent:
+            raise ValueError(f"colonne assenti nel CSV: {absent}")
+
+        names = []
+        seen = set()
+        values = array("f")
+        source_columns = [columns[n] for n in nutrients]
+        for line_no, row in enumerate(reader, start=2):
+            name = " ".join(row[name_column].split())
+            if not name or name in seen:
+                continue
+            try:
+                parsed = [_parse_number(row[col] or "", decimal) for col in source_columns]
+            except ValueError as exc:
+                raise ValueError(f"{csv_path}:{line_no}: {exc}") from None
+            seen.add(name)
+            names.append(name)
+            values.extend(parsed)
+
+    matrix = np.frombuffer(values, dtype=np.float32).reshape(len(names), len(nutrients))
+    write_table(out_path, names, nutrients, matrix)
+    return len(names)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m nutrition.fooddb", description="Database alimenti NFDB")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    imp = sub.add_parser("import", help="converte un CSV in NFDB")
+    imp.add_argument("csv_path")
+    imp.add_argument("out_path")
+    imp.add_argument("--name-column", required=True)
+    imp.add_argument("--map", action="append", default=[], metavar="NUTRIENTE=COLONNA",
+                     help="associa un nutriente a una colonna del CSV (ripetibile)")
+    imp.add_argument("--delimiter")
+    imp.add_argument("--decimal")
+    imp.add_argument("--encoding", default="utf-8-sig")
+
+    info = sub.add_parser("info", help="riepilogo di un file NFDB")
+    info.add_argument("path")
+
+    args = parser.parse_args(argv)
+    if args.command == "import":
+        columns = {}
+        for item in args.map:
+            nutrient, sep, column = item.partition("=")
+            if not sep:
+                parser.error(f"--map atteso NUTRIENTE=COLONNA, trovato {item!r}")
+            columns[nutrient.strip()] = column.strip()
+        try:
+            n = import_csv(args.csv_path, args.out_path, args.name_column, columns,
+                           delimiter=args.delimiter, decimal=args.decimal, encoding=args.encoding)
+        except (ValueError, OSError, csv.Error) as exc:
+            print(exc, file=sys.stderr)
+            return 1
+        print(f"{n} alimenti scritti in {args.out_path}")
+    else:
+        table = load_table(args.path)
+        print(f"{len(table)} alimenti, nutrienti: {', '.join(table.nutrients)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
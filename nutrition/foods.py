@@ -0,0 +1,54 @@
+"""
+Tabelle statiche: database alimenti e template dei pasti.
+
+Il modulo viene caricato una sola volta per processo: i rerun di Streamlit
+e i worker batch riusano gli stessi oggetti senza ricostruirli.
+"""
+
+# =========================
+#  DATABASE ALIMENTI & TEMPLATE PASTI
+# =========================
+
+# Valori nutrizionali indicativi per 100 g (o per unità indicata)
+# Sono stime semplificate per uso pratico, non valori da etichetta al milligrammo.
+FOODS_DB = {
+    "fiocchi di avena":        {"cho": 60, "pro": 13, "fat": 7},
+    "farina di avena":         {"cho": 60, "pro": 13, "fat": 7},
+    "banana":                  {"cho": 23, "pro": 1,  "fat": 0},
+    "kiwi":                    {"cho": 15, "pro": 1,  "fat": 0.5},
+    "mandorle":                {"cho": 22, "pro": 21, "fat": 50},
+    "albume":                  {"cho": 1,  "pro": 11, "fat": 0},
+    "riso basmati cotto":      {"cho": 28, "pro": 3,  "fat": 0.3},
+    "pasta integrale cotta":   {"cho": 25, "pro": 5,  "fat": 1.5},
+    "yogurt greco magro":        {"cho": 4,  "pro": 10, "fat": 0},
+    "petto di pollo":          {"cho": 0,  "pro": 31, "fat": 3},
+    "fesa di tacchino":        {"cho": 0,  "pro": 29, "fat": 2},
+    "merluzzo":                {"cho": 0,  "pro": 18, "fat": 0.8},
+    "uova intere":             {"cho": 1,  "pro": 13, "fat": 11},  # valori per 100 g (~2 uova medie)
+    "passata di pomodoro":     {"cho": 5,  "pro": 1.5,"fat": 0.5},
+    "tonno in scatola sgocciolato": {"cho": 0, "pro": 25, "fat": 8},
+    "patate dolci cotte":      {"cho": 20, "pro": 2,  "fat": 0.1},
+    "finocchi":                {"cho": 3,  "pro": 1,  "fat": 0},
+    "radicchio rosso":         {"cho": 3,  "pro": 1,  "fat": 0},
+    "minestrone leggerezza":   {"cho": 5,  "pro": 2,  "fat": 0.5},
+    "olio extravergine di oliva": {"cho": 0, "pro": 0, "fat": 100},
+    "miele":                   {"cho": 82, "pro": 0,  "fat": 0},
+    "marmellata":              {"cho": 60, "pro": 0,  "fat": 0},
+    "whey proteine":           {"cho": 6,  "pro": 80, "fat": 6},   # per 100 g di polvere
+    "legumi cotti":            {"cho": 16, "pro": 8,  "fat": 1.5}, # media ceci/fagioli/lenticchie
+    "ricotta senza lattosio":  {"cho": 3,  "pro": 9,  "fat": 10},
+    "fiocchi di latte":        {"cho": 3,  "pro": 13, "fat": 4},
+    "parmigiano grattugiato":  {"cho": 0,  "pro": 35, "fat": 28},
+    "latte senza lattosio":    {"cho": 5,  "pro": 3.5,"fat": 1.5},
+    "gallette di riso":        {"cho": 80, "pro": 7,  "fat": 2},
+}
+
+# Template di base per tipo di pasto
+# Ogni template è una lista di alimenti del FOODS_DB.
+MEAL_TEMPLATES = {
+    "colazione": ["fiocchi di avena", "yogurt greco magro", "banana", "mandorle"],
+    "spuntino": ["gallette di riso", "whey proteine", "mandorle"],
+    "post-allenamento": ["riso basmati cotto", "petto di pollo", "passata di pomodoro"],
+    "pranzo": ["riso basmati cotto", "petto di pollo", "olio extravergine di oliva", "finocchi"],
+    "cena": ["pasta integrale cotta", "tonno in scatola sgocciolato", "olio extravergine di oliva", "radicchio rosso"],
+}
@@ -0,0 +1,213 @@
+"""
+Lista della spesa: grammi totali per alimento su pasti, giorni e atleti,
+arrotondati a unità d'acquisto (confezioni, pezzi, kg).
+
+    groceries = GroceryList()
+    groceries.add_plans(plans)             # qualsiasi iterabile di DayPlan, anche pigro
+    for item in groceries.items():
+        print(item.food, item.grams, item.units, item.unit)
+
+L'accumulatore è indicizzato per id della tabella alimenti: ogni porzione
+diventa una coppia (id, grammi) in un buffer ``array``; ogni
+``buffer_size`` coppie un solo ``np.bincount`` le somma nel vettore dei
+totali (un float per alimento della tabella). Nessun dizionario da unire
+pasto per pasto: una stagione di un'intera squadra è un solo passaggio sui
+piani, a memoria costante. Gli alimenti fuori tabella (rari) finiscono in
+``unknown``.
+
+Le unità d'acquisto sono regole (``PURCHASE_UNITS`` per categoria,
+``FOOD_PURCHASE_UNITS`` per alimento in ``nutrition.rules``); il numero di
+unità è arrotondato per eccesso.
+
+Da riga di comando, dai record JSONL (uno per atleta e giorno, come per
+``nutrition.export``) o dagli atleti del registro, ripetendo ogni giorno
+``--days`` volte (una settimana tipo per la squadra):
+
+    python -m nutrition.grocery atleti.jsonl
+    python -m nutrition.grocery --store athletes.sqlite --days 7 -o spesa.tsv
+"""
+
+import argparse
+import math
+import sys
+from array import array
+from dataclasses import dataclass
+from datetime import date
+
+import numpy as np
+
+from .fooddb import get_food_table
+from .rules import DEFAULT_PURCHASE_UNIT, FOOD_CATEGORIES, FOOD_PURCHASE_UNITS, PURCHASE_UNITS
+
+DEFAULT_BUFFER_SIZE = 65536
+
+# Tolleranza sull'arrotondamento per eccesso (3.0000001 confezioni = 3)
+_UNIT_TOLERANCE = 1e-6
+
+
+@dataclass(frozen=True)
+class GroceryItem:
+    """Una voce della lista: grammi necessari e unità d'acquisto arrotondate per eccesso."""
+    food: str
+    category: str
+    grams: float
+    units: int
+    unit: str
+    unit_grams: float
+
+    @property
+    def purchase_grams(self):
+        return self.units * self.unit_grams
+
+
+def purchase_unit(food):
+    """(grammi per unità, nome dell'unità) di un alimento."""
+    if food in FOOD_PURCHASE_UNITS:
+        return FOOD_PURCHASE_UNITS[food]
+    return PURCHASE_UNITS.get(FOOD_CATEGORIES.get(food), DEFAULT_PURCHASE_UNIT)
+
+
+def purchase_units(grams, unit_grams):
+    """Unità da comprare per coprire ``grams`` (almeno una se serve qualcosa)."""
+    if grams <= 0:
+        return 0
+    return max(1, math.ceil(grams / unit_grams - _UNIT_TOLERANCE))
+
+
+class GroceryList:
+    """
+    Totali per alimento della tabella ``table`` (default quella del
+    processo). ``times`` ripete un pasto o un piano (es. stesso giorno per
+    più settimane) senza riaggiungerlo.
+    """
+
+    def __init__(self, table=None, buffer_size=DEFAULT_BUFFER_SIZE):
+        self.table = table if table is not None else get_food_table()
+        self.totals = np.zeros(len(self.table))
+        self.unknown = {}
+        self.plans = 0
+        self.meals = 0
+        self._buffer_size = buffer_size
+        self._ids = array("q")
+        self._grams = array("d")
+
+    def add_portions(self, portions, times=1):
+        """Aggiunge le porzioni di un pasto (alimento → grammi)."""
+        id_of = self.table.id_of
+        for food, grams in portions.items():
+            food_id = id_of(food, -1)
+            if food_id < 0:
+                self.unknown[food] = self.unknown.get(food, 0.0) + grams * times
+                continue
+            self._ids.append(food_id)
+            self._grams.append(grams * times)
+        self.meals += times
+        if len(self._ids) >= self._buffer_size:
+            self._flush()
+
+    def add_plan(self, plan, times=1):
+        """Aggiunge tutti i pasti di un ``DayPlan``."""
+        for meal in plan.meals:
+            self.add_portions(meal.portions, times)
+        self.plans += times
+
+    def add_plans(self, plans, times=1):
+        """Aggiunge un iterabile di ``DayPlan`` in un solo passaggio. Ritorna self."""
+        for plan in plans:
+            self.add_plan(plan, times)
+        return self
+
+    def _flush(self):
+        if not self._ids:
+            return
+        ids = np.frombuffer(self._ids, dtype=np.int64)
+        grams = np.frombuffer(self._grams, dtype=np.float64)
+        self.totals += np.bincount(ids, weights=grams, minlength=len(self.totals))
+        self._ids = array("q")
+        self._grams = array("d")
+
+    def grams(self):
+        """Grammi totali per nome di alimento (solo quelli usati)."""
+        self._flush()
+        totals = {self.table.names[i]: float(self.totals[i]) for i in np.flatnonzero(self.totals)}
+        for food, grams in self.unknown.items():
+            totals[food] = totals.get(food, 0.0) + grams
+        return totals
+
+    def items(self):
+        """Voci della lista per categoria e nome, con le unità d'acquisto."""
+        items = []
+        for food, grams in self.grams().items():
+            unit_grams, unit = purchase_unit(food)
+            items.append(GroceryItem(
+                food=food,
+                category=FOOD_CATEGORIES.get(food, "altro"),
+                grams=grams,
+                units=purchase_units(grams, unit_grams),
+                unit=unit,
+                unit_grams=unit_grams,
+            ))
+        items.sort(key=lambda item: (item.category, item.food))
+        return items
+
+
+# =========================
+#  RIGA DI COMANDO
+# =========================
+
+def main(argv=None):
+    from .export import DEFAULT_CHUNK_SIZE, entries_from_lines, entries_from_store
+
+    parser = argparse.ArgumentParser(prog="python -m nutrition.grocery", description="Lista della spesa aggregata")
+    parser.add_argument("input", nargs="?", help="record JSONL, - per stdin (oppure --store)")
+    parser.add_argument("--store", help="registro atleti SQLite al posto dei record")
+    parser.add_argument("--days", type=int, default=1, help="ripete ogni giorno N volte (default 1)")
+    parser.add_argument("--date", type=date.fromisoformat, default=None, help="giorno dei piani (default oggi)")
+    parser.add_argument("-o", "--output", help="file TSV di uscita (default stdout)")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    args = parser.parse_args(argv)
+    if (args.input is None) == (args.store is None):
+        parser.error("serve un file di record oppure --store")
+    if args.days < 1:
+        parser.error("--days deve essere >= 1")
+
+    day = args.date or date.today()
+
+    def report(line_no, exc):
+        print(f"riga {line_no}: {exc}", file=sys.stderr)
+
+    groceries = GroceryList()
+    if args.store is not None:
+        from .store import AthleteStore
+
+        store = AthleteStore(args.store)
+        try:
+            groceries.add_plans((plan for _, _, plan in entries_from_store(store, day, args.chunk_size)), args.days)
+        finally:
+            store.close()
+    else:
+        source = sys.stdin if args.input == "-" else open(args.input, encoding="utf-8")
+        try:
+            entries = entries_from_lines(source, day, args.chunk_size, on_error=report)
+            groceries.add_plans((plan for _, _, plan in entries), args.days)
+        finally:
+            if source is not sys.stdin:
+                source.close()
+
+    out = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+    try:
+        out.write("categoria\talimento\tgrammi\tunità\tn\tgrammi acquistati\n")
+        for item in groceries.items():
+            out.write(
+                f"{item.category}\t{item.food}\t{item.grams:.0f}\t{item.unit}\t"
+                f"{item.units}\t{item.purchase_grams:.0f}\n"
+            )
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    print(f"{groceries.plans} giorni, {groceries.meals} pasti", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,339 @@
+"""
+Test di carico dell'app Streamlit: N sessioni che modificano widget a caso.
+
+    python -m nutrition.loadtest --sessions 20 --changes 30              # server avviato qui
+    python -m nutrition.loadtest --url ws://127.0.0.1:8501 --server-pid 1234
+    python -m nutrition.loadtest --mode inprocess --sessions 5 -o report.json
+
+Ogni sessione fa un primo run e poi ``--changes`` modifiche casuali tra peso,
+tipo di allenamento, durata (ore/minuti), CHO/ora e sudorazione; ogni
+modifica è un rerun come nel browser: dell'intero script per profilo e
+allenamento, del solo frammento per CHO/ora e sudorazione (in ``inprocess``
+AppTest riesegue sempre tutto lo script).
+
+Modalità:
+
+- ``server`` (default): un vero server Streamlit (``streamlit run`` lanciato
+  su una porta libera, oppure ``--url`` di uno già avviato) e N sessioni
+  websocket concorrenti che parlano il protocollo del browser (BackMsg
+  ``rerun_script`` con lo stato dei widget, fine run = ``script_finished``).
+- ``inprocess``: N sessioni ``AppTest`` nello stesso processo. AppTest non è
+  thread-safe, quindi le sessioni si alternano su un thread: misura la
+  latenza di un rerun e la capacità di un singolo runner, non la contesa.
+
+Report: latenza dei rerun p50/p95/p99 (ms), throughput (rerun/s), errori e
+memoria per sessione (crescita della RSS del processo server, o di questo
+processo in ``inprocess``, divisa per il numero di sessioni).
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+from dataclasses import asdict, dataclass
+from pathlib import Path
+
+from .options import SWEAT_RATES, TRAINING_TYPES
+
+APP_PATH = Path(__file__).resolve().parent.parent / "smart_nutrition_app.py"
+STARTUP_TIMEOUT = 60.0
+
+# Widget modificati dalle sessioni (per etichetta) e generatori di valori
+CHANGES = (
+    ("Peso attuale (kg)", lambda rng: round(rng.uniform(50.0, 100.0) * 2) / 2),
+    ("Tipo di allenamento", lambda rng: rng.choice(TRAINING_TYPES)),
+    ("Ore", lambda rng: rng.randint(0, 4)),
+    ("Minuti", lambda rng: rng.choice((0, 15, 30, 45))),
+    ("Quanti g di CHO/ora vuoi assumere durante l'allenamento?", lambda rng: rng.randrange(20, 121, 5)),
+    ("Quanto sudi in genere?", lambda rng: rng.choice(SWEAT_RATES)),
+)
+
+
+@dataclass
+class LoadReport:
+    mode: str
+    sessions: int
+    reruns: int
+    errors: int
+    wall_seconds: float
+    throughput_rps: float
+    latency_ms: dict
+    memory_per_session_mb: float
+
+
+def percentile(sorted_values, q):
+    """Percentile con il metodo nearest-rank su valori già ordinati."""
+    if not sorted_values:
+        return None
+    rank = max(1, -(-len(sorted_values) * q // 100))
+    return sorted_values[int(rank) - 1]
+
+
+def rss_bytes(pid="self"):
+    """Memoria residente di un processo (Linux /proc); None se non disponibile."""
+    try:
+        with open(f"/proc/{pid}/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return None
+
+
+def _report(mode, sessions, latencies, errors, wall, rss_before, rss_after):
+    latencies = sorted(latencies)
+    if rss_before is not None and rss_after is not None:
+        per_session = (rss_after - rss_before) / sessions / 2**20
+    else:
+        per_session = float("nan")
+    return LoadReport(
+        mode=mode,
+        sessions=sessions,
+        reruns=len(latencies),
+        errors=errors,
+        wall_seconds=wall,
+        throughput_rps=len(latencies) / wall if wall else 0.0,
+        latency_ms={
+            "p50": percentile(latencies, 50) * 1e3 if latencies else None,
+            "p95": percentile(latencies, 95) * 1e3 if latencies else None,
+            "p99": percentile(latencies, 99) * 1e3 if latencies else None,
+            "mean": sum(latencies) / len(latencies) * 1e3 if latencies else None,
+            "max": latencies[-1] * 1e3 if latencies else None,
+        },
+        memory_per_session_mb=per_session,
+    )
+
+
+# =========================
+#  MODALITÀ IN-PROCESS (AppTest)
+# =========================
+
+def _apptest_widget(at, label):
+    for widgets in (at.number_input, at.selectbox, at.slider):
+        for widget in widgets:
+            if widget.label == label:
+                return widget
+    return None
+
+
+def run_inprocess(sessions, changes, seed=0, think=0.0):
+    from streamlit.testing.v1 import AppTest
+
+    rss_before = rss_bytes()
+    apps = []
+    for _ in range(sessions):
+        at = AppTest.from_file(str(APP_PATH), default_timeout=60)
+        at.run()
+        apps.append(at)
+    rss_after = rss_bytes()
+
+    rngs = [random.Random(seed + i) for i in range(sessions)]
+    latencies = []
+    errors = 0
+    start = time.perf_counter()
+    for _ in range(changes):
+        for at, rng in zip(apps, rngs):
+            label, value_for = rng.choice(CHANGES)
+            widget = _apptest_widget(at, label)
+            if widget is None:  # es. slider CHO nascosto nei giorni di riposo
+                continue
+            t0 = time.perf_counter()
+            widget.set_value(value_for(rng)).run()
+            latencies.append(time.perf_counter() - t0)
+            errors += len(at.exception)
+            if think:
+                time.sleep(rng.expovariate(1.0 / think))
+    wall = time.perf_counter() - start
+    return _report("inprocess", sessions, latencies, errors, wall, rss_before, rss_after)
+
+
+# =========================
+#  MODALITÀ SERVER (websocket)
+# =========================
+
+class _BrowserSession:
+    """
+    Sessione websocket che si comporta come il frontend: ricorda i widget
+    dell'ultimo run (etichetta → id, tipo e frammento) e a ogni rerun invia
+    lo stato di tutti i widget modificati. Un widget dentro un frammento
+    (``st.fragment``) chiede il rerun del solo frammento, come il browser.
+    """
+
+    def __init__(self, url, rng):
+        self.url = url.rstrip("/") + "/_stcore/stream"
+        self.rng = rng
+        self.widgets = {}  # label -> (id, tipo elemento, id frammento o "")
+        self.values = {}  # label -> valore corrente impostato dalla sessione
+        self.errors = 0
+
+    async def __aenter__(self):
+        import websockets
+        self.ws = await websockets.connect(self.url, max_size=None)
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.ws.close()
+
+    def _widget_states(self):
+        from streamlit.proto.WidgetStates_pb2 import WidgetStates
+
+        states = WidgetStates()
+        for label, value in self.values.items():
+            if label not in self.widgets:
+                continue
+            widget_id, kind, _ = self.widgets[label]
+            state = states.widgets.add()
+            state.id = widget_id
+            if kind == "selectbox":
+                state.string_value = value
+            elif kind == "slider":
+                state.double_array_value.data[:] = [float(value)]
+            else:
+                state.double_value = float(value)
+        return states
+
+    async def rerun(self, fragment_id=""):
+        """Un rerun (completo o del frammento); ritorna la latenza in secondi."""
+        from streamlit.proto.BackMsg_pb2 import BackMsg
+        from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+
+        msg = BackMsg()
+        msg.rerun_script.query_string = ""
+        msg.rerun_script.page_script_hash = ""
+        msg.rerun_script.widget_states.CopyFrom(self._widget_states())
+        msg.rerun_script.fragment_id = fragment_id
+        if not fragment_id:
+            self.widgets = {}  # solo i widget presenti nella pagina dopo il run
+        start = time.perf_counter()
+        await self.ws.send(msg.SerializeToString())
+        while True:
+            forward = ForwardMsg()
+            forward.ParseFromString(await self.ws.recv())
+            kind = forward.WhichOneof("type")
+            if kind == "delta" and forward.delta.WhichOneof("type") == "new_element":
+                element = forward.delta.new_element
+                element_type = element.WhichOneof("type")
+                if element_type == "exception":
+                    self.errors += 1
+                widget = getattr(element, element_type)
+                if getattr(widget, "id", "") and getattr(widget, "label", ""):
+                    self.widgets[widget.label] = (widget.id, element_type, forward.delta.fragment_id)
+            elif kind == "script_finished":
+                return time.perf_counter() - start
+
+    async def change_random_widget(self):
+        label, value_for = self.rng.choice(CHANGES)
+        self.values[label] = value_for(self.rng)
+        fragment_id = self.widgets[label][2] if label in self.widgets else ""
+        return await self.rerun(fragment_id)
+
+
+async def _session(url, changes, rng, think, latencies, ready, go):
+    async with _BrowserSession(url, rng) as session:
+        await session.rerun()
+        ready.release()
+        await go.wait()
+        for _ in range(changes):
+            latencies.append(await session.change_random_widget())
+            if think:
+                await asyncio.sleep(rng.expovariate(1.0 / think))
+        return session.errors
+
+
+async def _run_sessions(url, sessions, changes, seed, think, server_pid):
+    rss_before = rss_bytes(server_pid) if server_pid else None
+    latencies = []
+    ready = asyncio.Semaphore(0)
+    go = asyncio.Event()
+    tasks = [
+        asyncio.create_task(_session(url, changes, random.Random(seed + i), think, latencies, ready, go))
+        for i in range(sessions)
+    ]
+    for _ in range(sessions):  # tutte le sessioni aperte e al primo run completato
+        await ready.acquire()
+    rss_after = rss_bytes(server_pid) if server_pid else None
+    go.set()
+    start = time.perf_counter()
+    errors = sum(await asyncio.gather(*tasks))
+    wall = time.perf_counter() - start
+    return _report("server", sessions, latencies, errors, wall, rss_before, rss_after)
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def launch_server(port=None):
+    """Avvia ``streamlit run`` in headless e attende l'health check; ritorna (processo, url)."""
+    port = port or _free_port()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "streamlit", "run", str(APP_PATH),
+         "--server.headless", "true", "--server.port", str(port),
+         "--browser.gatherUsageStats", "false"],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    deadline = time.monotonic() + STARTUP_TIMEOUT
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"streamlit terminato con codice {process.returncode}")
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{port}/_stcore/health", timeout=1):
+                return process, f"ws://127.0.0.1:{port}"
+        except OSError:
+            time.sleep(0.2)
+    process.kill()
+    raise RuntimeError("streamlit non ha risposto all'health check")
+
+
+def run_server(sessions, changes, seed=0, think=0.0, url=None, server_pid=None):
+    process = None
+    if url is None:
+        process, url = launch_server()
+        server_pid = process.pid
+    try:
+        return asyncio.run(_run_sessions(url, sessions, changes, seed, think, server_pid))
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait(timeout=10)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m nutrition.loadtest", description="Test di carico dell'app")
+    parser.add_argument("--mode", choices=("server", "inprocess"), default="server")
+    parser.add_argument("-n", "--sessions", type=int, default=10)
+    parser.add_argument("-c", "--changes", type=int, default=20, help="modifiche di widget per sessione")
+    parser.add_argument("--think", type=float, default=0.0, help="pausa media tra modifiche (s)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--url", help="server già avviato, es. ws://127.0.0.1:8501 (solo modalità server)")
+    parser.add_argument("--server-pid", type=int, help="pid del server indicato con --url, per la memoria")
+    parser.add_argument("-o", "--output", help="salva il report JSON")
+    args = parser.parse_args(argv)
+    if args.sessions < 1 or args.changes < 0:
+        parser.error("servono almeno una sessione e un numero di modifiche >= 0")
+
+    if args.mode == "inprocess":
+        report = run_inprocess(args.sessions, args.changes, args.seed, args.think)
+    else:
+        report = run_server(args.sessions, args.changes, args.seed, args.think, args.url, args.server_pid)
+
+    lat = report.latency_ms
+    print(f"{report.mode}: {report.sessions} sessioni, {report.reruns} rerun in {report.wall_seconds:.1f} s "
+          f"→ {report.throughput_rps:.1f} rerun/s, {report.errors} errori")
+    if report.reruns:
+        print(f"latenza ms: p50 {lat['p50']:.1f}  p95 {lat['p95']:.1f}  p99 {lat['p99']:.1f}  max {lat['max']:.1f}")
+    print(f"memoria per sessione: {report.memory_per_session_mb:.2f} MB")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(asdict(report), f, indent=2)
+    return 1 if report.errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,30 @@
+"""
+Opzioni ammesse per gli input categoriali (le stesse dei selectbox dell'app).
+"""
+
+SEX_OPTIONS = ("Maschio", "Femmina")
+ACTIVITY_LEVELS = ("Basso (sedentario)", "Medio", "Alto (molto attivo)")
+GOALS = ("Mantenimento", "Leggero dimagrimento", "Leggera costruzione")
+
+REST_DAY = "Nessun allenamento / Riposo"
+TRAINING_TYPES = (
+    REST_DAY,
+    "Z2 / Endurance moderato",
+    "HIIT / Intervalli",
+    "Forza",
+    "Lungo / Gara / Uscita chiave",
+)
+IMPORTANCE_LEVELS = ("Bassa", "Media", "Alta / Chiave")
+
+NO_TRAINING_TIME = "Nessun allenamento / Non specificato"
+TRAINING_TIMES = (
+    NO_TRAINING_TIME,
+    "Mattina presto",
+    "Metà mattina",
+    "Pausa pranzo",
+    "Pomeriggio",
+    "Sera",
+)
+
+TEMP_CONDITIONS = ("Freddo", "Temperato", "Caldo", "Molto caldo")
+SWEAT_RATES = ("Bassa", "Media", "Alta")
@@ -0,0 +1,268 @@
+"""
+Forma colonnare dei piani giornalieri per i risultati in blocco: un array
+strutturato NumPy con una riga ``PLAN_DTYPE`` per piano (~700 byte, contro
+i ~3.5 kB di un ``DayPlan`` con pasti, dizionari delle porzioni e float
+Python).
+
+    plans = PlanArray.from_plans(plan_days(days))
+    plans.column("target_kcal")           # vista float64 (n,), nessuna copia
+    plans.meals["cho"]                    # vista (n, MAX_MEALS)
+    plans[10:20]                          # PlanArray, vista sulle stesse righe
+    plans[i]                              # DayPlan ricostruito
+    list(plans.to_plans())                # tutti i DayPlan, a blocchi
+
+Le righe si leggono e scrivono senza copie da qualsiasi buffer:
+``PlanArray(np.frombuffer(blob, PLAN_DTYPE))``, ``np.save`` /
+``np.load(path, mmap_mode="r")``, ``plans.records.data``. Gli id degli
+alimenti si riferiscono alla tabella alimenti con cui l'array è stato
+costruito (``table``).
+
+Contenuto di una riga:
+
+- profilo e allenamento: opzioni come codici int8 (indice nelle opzioni di
+  ``nutrition.options``; valori fuori elenco non sono ammessi), numeri in
+  float64;
+- i campi numerici del ``DayPlan`` in float64 (ricostruzione esatta);
+- fino a ``MAX_MEALS`` pasti: target, macro stimati e fino a ``MAX_FOODS``
+  porzioni come (id alimento, grammi), id -1 = vuoto. Nome, % e orario dei
+  pasti non si salvano: sono quelli del pattern dell'orario di allenamento;
+- idratazione: NaN senza seduta.
+
+Il ``DayPlan`` ricostruito usa le stringhe delle tabelle (opzioni, pattern
+dei pasti, nomi degli alimenti), le stesse dei piani calcolati dal motore.
+"""
+
+import math
+from dataclasses import fields
+from itertools import islice
+
+import numpy as np
+
+from .tables import MEAL_PATTERNS
+from .engine import (
+    ENERGY_FIELDS,
+    DayPlan,
+    HydrationPlan,
+    MealPlan,
+    Profile,
+    Training,
+    meal_pattern,
+    meal_times_suggestion,
+)
+from .fooddb import get_food_table
+from .foods import MEAL_TEMPLATES
+from .options import (
+    ACTIVITY_LEVELS,
+    GOALS,
+    IMPORTANCE_LEVELS,
+    SEX_OPTIONS,
+    SWEAT_RATES,
+    TEMP_CONDITIONS,
+    TRAINING_TIMES,
+    TRAINING_TYPES,
+)
+
+MAX_MEALS = max(len(pattern) for pattern in MEAL_PATTERNS)
+MAX_FOODS = max(len(foods) for foods in MEAL_TEMPLATES.values())
+DEFAULT_CHUNK_SIZE = 4096
+
+# Campi categoriali di Profile/Training → opzioni (codice = indice)
+CODED_FIELDS = {
+    "sex": SEX_OPTIONS,
+    "activity_level": ACTIVITY_LEVELS,
+    "goal": GOALS,
+    "training_type": TRAINING_TYPES,
+    "session_importance": IMPORTANCE_LEVELS,
+    "training_time": TRAINING_TIMES,
+    "temp_condition": TEMP_CONDITIONS,
+    "sweat_rate": SWEAT_RATES,
+}
+_CODES = {name: {option: code for code, option in enumerate(options)} for name, options in CODED_FIELDS.items()}
+
+PROFILE_FIELDS = tuple(f.name for f in fields(Profile))
+TRAINING_FIELDS = tuple(f.name for f in fields(Training))
+PLAN_FIELDS = ENERGY_FIELDS + ("cho_during_total", "cho_outside")
+HYDRATION_FIELDS = tuple(f.name for f in fields(HydrationPlan))
+
+MEAL_DTYPE = np.dtype([
+    ("cho", "f8"),
+    ("pro", "f8"),
+    ("fat", "f8"),
+    ("macros", "f8", (3,)),
+    ("foods", "i4", (MAX_FOODS,)),
+    ("grams", "f8", (MAX_FOODS,)),
+])
+PLAN_DTYPE = np.dtype(
+    [(name, "i1" if name in CODED_FIELDS else "f8") for name in PROFILE_FIELDS + TRAINING_FIELDS]
+    + [(name, "f8") for name in PLAN_FIELDS]
+    + [("n_meals", "u1"), ("meals", MEAL_DTYPE, (MAX_MEALS,))]
+    + [(name, "f8") for name in HYDRATION_FIELDS]
+)
+
+
+def _number(value):
+    """float64 → int se intero (età, CHO/ora come negli input dell'app), altrimenti float."""
+    return int(value) if value.is_integer() else value
+
+
+class PlanArray:
+    """Piani in un array strutturato ``PLAN_DTYPE`` (``records``), usato senza copie."""
+
+    def __init__(self, records, table=None):
+        if records.dtype != PLAN_DTYPE:
+            raise ValueError("records deve avere dtype PLAN_DTYPE")
+        self.records = records
+        self.table = table if table is not None else get_food_table()
+
+    @classmethod
+    def from_plans(cls, plans, table=None, chunk_size=DEFAULT_CHUNK_SIZE):
+        """Array da un iterabile (anche pigro) di ``DayPlan``, riempito a blocchi."""
+        table = table if table is not None else get_food_table()
+        plans = iter(plans)
+        chunks = []
+        while True:
+            chunk = list(islice(plans, chunk_size))
+            if not chunk:
+                break
+            records = np.zeros(len(chunk), dtype=PLAN_DTYPE)
+            _encode(records, chunk, table)
+            chunks.append(records)
+        if len(chunks) == 1:
+            return cls(chunks[0], table)
+        return cls(np.concatenate(chunks) if chunks else np.zeros(0, dtype=PLAN_DTYPE), table)
+
+    def __len__(self):
+        return len(self.records)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return PlanArray(self.records[index], self.table)
+        index = range(len(self.records))[index]
+        return _decode(self.records[index:index + 1], self.table)[0]
+
+    def column(self, name):
+        """Vista di un campo della riga (es. "target_kcal", "weight")."""
+        return self.records[name]
+
+    @property
+    def meals(self):
+        """Vista (n, MAX_MEALS) dei pasti; oltre ``n_meals`` le righe sono vuote."""
+        return self.records["meals"]
+
+    def to_plans(self, chunk_size=DEFAULT_CHUNK_SIZE):
+        """Generatore di ``DayPlan``, decodificati a blocchi di righe."""
+        for start in range(0, len(self.records), chunk_size):
+            yield from _decode(self.records[start:start + chunk_size], self.table)
+
+
+def _encode(records, plans, table):
+    for name in PROFILE_FIELDS:
+        records[name] = _encoded_column(name, [getattr(plan.profile, name) for plan in plans])
+    for name in TRAINING_FIELDS:
+        records[name] = _encoded_column(name, [getattr(plan.training, name) for plan in plans])
+    for name in PLAN_FIELDS:
+        records[name] = [getattr(plan, name) for plan in plans]
+    for name in HYDRATION_FIELDS:
+        records[name] = [
+            getattr(plan.hydration, name) if plan.hydration is not None else math.nan for plan in plans
+        ]
+
+    # Pasti: una lista per campo, poi una sola assegnazione per campo
+    rows, slots = [], []
+    targets, macros, food_ids, grams = [], [], [], []
+    n_meals = []
+    id_of = table.id_of
+    for row, plan in enumerate(plans):
+        pattern = meal_pattern(plan.training.effective_training_time)
+        if tuple(meal.name for meal in plan.meals) != tuple(name for name, _ in pattern):
+            raise ValueError(f"piano {row}: pasti diversi dal pattern dell'orario di allenamento")
+        n_meals.append(len(plan.meals))
+        for slot, meal in enumerate(plan.meals):
+            ids = [id_of(food, -1) for food in meal.portions]
+            if len(ids) > MAX_FOODS or -1 in ids:
+                raise ValueError(
+                    f"piano {row}, {meal.name}: porzioni non rappresentabili "
+                    f"(alimenti fuori tabella o più di {MAX_FOODS})"
+                )
+            padding = MAX_FOODS - len(ids)
+            rows.append(row)
+            slots.append(slot)
+            targets.append((meal.cho, meal.pro, meal.fat))
+            macros.append(meal.macros)
+            food_ids.append(ids + [-1] * padding)
+            grams.append(list(meal.portions.values()) + [0.0] * padding)
+    records["n_meals"] = n_meals
+    if rows:
+        meals = records["meals"]
+        targets = np.array(targets, dtype=np.float64)
+        meals["cho"][rows, slots] = targets[:, 0]
+        meals["pro"][rows, slots] = targets[:, 1]
+        meals["fat"][rows, slots] = targets[:, 2]
+        meals["macros"][rows, slots] = macros
+        meals["foods"][rows, slots] = food_ids
+        meals["grams"][rows, slots] = grams
+
+
+def _encoded_column(name, values):
+    codes = _CODES.get(name)
+    if codes is None:
+        return values
+    try:
+        return [codes[value] for value in values]
+    except KeyError as exc:
+        raise ValueError(f"{name}: valore fuori dalle opzioni: {exc.args[0]!r}") from None
+
+
+def _decoded_column(records, name):
+    options = CODED_FIELDS.get(name)
+    values = records[name].tolist()
+    if options is None:
+        return [_number(value) for value in values]
+    return [options[code] for code in values]
+
+
+def _decode(records, table):
+    """DayPlan delle righe di ``records`` (una conversione ``tolist`` per campo)."""
+    profiles = [
+        Profile(*values) for values in zip(*(_decoded_column(records, name) for name in PROFILE_FIELDS))
+    ]
+    trainings = [
+        Training(*values) for values in zip(*(_decoded_column(records, name) for name in TRAINING_FIELDS))
+    ]
+    numbers = zip(*(records[name].tolist() for name in PLAN_FIELDS))
+    hydration = zip(*(records[name].tolist() for name in HYDRATION_FIELDS))
+
+    meals = records["meals"]
+    meal_columns = zip(
+        records["n_meals"].tolist(), meals["cho"].tolist(), meals["pro"].tolist(), meals["fat"].tolist(),
+        meals["macros"].tolist(), meals["foods"].tolist(), meals["grams"].tolist(),
+    )
+    names = table.names
+
+    plans = []
+    for profile, training, values, water, (n_meals, cho, pro, fat, macros, foods, grams) in zip(
+        profiles, trainings, numbers, hydration, meal_columns,
+    ):
+        pattern = meal_pattern(training.effective_training_time)
+        times = meal_times_suggestion(training.effective_training_time)
+        day_meals = tuple(
+            MealPlan(
+                name=name,
+                perc=perc,
+                time=times.get(name, ""),
+                cho=cho[slot],
+                pro=pro[slot],
+                fat=fat[slot],
+                portions={names[food]: g for food, g in zip(foods[slot], grams[slot]) if food >= 0},
+                macros=tuple(macros[slot]),
+            )
+            for slot, (name, perc) in enumerate(pattern[:n_meals])
+        )
+        plans.append(DayPlan(
+            profile,
+            training,
+            *values,
+            meals=day_meals,
+            hydration=None if math.isnan(water[0]) else HydrationPlan(*water),
+        ))
+    return plans
@@ -0,0 +1,305 @@
+"""
+Strumentazione dei tempi: span annidati, export Chrome trace e metriche.
+
+Uso:
+
+    with profiling.Trace("rerun") as trace:
+        plan_day(profile, training)          # gli span del motore finiscono in ``trace``
+    trace.breakdown()                        # [(nome, profondità, ms, quota), ...]
+    trace.write_chrome("trace.json")         # chrome://tracing o https://ui.perfetto.dev
+
+Gli span si aprono con ``with span("nome"):`` (annidati) oppure, per codice
+lineare come lo script Streamlit, con ``section("nome")`` che chiude la
+sezione precedente e apre la successiva.
+
+Senza una ``Trace`` attiva nel contesto corrente (``contextvars``: ogni
+sessione Streamlit e ogni thread ha la sua), ``span`` ritorna un context
+manager vuoto condiviso: il costo è una lettura di ContextVar, nessuna
+allocazione.
+
+Ogni span chiuso aggiorna anche le metriche di processo (``METRICS``):
+contatori e istogrammi dei tempi per nome, esportati nel formato testuale
+di Prometheus da ``metrics_text()`` o da ``serve_metrics(port)``
+(``$NUTRITION_METRICS_PORT`` per l'app). ``$NUTRITION_PROFILE=1`` attiva la
+profilazione di default nel pannello di debug dell'app.
+"""
+
+import os
+import threading
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+
+PROFILE_ENV = "NUTRITION_PROFILE"
+METRICS_PORT_ENV = "NUTRITION_METRICS_PORT"
+
+# Limiti superiori (secondi) dei bucket degli istogrammi
+BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+_current = ContextVar("nutrition_trace", default=None)
+
+
+def enabled_by_env():
+    """True se $NUTRITION_PROFILE chiede la profilazione di default."""
+    return os.environ.get(PROFILE_ENV, "").strip().lower() not in ("", "0", "false", "no")
+
+
+# =========================
+#  SPAN E TRACCE
+# =========================
+
+@dataclass(frozen=True)
+class SpanEvent:
+    """Uno span chiuso: tempi in ns da ``time.perf_counter_ns``."""
+    name: str
+    start_ns: int
+    duration_ns: int
+    depth: int
+    thread_id: int
+    args: dict = field(default_factory=dict)
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    __slots__ = ("trace", "name", "args", "depth", "start_ns")
+
+    def __init__(self, trace, name, args):
+        self.trace = trace
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        self.depth = self.trace._depth
+        self.trace._depth += 1
+        self.start_ns = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        duration_ns = time.perf_counter_ns() - self.start_ns
+        self.trace._depth -= 1
+        self.trace.events.append(SpanEvent(
+            self.name, self.start_ns, duration_ns, self.depth, threading.get_ident(), self.args,
+        ))
+        METRICS.observe(self.name, duration_ns / 1e9)
+        return False
+
+
+class Trace:
+    """Raccoglie gli span aperti nel contesto corrente tra ``start`` e ``stop``."""
+
+    def __init__(self, name="trace"):
+        self.name = name
+        self.events = []
+        self.start_ns = None
+        self.end_ns = None
+        self._depth = 0
+        self._token = None
+        self._section = None
+
+    def start(self):
+        self._token = _current.set(self)
+        self.start_ns = time.perf_counter_ns()
+        return self
+
+    def stop(self):
+        if self._section is not None:
+            self._section.__exit__(None, None, None)
+            self._section = None
+        self.end_ns = time.perf_counter_ns()
+        if self._token is not None:
+            _current.reset(self._token)
+            self._token = None
+        return self
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+        return False
+
+    @property
+    def total_ms(self):
+        end = self.end_ns if self.end_ns is not None else time.perf_counter_ns()
+        return (end - self.start_ns) / 1e6
+
+    def breakdown(self):
+        """Span in ordine di inizio: lista di (nome, profondità, ms, quota del totale)."""
+        total = self.total_ms or 1.0
+        return [
+            (e.name, e.depth, e.duration_ns / 1e6, e.duration_ns / 1e6 / total)
+            for e in sorted(self.events, key=lambda e: (e.start_ns, e.depth))
+        ]
+
+    def to_chrome(self):
+        """Trace nel formato Chrome trace-event (eventi completi "X", tempi in µs)."""
+        pid = os.getpid()
+        events = [{
+            "name": self.name, "cat": "nutrition", "ph": "X", "pid": pid,
+            "tid": threading.get_ident(), "ts": 0.0, "dur": self.total_ms * 1e3, "args": {},
+        }]
+        for e in self.events:
+            events.append({
+                "name": e.name,
+                "cat": "nutrition",
+                "ph": "X",
+                "pid": pid,
+                "tid": e.thread_id,
+                "ts": (e.start_ns - self.start_ns) / 1e3,
+                "dur": e.duration_ns / 1e3,
+                "args": {k: v if isinstance(v, (int, float, str, bool)) else str(v) for k, v in e.args.items()},
+            })
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def write_chrome(self, path):
+        import json  # solo qui: il motore importa questo modulo a ogni avvio
+
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_chrome(), f)
+
+
+def current_trace():
+    return _current.get()
+
+
+def span(name, **args):
+    """Context manager che misura un blocco se c'è una Trace attiva."""
+    trace = _current.get()
+    if trace is None:
+        return _NULL_SPAN
+    return _Span(trace, name, args)
+
+
+def section(name):
+    """
+    Chiude la sezione aperta (se c'è) e ne apre una nuova di nome ``name``
+    (``None`` = chiudi soltanto). Per codice lineare senza blocchi ``with``.
+    """
+    trace = _current.get()
+    if trace is None:
+        return
+    if trace._section is not None:
+        trace._section.__exit__(None, None, None)
+        trace._section = None
+    if name is not None:
+        trace._section = _Span(trace, name, {}).__enter__()
+
+
+# =========================
+#  METRICHE
+# =========================
+
+class Metrics:
+    """Contatori e istogrammi dei tempi degli span, per nome (thread-safe)."""
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._series = {}  # nome -> [conteggi per bucket..., +Inf, somma]
+
+    def observe(self, name, seconds):
+        with self._lock:
+            series = self._series.get(name)
+            if series is None:
+                series = self._series[name] = [0] * (len(self.buckets) + 1) + [0.0]
+            for i, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    series[i] += 1
+                    break
+            else:
+                series[len(self.buckets)] += 1
+            series[-1] += seconds
+
+    def snapshot(self):
+        """{nome: {"count", "sum", "buckets": {limite: conteggio cumulativo}}}."""
+        with self._lock:
+            series = {name: list(values) for name, values in self._series.items()}
+        result = {}
+        for name, values in series.items():
+            cumulative = 0
+            buckets = {}
+            for bound, count in zip(self.buckets + (float("inf"),), values[:-1]):
+                cumulative += count
+                buckets[bound] = cumulative
+            result[name] = {"count": cumulative, "sum": values[-1], "buckets": buckets}
+        return result
+
+    def reset(self):
+        with self._lock:
+            self._series.clear()
+
+    def to_prometheus(self, prefix="nutrition_span"):
+        lines = [
+            f"# HELP {prefix}_seconds Durata degli span di pianificazione e rendering.",
+            f"# TYPE {prefix}_seconds histogram",
+        ]
+        for name, data in sorted(self.snapshot().items()):
+            label = name.replace("\\", "\\\\").replace('"', '\\"')
+            for bound, count in data["buckets"].items():
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f'{prefix}_seconds_bucket{{span="{label}",le="{le}"}} {count}')
+            lines.append(f'{prefix}_seconds_sum{{span="{label}"}} {data["sum"]!r}')
+            lines.append(f'{prefix}_seconds_count{{span="{label}"}} {data["count"]}')
+        return "\n".join(lines) + "\n"
+
+
+METRICS = Metrics()
+
+
+def metrics_text():
+    """Metriche di processo nel formato testuale di Prometheus."""
+    return METRICS.to_prometheus()
+
+
+_metrics_server = None
+_metrics_lock = threading.Lock()
+
+
+def serve_metrics(port, host="127.0.0.1"):
+    """
+    Espone ``/metrics`` su HTTP in un thread daemon (una volta per processo;
+    chiamate successive ritornano il server già avviato).
+    """
+    global _metrics_server
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?", 1)[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = metrics_text().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    with _metrics_lock:
+        if _metrics_server is None:
+            _metrics_server = ThreadingHTTPServer((host, port), Handler)
+            threading.Thread(target=_metrics_server.serve_forever, name="nutrition-metrics", daemon=True).start()
+        return _metrics_server
+
+
+def serve_metrics_from_env():
+    """Avvia ``serve_metrics`` se $NUTRITION_METRICS_PORT è impostata."""
+    port = os.environ.get(METRICS_PORT_ENV)
+    if port:
+        return serve_metrics(int(port))
+    return None
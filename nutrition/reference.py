@@ -0,0 +1,230 @@
+"""
+Logica di riferimento delle funzioni categoriali (versione originale con
+if/elif e dizionari costruiti a ogni chiamata).
+
+Non viene usata nel percorso caldo: ``nutrition.tables`` la valuta una volta
+su tutto il prodotto cartesiano delle opzioni per costruire le tabelle di
+lookup e ``verify_tables`` la usa per controllarle.
+"""
+
+def activity_factor(level):
+    """
+    Fattore di attività quotidiana NON sportiva.
+    """
+    mapping = {
+        "Basso (sedentario)": 1.2,
+        "Medio": 1.4,
+        "Alto (molto attivo)": 1.6,
+    }
+    return mapping.get(level, 1.4)
+
+
+def training_energy_cost(weight, duration_hours, training_type):
+    """
+    Stima molto semplificata del costo energetico dell'allenamento.
+   # Qui usiamo MET grezzi per tipo di attività, moltiplicati per peso e durata.
+    1 MET ~ 1 kcal/kg/h
+    """
+    # Valori indicativi, puoi affinarli
+    met_map = {
+        "Nessun allenamento / Riposo": 0.0,
+        "Z2 / Endurance moderato": 7.0,   # es. corsa/bici moderata
+        "HIIT / Intervalli": 9.0,         # intensità più alta
+        "Forza": 6.0,                     # sala pesi
+        "Lungo / Gara / Uscita chiave": 8.0,  # endurance lunga
+    }
+    met = met_map.get(training_type, 0.0)
+    kcal = met * weight * duration_hours
+    return kcal
+
+
+def choose_cho_g_per_kg(training_type, session_importance, goal):
+    """
+    Sceglie i g/kg di CHO in base al tipo di giorno,
+    importanza della seduta e obiettivo (mantenimento/dimagrimento/costruzione).
+    I range sono indicativi e basati sulle linee guida classiche.
+    """
+
+    # Range base per tipo di giorno (min, max)
+    base_ranges = {
+        "Nessun allenamento / Riposo": (3.0, 4.0),
+        "Z2 / Endurance moderato": (5.0, 6.0),
+        "HIIT / Intervalli": (5.5, 7.0),
+        "Forza": (5.0, 6.5),
+        "Lungo / Gara / Uscita chiave": (7.0, 9.0),
+    }
+
+    low, high = base_ranges.get(training_type, (4.0, 5.0))
+
+    # Scala in base all'importanza
+    if session_importance == "Bassa":
+        cho_g_per_kg = low
+    elif session_importance == "Media":
+        cho_g_per_kg = (low + high) / 2
+    else:  # Alta / Chiave
+        cho_g_per_kg = high
+
+    # Aggiustamento in base all'obiettivo
+    # Dimagrimento → abbassiamo leggermente, Costruzione → alziamo leggermente (entro range realistico)
+    if goal == "Leggero dimagrimento":
+        cho_g_per_kg = max(low, cho_g_per_kg - 0.3)
+    elif goal == "Leggera costruzione":
+        cho_g_per_kg = min(high, cho_g_per_kg + 0.3)
+
+    return cho_g_per_kg
+
+
+def choose_protein_g_per_kg(goal):
+    """
+    Proteine g/kg: valori per atleta endurance volume alto, >40 anni, con obiettivo di controllo peso.
+    """
+    if goal == "Leggera costruzione":
+        return 2.0
+    elif goal == "Leggero dimagrimento":
+        return 1.9
+    else:
+        return 1.8
+
+
+def choose_fat_g_per_kg(goal):
+    """
+    Grassi g/kg: minimo per salute + piccolo aggiustamento in base all'obiettivo.
+    """
+    if goal == "Leggera costruzione":
+        return 1.0
+    elif goal == "Leggero dimagrimento":
+        return 0.8
+    else:
+        return 0.9
+
+
+def goal_kcal_delta(goal):
+    """
+    Aggiustamento calorico giornaliero in base all'obiettivo.
+    """
+    if goal == "Mantenimento":
+        return 0
+    elif goal == "Leggero dimagrimento":
+        return -300  # deficit moderato
+    else:  # Leggera costruzione
+        return 200   # surplus moderato
+
+
+def meal_pattern(training_time):
+    """
+    Ritorna la lista dei pasti e le percentuali di CHO_fuori allenamento
+    in base all'orario principale dell'allenamento.
+    Le percentuali sommano a 1.0.
+    """
+    if training_time in ["Mattina presto", "Metà mattina"]:
+        # Allenamento mattutino
+        meals = [
+            ("Colazione (pre-allenamento)", 0.20),
+            ("Post-allenamento", 0.25),
+            ("Pranzo", 0.25),
+            ("Cena", 0.20),
+            ("Spuntini", 0.10),
+        ]
+    elif training_time == "Pausa pranzo":
+        meals = [
+            ("Colazione", 0.20),
+            ("Pranzo (pre o post)", 0.25),
+            ("Spuntino pomeriggio", 0.15),
+            ("Cena", 0.30),
+            ("Spuntini", 0.10),
+        ]
+    elif training_time in ["Pomeriggio", "Sera"]:
+        # Allenamento pomeridiano/serale
+        meals = [
+            ("Colazione", 0.15),
+            ("Pranzo", 0.25),
+            ("Spuntino pre-allenamento", 0.20),
+            ("Cena / Post-allenamento", 0.30),
+            ("Spuntini", 0.10),
+        ]
+    else:
+        # Nessun allenamento o orario non specificato → distribuzione più uniforme
+        meals = [
+            ("Colazione", 0.25),
+            ("Pranzo", 0.30),
+            ("Cena", 0.30),
+            ("Spuntini", 0.15),
+        ]
+    return meals
+
+
+def meal_times_suggestion(training_time):
+    """
+    Suggerisce orari indicativi per i pasti in base all'orario principale dell'allenamento.
+    Ritorna un dizionario {nome_pasto: orario_stringa}.
+    Gli orari sono indicativi e pensati per una routine "classica" (puoi poi personalizzarli).
+    """
+    if training_time in ["Mattina presto", "Metà mattina"]:
+        times = {
+            "Colazione (pre-allenamento)": "circa 60–90 min prima dell'allenamento (es. 5:30–6:00 se ti alleni alle 7:00)",
+            "Post-allenamento": "entro 60 min dalla fine (es. 8:30–9:00)",
+            "Pranzo": "12:30–13:30",
+            "Cena": "19:30–21:00",
+            "Spuntini": "a metà mattina/pomeriggio se serve, lontano >2 h dal sonno",
+        }
+    elif training_time == "Pausa pranzo":
+        times = {
+            "Colazione": "7:00–8:00",
+            "Pranzo (pre o post)": "subito dopo l'allenamento, idealmente entro 60 min (es. 13:30–14:30)",
+            "Spuntino pomeriggio": "16:00–17:00",
+            "Cena": "19:30–21:00",
+            "Spuntini": "eventuale spuntino serale leggero, 2–3 h prima di dormire",
+        }
+    elif training_time in ["Pomeriggio", "Sera"]:
+        times = {
+            "Colazione": "7:00–8:00",
+            "Pranzo": "12:30–13:30",
+            "Spuntino pre-allenamento": "60–120 min prima dell'allenamento (es. 16:30–17:00 se ti alleni alle 18:30)",
+            "Cena / Post-allenamento": "entro 1–2 h dalla fine dell'allenamento (es. 20:30–21:30)",
+            "Spuntini": "eventuale spuntino mattina o metà pomeriggio, a seconda della fame",
+        }
+    else:
+        # Nessun allenamento / generico
+        times = {
+            "Colazione": "7:00–8:30",
+            "Pranzo": "12:30–13:30",
+            "Cena": "19:30–21:00",
+            "Spuntini": "a metà mattina/pomeriggio se serve",
+        }
+    return times
+
+
+def hydration_rate(temp_condition, sweat_rate):
+    """Stima dei litri di acqua/ora in base a temperatura e sudorazione.
+    Ritorna L/h."""
+    # Base per sudorazione
+    base_map = {
+        "Bassa": 0.45,
+        "Media": 0.65,
+        "Alta": 0.85,
+    }
+    base = base_map.get(sweat_rate, 0.65)
+
+    # Fattore temperatura
+    temp_factor_map = {
+        "Freddo": 0.9,
+        "Temperato": 1.0,
+        "Caldo": 1.15,
+        "Molto caldo": 1.3,
+    }
+    temp_factor = temp_factor_map.get(temp_condition, 1.0)
+
+    return base * temp_factor
+
+
+def sodium_rate(sweat_rate):
+    """
+    Stima dei mg di sodio/ora in base alla sudorazione.
+    Ritorna mg/h.
+    """
+    sodium_map = {
+        "Bassa": 350,
+        "Media": 550,
+        "Alta": 800,
+    }
+    return sodium_map.get(sweat_rate, 550)
@@ -0,0 +1,148 @@
+"""
+Vista allenatore: target del giorno di tutta la rosa, con ordinamento,
+filtri e paginazione lato server.
+
+    roster = roster_targets(store.athletes())
+    result = query_roster(roster, search="ros", sort_by="target_kcal", descending=True, page=0)
+    for i in result.rows:
+        print(roster.athletes[i].name, roster.target_kcal[i])
+
+I target (kcal, CHO/PRO/FAT, CHO durante la seduta, acqua) sono calcolati
+per tutti gli atleti in un solo passaggio vettoriale (``batch.plan_batch``
+più CHO/ora e idratazione): nessuna porzione, nessun ``suggest_meal``. Il
+piano completo con i pasti di un atleta si calcola solo quando lo si apre
+(``plan_day`` o la cache dei piani).
+
+``query_roster`` filtra e ordina sugli array colonnari e ritorna solo gli
+indici della pagina richiesta (``RosterPage``): chi mostra la tabella
+costruisce le righe di una pagina, non dell'intera rosa.
+"""
+
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import NamedTuple
+
+import numpy as np
+
+from .batch import plan_batch
+from .engine import REST_DAY, hydration_rate
+
+DEFAULT_PAGE_SIZE = 25
+
+# (colonna di Roster, intestazione) in ordine di tabella
+ROSTER_COLUMNS = (
+    ("name", "Atleta"),
+    ("training_type", "Allenamento"),
+    ("target_kcal", "Kcal"),
+    ("cho_g", "CHO (g)"),
+    ("pro_g", "PRO (g)"),
+    ("fat_g", "FAT (g)"),
+    ("cho_during_g", "CHO durante (g)"),
+    ("fluid_l", "Acqua (L)"),
+)
+SORT_KEYS = tuple(column for column, _ in ROSTER_COLUMNS)
+
+
+@dataclass(frozen=True, eq=False)
+class Roster:
+    """Target del giorno per atleta, in colonne allineate con ``athletes``."""
+    athletes: tuple
+    name: np.ndarray
+    training_type: np.ndarray
+    target_kcal: np.ndarray
+    cho_g: np.ndarray
+    pro_g: np.ndarray
+    fat_g: np.ndarray
+    cho_during_g: np.ndarray
+    fluid_l: np.ndarray
+    # Nomi in minuscolo per la ricerca
+    search_name: np.ndarray
+
+    def __len__(self):
+        return len(self.athletes)
+
+
+class RosterPage(NamedTuple):
+    """Indici degli atleti della pagina, atleti filtrati, pagina (da 0) e numero di pagine."""
+    rows: np.ndarray
+    total: int
+    page: int
+    pages: int
+
+
+def roster_targets(athletes):
+    """Target di tutti gli atleti (sequenza di ``store.Athlete``) in un passaggio vettoriale."""
+    return _roster_targets(tuple(athletes))
+
+
+@lru_cache(maxsize=8)
+def _roster_targets(athletes):
+    profiles = [athlete.profile for athlete in athletes]
+    trainings = [athlete.training for athlete in athletes]
+    names = np.array([athlete.name for athlete in athletes], dtype=str)
+    training_type = np.array([t.training_type for t in trainings], dtype=str)
+    duration = np.array([t.duration_hours for t in trainings], dtype=np.float64)
+
+    batch = plan_batch(
+        weight=[p.weight for p in profiles],
+        height=[p.height for p in profiles],
+        age=[p.age for p in profiles],
+        sex=[p.sex for p in profiles],
+        activity=[p.activity_level for p in profiles],
+        goal=[p.goal for p in profiles],
+        training_type=training_type,
+        duration=duration,
+        importance=[t.session_importance for t in trainings],
+    )
+
+    # CHO durante e acqua solo con una seduta (come Training.has_session)
+    session_hours = np.where((training_type != REST_DAY) & (duration > 0), duration, 0.0)
+    cho_per_hour = np.array([t.cho_per_hour for t in trainings], dtype=np.float64)
+    fluid_per_hour = np.array([hydration_rate(t.temp_condition, t.sweat_rate) for t in trainings], dtype=np.float64)
+
+    return Roster(
+        athletes=athletes,
+        name=names,
+        training_type=training_type,
+        target_kcal=batch.target_kcal,
+        cho_g=batch.cho_g,
+        pro_g=batch.pro_g,
+        fat_g=batch.fat_g,
+        cho_during_g=cho_per_hour * session_hours,
+        fluid_l=fluid_per_hour * session_hours,
+        search_name=np.char.lower(names),
+    )
+
+
+def query_roster(roster, search="", training_types=None, sort_by="name", descending=False,
+                 page=0, page_size=DEFAULT_PAGE_SIZE):
+    """
+    Pagina ``page`` (da 0, ricondotta all'ultima se oltre) degli atleti
+    filtrati e ordinati; gli indici si riferiscono a ``roster.athletes``.
+    ``search``: sottostringa del nome (senza distinzione di maiuscole);
+    ``training_types``: tipi di allenamento ammessi (None = tutti).
+    A parità di valore resta l'ordine della rosa.
+    """
+    if sort_by not in SORT_KEYS:
+        raise ValueError(f"colonna di ordinamento sconosciuta: {sort_by!r}")
+    mask = np.ones(len(roster), dtype=bool)
+    if search:
+        mask &= np.char.find(roster.search_name, search.lower()) >= 0
+    if training_types:
+        mask &= np.isin(roster.training_type, list(training_types))
+    selected = np.flatnonzero(mask)
+    total = len(selected)
+
+    key = getattr(roster, sort_by)[selected]
+    if descending:
+        # Sort stabile sull'ordine inverso, poi rovesciato: decrescente e
+        # pareggi nell'ordine della rosa
+        order = np.argsort(key[::-1], kind="stable")[::-1]
+        selected = selected[::-1][order]
+    else:
+        selected = selected[np.argsort(key, kind="stable")]
+
+    pages = max(1, -(-total // page_size))
+    page = min(max(page, 0), pages - 1)
+    start = page * page_size
+    return RosterPage(selected[start:start + page_size], total, page, pages)
@@ -0,0 +1,258 @@
+"""
+Regole dichiarative per classificare i pasti e porzionare i template.
+
+Le regole sono solo dati:
+
+- MEAL_TYPE_PATTERNS: sottostringhe del nome del pasto → tipo di pasto,
+  valutate in ordine (la prima che corrisponde vince);
+- FOOD_CATEGORIES: categoria di ogni alimento;
+- BASE_GRAMS: porzione base per (tipo di pasto, categoria), con un default
+  per tipo di pasto;
+- PORTION_BOUNDS: grammi minimi/massimi per categoria;
+- MEAL_CATEGORIES: categorie ammesse per tipo di pasto nelle alternative
+  (``nutrition.alternatives``);
+- PURCHASE_UNITS / FOOD_PURCHASE_UNITS: unità d'acquisto per categoria e per
+  singolo alimento (``nutrition.grocery``).
+
+``compile_rules`` le trasforma una sola volta in una tabella indicizzata per
+(tipo di pasto, id alimento) e in un template già pronto per ogni tipo di
+pasto (id, porzioni base e limiti): il costo per pasto non dipende dal
+numero di alimenti, categorie o template.
+"""
+
+import sys
+from dataclasses import dataclass
+from functools import lru_cache
+
+from .foods import MEAL_TEMPLATES
+
+DEFAULT_MEAL_TYPE = "pranzo"
+
+# Ordine significativo: "Cena / Post-allenamento" è un post-allenamento,
+# "Spuntino pomeriggio" non è un pranzo.
+MEAL_TYPE_PATTERNS = (
+    ("colazione", "colazione"),
+    ("post-allenamento", "post-allenamento"),
+    ("spuntino", "spuntino"),
+    ("pranzo", "pranzo"),
+    ("cena", "cena"),
+)
+
+FOOD_CATEGORIES = {
+    "fiocchi di avena": "cereali colazione",
+    "farina di avena": "cereali colazione",
+    "gallette di riso": "gallette",
+    "riso basmati cotto": "amidi",
+    "pasta integrale cotta": "amidi",
+    "patate dolci cotte": "amidi",
+    "banana": "frutta",
+    "kiwi": "frutta",
+    "mandorle": "frutta secca",
+    "yogurt greco magro": "yogurt",
+    "fiocchi di latte": "latticini",
+    "ricotta senza lattosio": "latticini",
+    "latte senza lattosio": "latticini",
+    "parmigiano grattugiato": "formaggi stagionati",
+    "petto di pollo": "proteici",
+    "fesa di tacchino": "proteici",
+    "merluzzo": "proteici",
+    "tonno in scatola sgocciolato": "proteici",
+    "legumi cotti": "proteici",
+    "uova intere": "uova",
+    "albume": "uova",
+    "whey proteine": "proteine in polvere",
+    "passata di pomodoro": "sughi",
+    "finocchi": "verdure",
+    "radicchio rosso": "verdure",
+    "minestrone leggerezza": "verdure",
+    "olio extravergine di oliva": "condimenti",
+    "miele": "dolcificanti",
+    "marmellata": "dolcificanti",
+}
+
+# Porzione base (g) per tipo di pasto e categoria; "*" = qualsiasi altra categoria
+_MAIN_MEAL_GRAMS = {
+    "amidi": 120,
+    "proteici": 120,
+    "condimenti": 10,  # ~1 cucchiaio
+    "formaggi stagionati": 10,
+    "*": 80,
+}
+BASE_GRAMS = {
+    "colazione": {
+        "cereali colazione": 50,
+        "yogurt": 150,
+        "frutta": 100,
+        "frutta secca": 10,
+        "condimenti": 10,
+        "*": 50,
+    },
+    "spuntino": {
+        "gallette": 20,  # ~2-3 gallette
+        "proteine in polvere": 30,  # ~1 misurino
+        "frutta secca": 10,
+        "condimenti": 10,
+        "*": 50,
+    },
+    "post-allenamento": {
+        "amidi": 120,
+        "proteici": 120,
+        "sughi": 80,
+        "condimenti": 10,
+        "*": 50,
+    },
+    "pranzo": _MAIN_MEAL_GRAMS,
+    "cena": _MAIN_MEAL_GRAMS,
+}
+
+# Limiti (min, max) in grammi per categoria, usati dal solver delle porzioni
+PORTION_BOUNDS = {
+    "cereali colazione": (30, 120),
+    "gallette": (10, 80),
+    "amidi": (60, 400),
+    "frutta": (50, 250),
+    "frutta secca": (0, 30),
+    "yogurt": (100, 300),
+    "latticini": (50, 250),
+    "formaggi stagionati": (0, 30),
+    "proteici": (60, 250),
+    "uova": (50, 200),
+    "proteine in polvere": (0, 40),
+    "sughi": (40, 200),
+    "verdure": (50, 300),
+    "condimenti": (0, 25),
+    "dolcificanti": (0, 30),
+}
+# Alimenti senza categoria (es. database esterno): limiti relativi alla porzione base
+DEFAULT_BOUND_FACTORS = (0.5, 3.0)
+
+# Categorie tra cui cercare combinazioni alternative al template, per tipo di pasto
+_MAIN_MEAL_CATEGORIES = (
+    "amidi", "proteici", "uova", "latticini", "formaggi stagionati",
+    "sughi", "verdure", "condimenti",
+)
+MEAL_CATEGORIES = {
+    "colazione": (
+        "cereali colazione", "gallette", "frutta", "frutta secca", "yogurt",
+        "latticini", "uova", "proteine in polvere", "dolcificanti",
+    ),
+    "spuntino": (
+        "cereali colazione", "gallette", "frutta", "frutta secca", "yogurt",
+        "latticini", "proteine in polvere", "dolcificanti",
+    ),
+    "post-allenamento": _MAIN_MEAL_CATEGORIES + ("frutta", "proteine in polvere"),
+    "pranzo": _MAIN_MEAL_CATEGORIES,
+    "cena": _MAIN_MEAL_CATEGORIES,
+}
+
+# Unità d'acquisto (grammi per unità, nome dell'unità) per la lista della
+# spesa; gli amidi sono in peso cotto come nelle porzioni
+PURCHASE_UNITS = {
+    "cereali colazione": (500, "confezione da 500 g"),
+    "gallette": (130, "confezione da 130 g"),
+    "amidi": (100, "100 g (peso cotto)"),
+    "frutta": (1000, "kg"),
+    "frutta secca": (200, "busta da 200 g"),
+    "yogurt": (170, "vasetto da 170 g"),
+    "latticini": (250, "confezione da 250 g"),
+    "formaggi stagionati": (100, "busta da 100 g"),
+    "proteici": (100, "100 g"),
+    "uova": (60, "uovo"),
+    "proteine in polvere": (1000, "barattolo da 1 kg"),
+    "sughi": (700, "bottiglia da 700 g"),
+    "verdure": (500, "500 g"),
+    "condimenti": (920, "bottiglia da 1 L"),
+    "dolcificanti": (400, "vasetto da 400 g"),
+}
+# Eccezioni per alimento (la confezione non è quella della categoria)
+FOOD_PURCHASE_UNITS = {
+    "latte senza lattosio": (1000, "litro"),
+    "albume": (500, "brick da 500 g"),
+    "tonno in scatola sgocciolato": (52, "scatoletta da 80 g"),
+}
+# Alimenti senza categoria (es. database esterno)
+DEFAULT_PURCHASE_UNIT = (100, "100 g")
+
+
+@dataclass(frozen=True)
+class MealTemplate:
+    """Template compilato di un tipo di pasto, pronto per il solver."""
+    meal_type: str
+    foods: tuple
+    food_ids: tuple
+    base: tuple
+    lower: tuple
+    upper: tuple
+
+
+class CompiledRules:
+    """
+    Regole compilate per una tabella alimenti: ``portion(meal_type, food_id)``
+    e ``template(meal_type)`` sono semplici accessi indicizzati.
+
+    Per ogni alimento si memorizza solo il codice di categoria; per ogni tipo
+    di pasto una tupla (base, min, max) per categoria. La memoria cresce con
+    il numero di alimenti, non con alimenti x tipi di pasto.
+    """
+
+    def __init__(self, table, templates=MEAL_TEMPLATES):
+        categories = sorted(set(FOOD_CATEGORIES.values()))
+        code_of = {category: code for code, category in enumerate(categories)}
+        uncategorized = len(categories)
+        self._category_of = tuple(
+            code_of.get(FOOD_CATEGORIES.get(food), uncategorized) for food in table.names
+        )
+        self._rules = {
+            meal_type: tuple(_portion_rule(meal_type, category) for category in categories + [None])
+            for meal_type in BASE_GRAMS
+        }
+
+        self._templates = {}
+        for meal_type, foods in templates.items():
+            specs = [_portion_rule(meal_type, FOOD_CATEGORIES.get(food)) for food in foods]
+            self._templates[meal_type] = MealTemplate(
+                meal_type=meal_type,
+                foods=tuple(sys.intern(food) for food in foods),
+                food_ids=tuple(table.id_of(food, -1) for food in foods),
+                base=tuple(spec[0] for spec in specs),
+                lower=tuple(spec[1] for spec in specs),
+                upper=tuple(spec[2] for spec in specs),
+            )
+
+    def portion(self, meal_type, food_id):
+        """(base, min, max) in grammi per un alimento in un tipo di pasto."""
+        rules = self._rules.get(meal_type, self._rules[DEFAULT_MEAL_TYPE])
+        return rules[self._category_of[food_id]]
+
+    def template(self, meal_type):
+        """Template compilato; tipi sconosciuti → template del pranzo."""
+        template = self._templates.get(meal_type)
+        if template is None:
+            template = self._templates[DEFAULT_MEAL_TYPE]
+        return template
+
+
+def _portion_rule(meal_type, category):
+    grams_by_category = BASE_GRAMS.get(meal_type, BASE_GRAMS[DEFAULT_MEAL_TYPE])
+    base = grams_by_category.get(category, grams_by_category["*"])
+    if category in PORTION_BOUNDS:
+        lower, upper = PORTION_BOUNDS[category]
+    else:
+        lower, upper = (base * f for f in DEFAULT_BOUND_FACTORS)
+    return base, min(lower, base), max(upper, base)
+
+
+@lru_cache(maxsize=1024)
+def classify_meal_name(meal_name):
+    """Tipo di pasto dal nome, secondo MEAL_TYPE_PATTERNS (con cache per nome)."""
+    name_lower = meal_name.lower()
+    for pattern, meal_type in MEAL_TYPE_PATTERNS:
+        if pattern in name_lower:
+            return meal_type
+    return DEFAULT_MEAL_TYPE
+
+
+@lru_cache(maxsize=4)
+def compile_rules(table):
+    """Compila le regole per la tabella alimenti (una volta per tabella)."""
+    return CompiledRules(table)
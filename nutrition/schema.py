@@ -0,0 +1,224 @@
+"""
+Conversione JSON ↔ dataclass del motore, condivisa da CLI e API HTTP.
+
+Input: un record è un oggetto JSON con i campi di ``Profile`` e ``Training``,
+piatti (``{"weight": 70, "training_type": "HIIT / Intervalli", ...}``) oppure
+annidati (``{"profile": {...}, "training": {...}}``); i campi mancanti
+prendono i default dell'app. Un eventuale ``"id"`` viene riportato
+nell'output.
+
+Output: dizionari di soli tipi JSON (numeri, stringhe, liste, oggetti).
+Errori di validazione → ``ValueError`` con un messaggio leggibile.
+
+``plan_records`` unisce le due cose per CLI e API: record → testo JSON dei
+piani, con un solo ``plan_days`` per tutti i record.
+"""
+
+import json
+from dataclasses import fields
+
+from .engine import DayPlan, HydrationPlan, MealPlan, Profile, Training, plan_days
+from .options import (
+    ACTIVITY_LEVELS,
+    GOALS,
+    IMPORTANCE_LEVELS,
+    SEX_OPTIONS,
+    SWEAT_RATES,
+    TEMP_CONDITIONS,
+    TRAINING_TIMES,
+    TRAINING_TYPES,
+)
+
+PROFILE_FIELDS = tuple(f.name for f in fields(Profile))
+TRAINING_FIELDS = tuple(f.name for f in fields(Training))
+# Default da un'istanza: con __slots__ l'attributo di classe è il descrittore
+DEFAULT_TRAINING_TIME = Training().training_time
+
+# Campi categoriali: valori ammessi
+CHOICES = {
+    "sex": SEX_OPTIONS,
+    "activity_level": ACTIVITY_LEVELS,
+    "goal": GOALS,
+    "training_type": TRAINING_TYPES,
+    "session_importance": IMPORTANCE_LEVELS,
+    "training_time": TRAINING_TIMES,
+    "temp_condition": TEMP_CONDITIONS,
+    "sweat_rate": SWEAT_RATES,
+}
+# Campi numerici: (tipo, minimo, massimo), stessi limiti dei widget dell'app
+NUMBERS = {
+    "age": (int, 10, 90),
+    "weight": (float, 35.0, 150.0),
+    "height": (float, 140.0, 210.0),
+    "duration_hours": (float, 0.0, 7.0),
+    "cho_per_hour": (float, 0.0, 120.0),
+}
+
+
+def _value(name, value):
+    if name in CHOICES:
+        if value not in CHOICES[name]:
+            raise ValueError(f"{name}: valore {value!r} non ammesso")
+        return value
+    kind, lower, upper = NUMBERS[name]
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        raise ValueError(f"{name}: atteso un numero, trovato {value!r}")
+    # Intervallo prima dell'intero: int() di inf/NaN solleverebbe altro che ValueError
+    if not lower <= value <= upper:
+        raise ValueError(f"{name}: {value!r} fuori intervallo [{lower}, {upper}]")
+    if kind is int and value != int(value):
+        raise ValueError(f"{name}: atteso un intero, trovato {value!r}")
+    return kind(value)
+
+
+def _build(cls, names, data):
+    if not isinstance(data, dict):
+        raise ValueError(f"{cls.__name__}: atteso un oggetto JSON, trovato {data!r}")
+    unknown = set(data) - set(names)
+    if unknown:
+        raise ValueError(f"campi sconosciuti per {cls.__name__}: {sorted(unknown)}")
+    return cls(**{name: _value(name, value) for name, value in data.items()})
+
+
+def profile_from_dict(data):
+    return _build(Profile, PROFILE_FIELDS, data)
+
+
+def training_from_dict(data):
+    return _build(Training, TRAINING_FIELDS, data)
+
+
+def inputs_from_record(record):
+    """(id, Profile, Training) da un record JSON piatto o annidato."""
+    if not isinstance(record, dict):
+        raise ValueError("il record deve essere un oggetto JSON")
+    record = dict(record)
+    record_id = record.pop("id", None)
+    profile_data = record.pop("profile", None)
+    training_data = record.pop("training", None)
+    if profile_data is None and training_data is None:
+        profile_data = {k: v for k, v in record.items() if k in PROFILE_FIELDS}
+        training_data = {k: v for k, v in record.items() if k not in PROFILE_FIELDS}
+    elif record:
+        raise ValueError(f"campi sconosciuti: {sorted(record)}")
+    return (
+        record_id,
+        profile_from_dict({} if profile_data is None else profile_data),
+        training_from_dict({} if training_data is None else training_data),
+    )
+
+
+def meal_request_from_dict(data):
+    """
+    Richiesta di un pasto singolo: {"meal_name", "cho", "pro", "fat",
+    "training_time"?} → tupla per ``suggest_meal``/``suggest_meals``.
+    """
+    if not isinstance(data, dict):
+        raise ValueError("la richiesta deve essere un oggetto JSON")
+    unknown = set(data) - {"meal_name", "cho", "pro", "fat", "training_time"}
+    if unknown:
+        raise ValueError(f"campi sconosciuti: {sorted(unknown)}")
+    meal_name = data.get("meal_name")
+    if not isinstance(meal_name, str) or not meal_name.strip():
+        raise ValueError("meal_name: atteso il nome del pasto")
+    targets = []
+    for name in ("cho", "pro", "fat"):
+        value = data.get(name)
+        if isinstance(value, bool) or not isinstance(value, (int, float)) or not 0 <= value <= 1000:
+            raise ValueError(f"{name}: atteso un numero di grammi in [0, 1000], trovato {value!r}")
+        targets.append(float(value))
+    training_time = _value("training_time", data.get("training_time", DEFAULT_TRAINING_TIME))
+    return (meal_name, *targets, training_time)
+
+
+def meal_to_dict(meal: MealPlan):
+    return {
+        "name": meal.name,
+        "perc": meal.perc,
+        "time": meal.time,
+        "cho": meal.cho,
+        "pro": meal.pro,
+        "fat": meal.fat,
+        "portions": meal.portions,
+        "macros": list(meal.macros),
+    }
+
+
+def hydration_to_dict(hydration: HydrationPlan):
+    if hydration is None:
+        return None
+    return {
+        "l_per_hour": hydration.l_per_hour,
+        "total_liters": hydration.total_liters,
+        "na_mg_per_hour": hydration.na_mg_per_hour,
+        "total_na_mg": hydration.total_na_mg,
+        "bottles": hydration.bottles,
+        "pills": hydration.pills,
+    }
+
+
+def day_plan_to_dict(plan: DayPlan):
+    """DayPlan completo come dizionario JSON (profilo e allenamento inclusi)."""
+    return {
+        "profile": {name: getattr(plan.profile, name) for name in PROFILE_FIELDS},
+        "training": {name: getattr(plan.training, name) for name in TRAINING_FIELDS},
+        "energy": {
+            "bmr": plan.bmr,
+            "act_factor": plan.act_factor,
+            "base_tdee": plan.base_tdee,
+            "training_kcal": plan.training_kcal,
+            "day_tdee": plan.day_tdee,
+            "delta_kcal": plan.delta_kcal,
+            "target_kcal": plan.target_kcal,
+        },
+        "macros": {
+            "cho_g_per_kg": plan.cho_g_per_kg,
+            "pro_g_per_kg": plan.pro_g_per_kg,
+            "fat_g_per_kg": plan.fat_g_per_kg,
+            "total_cho_g": plan.total_cho_g,
+            "total_pro_g": plan.total_pro_g,
+            "total_fat_g": plan.total_fat_g,
+            "macro_total_kcal": plan.macro_total_kcal,
+            "cho_during_total": plan.cho_during_total,
+            "cho_outside": plan.cho_outside,
+        },
+        "meals": [meal_to_dict(meal) for meal in plan.meals],
+        "hydration": hydration_to_dict(plan.hydration),
+    }
+
+
+def dumps(obj):
+    """JSON compatto UTF-8 (senza escape dei caratteri accentati)."""
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"))
+
+
+def plan_records(records):
+    """
+    Piani per una sequenza di record JSON già decodificati.
+    Ritorna, per ogni record, il testo JSON del piano (con l'``id`` del
+    record in testa, se presente) oppure l'eccezione ``ValueError`` di
+    validazione. Record identici sono calcolati e serializzati una volta.
+    """
+    results = [None] * len(records)
+    unique = {}  # (profile, training) -> posizione in ``days``
+    days = []
+    slots = []  # (posizione, id, posizione in days)
+    for i, record in enumerate(records):
+        try:
+            record_id, profile, training = inputs_from_record(record)
+        except ValueError as exc:
+            results[i] = exc
+            continue
+        key = (profile, training)
+        if key not in unique:
+            unique[key] = len(days)
+            days.append(key)
+        slots.append((i, record_id, unique[key]))
+
+    texts = [dumps(day_plan_to_dict(plan)) for plan in plan_days(days)] if days else []
+    for i, record_id, day in slots:
+        text = texts[day]
+        if record_id is not None:
+            text = f'{{"id":{dumps(record_id)},{text[1:]}'
+        results[i] = text
+    return results
@@ -0,0 +1,212 @@
+"""
+Indice di ricerca sui nomi degli alimenti e ricerca di sostituti.
+
+- Normalizzazione: minuscole, accenti rimossi, apostrofi/elisioni spezzate
+  ("dell'olio" → "olio"), articoli e preposizioni italiane ignorati.
+- Ricerca per prefisso: lista ordinata dei token con bisect, una parola
+  della query = un intervallo contiguo; più parole si intersecano.
+- Ricerca fuzzy: indice inverso di trigrammi (liste di id in array NumPy),
+  punteggio di Dice calcolato con un solo ``np.bincount``.
+- Sostituti: alimento con il profilo di macro per 100 g più vicino
+  (distanza euclidea su tutta la tabella, vettoriale).
+
+L'indice si costruisce una volta per processo e per tabella alimenti;
+le query non scorrono la lista dei nomi.
+"""
+
+import bisect
+import re
+import unicodedata
+from functools import lru_cache
+
+import numpy as np
+
+from .fooddb import get_food_table
+
+# Articoli, preposizioni articolate e congiunzioni da ignorare nelle query
+ITALIAN_STOPWORDS = frozenset({
+    "il", "lo", "la", "i", "gli", "le", "l", "un", "uno", "una",
+    "di", "del", "dello", "della", "dei", "degli", "delle", "dell", "d",
+    "a", "al", "allo", "alla", "ai", "agli", "alle", "all",
+    "da", "dal", "dallo", "dalla", "dai", "dagli", "dalle", "dall",
+    "in", "nel", "nello", "nella", "nei", "negli", "nelle", "nell",
+    "con", "su", "sul", "sulla", "per", "e", "ed", "o",
+})
+
+_SEPARATORS = re.compile(r"[^0-9a-z]+")
+
+
+def normalize_tokens(text):
+    """Token normalizzati (senza accenti, minuscoli, senza stopword)."""
+    decomposed = unicodedata.normalize("NFKD", text.casefold())
+    ascii_text = "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+    return [tok for tok in _SEPARATORS.split(ascii_text) if tok and tok not in ITALIAN_STOPWORDS]
+
+
+def stem(token):
+    """
+    Stemming minimo per singolare/plurale italiani: toglie la vocale finale
+    ("mandorle"/"mandorla" → "mandorl", "uova"/"uovo" → "uov").
+    """
+    if len(token) > 3 and token[-1] in "aeio":
+        return token[:-1]
+    return token
+
+
+def _trigrams(text):
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class FoodIndex:
+    """
+    Indice di prefissi e trigrammi su una lista di nomi (id = posizione).
+
+    Internamente gli alimenti sono rinumerati per "rango" (nome normalizzato
+    più corto prima, poi id): così i primi risultati di una query sono
+    semplicemente le prime posizioni vere di una maschera booleana.
+    """
+
+    def __init__(self, names):
+        self.names = tuple(names)
+        n = len(self.names)
+
+        keys = []
+        token_sets = []
+        for name in self.names:
+            tokens = normalize_tokens(name)
+            token_sets.append(set(tokens))
+            keys.append(" ".join(stem(tok) for tok in tokens))
+
+        lengths = np.array([len(key) for key in keys], dtype=np.int64)
+        self._by_rank = np.lexsort((np.arange(n), lengths))
+        rank_of = np.empty(n, dtype=np.intp)
+        rank_of[self._by_rank] = np.arange(n)
+
+        pairs = []
+        trigram_lists = {}
+        trigram_counts = np.zeros(n, dtype=np.int64)
+        for food_id in range(n):
+            rank = int(rank_of[food_id])
+            pairs.extend((tok, rank) for tok in token_sets[food_id])
+            grams = _trigrams(keys[food_id])
+            trigram_counts[rank] = len(grams)
+            for gram in grams:
+                trigram_lists.setdefault(gram, []).append(rank)
+
+        pairs.sort()
+        self._tokens = [tok for tok, _ in pairs]
+        self._token_ranks = np.array([rank for _, rank in pairs], dtype=np.intp)
+        self._postings = {gram: np.array(ranks, dtype=np.intp) for gram, ranks in trigram_lists.items()}
+        self._trigram_counts = trigram_counts
+
+    def __len__(self):
+        return len(self.names)
+
+    def _prefix_ranks(self, prefix):
+        lo = bisect.bisect_left(self._tokens, prefix)
+        hi = bisect.bisect_left(self._tokens, prefix + "\x7f", lo)
+        return self._token_ranks[lo:hi]
+
+    def prefix(self, query, limit=10):
+        """
+        Id degli alimenti in cui ogni parola della query è prefisso di una
+        parola del nome; nomi più corti prima.
+        """
+        tokens = normalize_tokens(query)
+        if not tokens:
+            return []
+        # Prima la parola più selettiva: se non trova nulla ci si ferma subito
+        ranges = sorted((self._prefix_ranks(tok) for tok in tokens), key=len)
+        if not len(ranges[0]):
+            return []
+        found = np.zeros(len(self.names), dtype=bool)
+        found[ranges[0]] = True
+        for ranks in ranges[1:]:
+            mask = np.zeros(len(self.names), dtype=bool)
+            mask[ranks] = True
+            found &= mask
+        ranks = np.flatnonzero(found)[:limit]
+        return self._by_rank[ranks].tolist()
+
+    def fuzzy(self, query, limit=10, min_score=0.3):
+        """
+        Ricerca tollerante agli errori di battitura: lista di (id, punteggio)
+        con punteggio di Dice sui trigrammi in [0, 1], decrescente.
+        """
+        key = " ".join(stem(tok) for tok in normalize_tokens(query))
+        if not key:
+            return []
+        grams = _trigrams(key)
+        postings = [self._postings[g] for g in grams if g in self._postings]
+        if not postings:
+            return []
+        common = np.bincount(np.concatenate(postings), minlength=len(self.names))
+        # Dice >= s implica trigrammi in comune >= s * |q| / (2 - s):
+        # si scartano subito quasi tutti i candidati.
+        need = max(1, int(np.ceil(min_score * len(grams) / (2.0 - min_score) - 1e-9)))
+        candidates = np.flatnonzero(common >= need)
+        scores = 2.0 * common[candidates] / (len(grams) + self._trigram_counts[candidates])
+        keep = scores >= min_score
+        candidates, scores = candidates[keep], scores[keep]
+        if len(candidates) > limit:
+            top = np.argpartition(-scores, limit - 1)[:limit]
+            candidates, scores = candidates[top], scores[top]
+        # A parità di punteggio vince il rango (nome più corto)
+        order = np.lexsort((candidates, -scores))
+        ids = self._by_rank[candidates[order]]
+        return list(zip(ids.tolist(), scores[order].tolist()))
+
+    def search(self, query, limit=10):
+        """Prefissi prima, poi completamento con i risultati fuzzy."""
+        ids = self.prefix(query, limit)
+        if len(ids) < limit:
+            seen = set(ids)
+            for food_id, _ in self.fuzzy(query, limit):
+                if food_id not in seen:
+                    ids.append(food_id)
+                    seen.add(food_id)
+                if len(ids) == limit:
+                    break
+        return ids
+
+
+@lru_cache(maxsize=4)
+def _index_for(table):
+    return FoodIndex(table.names)
+
+
+def get_food_index():
+    """Indice della tabella alimenti del processo (costruito una volta)."""
+    return _index_for(get_food_table())
+
+
+@lru_cache(maxsize=4)
+def _macro_columns(table):
+    # Colonne contigue float64: tre passate vettoriali per le distanze
+    macros = np.asarray(table.macros, dtype=np.float64)
+    return tuple(np.ascontiguousarray(macros[:, j]) for j in range(macros.shape[1]))
+
+
+def substitutes(food, limit=5, table=None):
+    """
+    Alimenti con profilo di macro (cho, pro, fat per 100 g) più vicino a
+    ``food``. Ritorna una lista di (nome, distanza) crescente, senza
+    l'alimento stesso. Solleva KeyError se l'alimento non è nel database.
+    """
+    table = get_food_table() if table is None else table
+    food_id = table.id_of(food)
+    if food_id is None:
+        raise KeyError(food)
+    columns = _macro_columns(table)
+    dist2 = np.zeros(len(table))
+    for col in columns:
+        diff = col - col[food_id]
+        dist2 += diff * diff
+    dist2[food_id] = np.inf
+    limit = min(limit, len(dist2) - 1)
+    if limit <= 0:
+        return []
+    top = np.argpartition(dist2, limit - 1)[:limit]
+    top = top[np.argsort(dist2[top], kind="stable")]
+    return [(table.names[i], float(np.sqrt(dist2[i]))) for i in top]
@@ -0,0 +1,449 @@
+"""
+Registro locale di atleti e piani generati (SQLite).
+
+    store = get_store()                               # $NUTRITION_STORE_DB o athletes.sqlite
+    store.upsert_athletes([Athlete("anna", "Anna", profile, training), ...])
+    store.save_plans([("anna", date(2026, 3, 2), plan), ...])
+    store.plans("anna", start, end)                   # [PlanSummary, ...] ordinati per data
+    store.season(start, end)                          # righe di tutti gli atleti, per atleta e data
+    store.season_totals(start, end)                   # stessi totali come array (atleti × giorni × totali)
+    store.plan_document("anna", date(2026, 3, 2))     # piano completo (dict JSON)
+
+Tabelle:
+
+- ``athletes``: profilo e ultimo allenamento (campi di ``Profile`` e
+  ``Training``), chiave l'id dell'atleta;
+- ``plans``: una riga per atleta e giorno con i totali del piano, chiave
+  primaria (athlete_id, date) in una tabella WITHOUT ROWID: le righe di un
+  atleta in un intervallo di date sono contigue su disco, e le letture per
+  data di tutta la squadra usano l'indice ``plans_date``;
+- ``plan_documents``: il piano completo in JSON (``schema.day_plan_to_dict``),
+  separato perché le viste di squadra leggono solo i totali;
+- ``plan_years``: gli stessi totali impacchettati per atleta e anno, un
+  array float64 (366 giorni × ``PLAN_TOTALS``, NaN = nessun piano). Una
+  stagione di 100 atleti sono 100 righe invece di 36500: ``season_totals``
+  la legge in pochi millisecondi come array NumPy.
+
+Scritture a blocchi: un ``executemany`` in una transazione per chiamata,
+con upsert (``ON CONFLICT DO UPDATE``). Connessioni dal pool di
+``nutrition.db`` (WAL, istruzioni preparate riusate tra le chiamate).
+
+Da riga di comando (record come quelli di ``nutrition.cli``, più ``name``):
+
+    python -m nutrition.store import athletes.sqlite squadra.jsonl
+    python -m nutrition.store info athletes.sqlite
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import date, timedelta
+from functools import lru_cache
+from typing import TYPE_CHECKING
+
+from .db import ConnectionPool
+from .engine import Profile, Training
+from .schema import PROFILE_FIELDS, TRAINING_FIELDS, day_plan_to_dict, dumps, inputs_from_record
+
+# NumPy serve solo ai blocchi annuali dei totali: importato da chi li usa
+if TYPE_CHECKING:
+    import numpy as np
+
+STORE_DB_ENV = "NUTRITION_STORE_DB"
+DEFAULT_STORE_PATH = "athletes.sqlite"
+
+PLAN_TOTALS = ("target_kcal", "day_tdee", "total_cho_g", "total_pro_g", "total_fat_g", "cho_during_total")
+_ATHLETE_COLUMNS = ("id", "name") + PROFILE_FIELDS + TRAINING_FIELDS
+_SQL_CHUNK = 500
+# Righe del blocco annuale di ``plan_years`` (anni bisestili inclusi)
+YEAR_DAYS = 366
+
+_SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS athletes (
+    id TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    {", ".join(f"{name} NOT NULL" for name in PROFILE_FIELDS + TRAINING_FIELDS)},
+    updated REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS athletes_name ON athletes (name);
+CREATE TABLE IF NOT EXISTS plans (
+    athlete_id TEXT NOT NULL REFERENCES athletes (id) ON DELETE CASCADE,
+    date TEXT NOT NULL,
+    {", ".join(f"{name} REAL NOT NULL" for name in PLAN_TOTALS)},
+    created REAL NOT NULL,
+    PRIMARY KEY (athlete_id, date)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS plans_date ON plans (date);
+CREATE TABLE IF NOT EXISTS plan_documents (
+    athlete_id TEXT NOT NULL,
+    date TEXT NOT NULL,
+    plan TEXT NOT NULL,
+    PRIMARY KEY (athlete_id, date),
+    FOREIGN KEY (athlete_id, date) REFERENCES plans (athlete_id, date) ON DELETE CASCADE
+);
+CREATE TABLE IF NOT EXISTS plan_years (
+    athlete_id TEXT NOT NULL REFERENCES athletes (id) ON DELETE CASCADE,
+    year INTEGER NOT NULL,
+    totals BLOB NOT NULL,
+    PRIMARY KEY (athlete_id, year)
+);
+"""
+
+_UPSERT_ATHLETE = (
+    f"INSERT INTO athletes ({', '.join(_ATHLETE_COLUMNS)}, updated) "
+    f"VALUES ({', '.join('?' * (len(_ATHLETE_COLUMNS) + 1))}) "
+    f"ON CONFLICT (id) DO UPDATE SET "
+    + ", ".join(f"{name} = excluded.{name}" for name in _ATHLETE_COLUMNS[1:] + ("updated",))
+)
+_SELECT_ATHLETES = f"SELECT {', '.join(_ATHLETE_COLUMNS)} FROM athletes"
+_UPSERT_PLAN = (
+    f"INSERT INTO plans (athlete_id, date, {', '.join(PLAN_TOTALS)}, created) "
+    f"VALUES ({', '.join('?' * (len(PLAN_TOTALS) + 3))}) "
+    f"ON CONFLICT (athlete_id, date) DO UPDATE SET "
+    + ", ".join(f"{name} = excluded.{name}" for name in PLAN_TOTALS + ("created",))
+)
+_UPSERT_DOCUMENT = (
+    "INSERT INTO plan_documents (athlete_id, date, plan) VALUES (?, ?, ?) "
+    "ON CONFLICT (athlete_id, date) DO UPDATE SET plan = excluded.plan"
+)
+_SELECT_PLANS = f"SELECT athlete_id, date, {', '.join(PLAN_TOTALS)} FROM plans"
+_UPSERT_YEAR = (
+    "INSERT INTO plan_years (athlete_id, year, totals) VALUES (?, ?, ?) "
+    "ON CONFLICT (athlete_id, year) DO UPDATE SET totals = excluded.totals"
+)
+# Estremi per intervalli aperti (date ISO confrontate come testo)
+_MIN_DATE = "0000-01-01"
+_MAX_DATE = "9999-12-31"
+
+
+@dataclass(frozen=True)
+class Athlete:
+    """Atleta del registro: profilo e ultimo allenamento (sezioni 1–2 dell'app)."""
+    athlete_id: str
+    name: str
+    profile: Profile
+    training: Training
+
+
+@dataclass(frozen=True)
+class PlanSummary:
+    """Totali di un piano salvato."""
+    athlete_id: str
+    date: date
+    target_kcal: float
+    day_tdee: float
+    total_cho_g: float
+    total_pro_g: float
+    total_fat_g: float
+    cho_during_total: float
+
+
+@dataclass(frozen=True)
+class SeasonTotals:
+    """
+    Totali dei piani di più atleti giorno per giorno: ``values[i, d, k]`` è
+    il totale ``PLAN_TOTALS[k]`` dell'atleta ``athlete_ids[i]`` il giorno
+    ``start + d`` (NaN se non c'è un piano salvato).
+    """
+    athlete_ids: tuple
+    start: date
+    values: "np.ndarray"
+
+    @property
+    def dates(self):
+        return [self.start + timedelta(days=d) for d in range(self.values.shape[1])]
+
+    def column(self, name):
+        """Matrice atleti × giorni di un totale (es. "target_kcal")."""
+        return self.values[:, :, PLAN_TOTALS.index(name)]
+
+
+def _as_date(day):
+    return date.fromisoformat(day) if isinstance(day, str) else day
+
+
+def _iso(day, default):
+    if day is None:
+        return default
+    return day if isinstance(day, str) else day.isoformat()
+
+
+def _plan_day(day):
+    """Data ISO di un piano da salvare (``date`` o stringa ISO)."""
+    if isinstance(day, str):
+        return date.fromisoformat(day).isoformat()
+    if isinstance(day, date):
+        return day.isoformat()
+    raise ValueError(f"data del piano: attesa una data o una stringa ISO, trovato {day!r}")
+
+
+def _athlete_from_row(row):
+    n_profile = len(PROFILE_FIELDS)
+    return Athlete(
+        athlete_id=row[0],
+        name=row[1],
+        profile=Profile(*row[2:2 + n_profile]),
+        training=Training(*row[2 + n_profile:]),
+    )
+
+
+def _summaries(rows):
+    fromisoformat = date.fromisoformat
+    return [PlanSummary(athlete_id, fromisoformat(day), *totals) for athlete_id, day, *totals in rows]
+
+
+class AthleteStore:
+    """Registro atleti e piani su un file SQLite."""
+
+    def __init__(self, path):
+        self.path = str(path)
+        self.pool = ConnectionPool(path)
+        with self.pool.connection() as conn:
+            conn.executescript(_SCHEMA)
+
+    def close(self):
+        self.pool.close()
+
+    # ---------- atleti ----------
+
+    def upsert_athletes(self, athletes):
+        """Inserisce o aggiorna gli atleti (un'unica transazione). Ritorna il numero di righe."""
+        now = time.time()
+        rows = [
+            (a.athlete_id, a.name,
+             *(getattr(a.profile, name) for name in PROFILE_FIELDS),
+             *(getattr(a.training, name) for name in TRAINING_FIELDS),
+             now)
+            for a in athletes
+        ]
+        with self.pool.transaction() as conn:
+            conn.executemany(_UPSERT_ATHLETE, rows)
+        return len(rows)
+
+    def athlete(self, athlete_id):
+        with self.pool.connection() as conn:
+            row = conn.execute(_SELECT_ATHLETES + " WHERE id = ?", (athlete_id,)).fetchone()
+        return _athlete_from_row(row) if row is not None else None
+
+    def athletes(self):
+        """Tutti gli atleti, per nome."""
+        with self.pool.connection() as conn:
+            rows = conn.execute(_SELECT_ATHLETES + " ORDER BY name, id").fetchall()
+        return [_athlete_from_row(row) for row in rows]
+
+    def iter_athletes(self, batch_size=1000):
+        """Tutti gli atleti per id, letti a pagine (memoria costante per rose grandi)."""
+        last_id = ""  # keyset sulla chiave primaria: ogni pagina riparte dall'ultimo id letto
+        while True:
+            with self.pool.connection() as conn:
+                rows = conn.execute(
+                    _SELECT_ATHLETES + " WHERE id > ? ORDER BY id LIMIT ?", (last_id, batch_size),
+                ).fetchall()
+            if not rows:
+                return
+            for row in rows:
+                yield _athlete_from_row(row)
+            last_id = rows[-1][0]
+
+    def delete_athlete(self, athlete_id):
+        """Elimina l'atleta e i suoi piani."""
+        with self.pool.transaction() as conn:
+            conn.execute("DELETE FROM athletes WHERE id = ?", (athlete_id,))
+
+    # ---------- piani ----------
+
+    def save_plans(self, entries, documents=True):
+        """
+        Salva i piani ``(athlete_id, data, DayPlan)`` (un'unica transazione;
+        un piano già presente per lo stesso giorno viene sostituito). La data
+        è obbligatoria: ``date`` o stringa ISO, altrimenti ValueError prima di
+        scrivere. Con ``documents=False`` salva solo i totali. Ritorna il
+        numero di piani.
+        """
+        now = time.time()
+        plans = []
+        docs = []
+        for athlete_id, day, plan in entries:
+            day = _plan_day(day)
+            plans.append((athlete_id, day, *(getattr(plan, name) for name in PLAN_TOTALS), now))
+            if documents:
+                docs.append((athlete_id, day, dumps(day_plan_to_dict(plan))))
+        import numpy as np
+
+        by_year = defaultdict(list)  # (atleta, anno) -> [(giorno dell'anno, totali)]
+        for athlete_id, day, *totals, _ in plans:
+            day = date.fromisoformat(day)
+            by_year[athlete_id, day.year].append((day.timetuple().tm_yday - 1, totals))
+        with self.pool.transaction() as conn:
+            conn.executemany(_UPSERT_PLAN, plans)
+            conn.executemany(_UPSERT_DOCUMENT, docs)
+            years = []
+            for (athlete_id, year), days in by_year.items():
+                row = conn.execute(
+                    "SELECT totals FROM plan_years WHERE athlete_id = ? AND year = ?", (athlete_id, year),
+                ).fetchone()
+                if row is None:
+                    block = np.full((YEAR_DAYS, len(PLAN_TOTALS)), np.nan)
+                else:
+                    block = np.frombuffer(row[0], dtype="<f8").reshape(YEAR_DAYS, len(PLAN_TOTALS)).copy()
+                for day_index, totals in days:
+                    block[day_index] = totals
+                years.append((athlete_id, year, block.tobytes()))
+            conn.executemany(_UPSERT_YEAR, years)
+        return len(plans)
+
+    def plans(self, athlete_id, start=None, end=None):
+        """Totali dei piani di un atleta tra ``start`` e ``end`` (inclusi), per data."""
+        with self.pool.connection() as conn:
+            rows = conn.execute(
+                _SELECT_PLANS + " WHERE athlete_id = ? AND date BETWEEN ? AND ? ORDER BY date",
+                (athlete_id, _iso(start, _MIN_DATE), _iso(end, _MAX_DATE)),
+            ).fetchall()
+        return _summaries(rows)
+
+    def season(self, start=None, end=None, athlete_ids=None):
+        """
+        Totali dei piani di più atleti (default: tutti) tra ``start`` e
+        ``end``, ordinati per atleta e data.
+        """
+        bounds = (_iso(start, _MIN_DATE), _iso(end, _MAX_DATE))
+        with self.pool.connection() as conn:
+            if athlete_ids is None:
+                rows = conn.execute(
+                    _SELECT_PLANS + " WHERE date BETWEEN ? AND ? ORDER BY athlete_id, date", bounds,
+                ).fetchall()
+            else:
+                athlete_ids = sorted(set(athlete_ids))
+                rows = []
+                for i in range(0, len(athlete_ids), _SQL_CHUNK):
+                    chunk = athlete_ids[i:i + _SQL_CHUNK]
+                    rows += conn.execute(
+                        _SELECT_PLANS
+                        + f" WHERE athlete_id IN ({','.join('?' * len(chunk))}) AND date BETWEEN ? AND ?"
+                        + " ORDER BY athlete_id, date",
+                        (*chunk, *bounds),
+                    ).fetchall()
+        return _summaries(rows)
+
+    def season_totals(self, start, end, athlete_ids=None):
+        """
+        ``SeasonTotals`` tra ``start`` e ``end`` (inclusi) per gli atleti
+        indicati (default: tutti quelli del registro, per id), dai blocchi
+        annuali di ``plan_years``.
+        """
+        start, end = _as_date(start), _as_date(end)
+        with self.pool.connection() as conn:
+            if athlete_ids is None:
+                athlete_ids = [row[0] for row in conn.execute("SELECT id FROM athletes ORDER BY id")]
+                rows = conn.execute(
+                    "SELECT athlete_id, year, totals FROM plan_years WHERE year BETWEEN ? AND ?",
+                    (start.year, end.year),
+                ).fetchall()
+            else:
+                athlete_ids = list(dict.fromkeys(athlete_ids))
+                rows = []
+                for i in range(0, len(athlete_ids), _SQL_CHUNK):
+                    chunk = athlete_ids[i:i + _SQL_CHUNK]
+                    rows += conn.execute(
+                        "SELECT athlete_id, year, totals FROM plan_years"
+                        f" WHERE athlete_id IN ({','.join('?' * len(chunk))}) AND year BETWEEN ? AND ?",
+                        (*chunk, start.year, end.year),
+                    ).fetchall()
+
+        import numpy as np
+
+        first = start.toordinal()
+        values = np.full((len(athlete_ids), max(end.toordinal() - first + 1, 0), len(PLAN_TOTALS)), np.nan)
+        index = {athlete_id: i for i, athlete_id in enumerate(athlete_ids)}
+        for athlete_id, year, blob in rows:
+            if athlete_id not in index:
+                continue
+            block = np.frombuffer(blob, dtype="<f8").reshape(YEAR_DAYS, len(PLAN_TOTALS))
+            year_first = date(year, 1, 1).toordinal()
+            lo = max(first, year_first)
+            hi = min(end.toordinal(), date(year, 12, 31).toordinal())
+            values[index[athlete_id], lo - first:hi - first + 1] = block[lo - year_first:hi - year_first + 1]
+        return SeasonTotals(tuple(athlete_ids), start, values)
+
+    def plan_document(self, athlete_id, day):
+        """Piano completo salvato (dict come ``schema.day_plan_to_dict``) o None."""
+        with self.pool.connection() as conn:
+            row = conn.execute(
+                "SELECT plan FROM plan_documents WHERE athlete_id = ? AND date = ?",
+                (athlete_id, _iso(day, None)),
+            ).fetchone()
+        return json.loads(row[0]) if row is not None else None
+
+    def counts(self):
+        """(atleti, piani) nel registro."""
+        with self.pool.connection() as conn:
+            return (
+                conn.execute("SELECT COUNT(*) FROM athletes").fetchone()[0],
+                conn.execute("SELECT COUNT(*) FROM plans").fetchone()[0],
+            )
+
+
+@lru_cache(maxsize=None)
+def get_store():
+    """Registro del processo: $NUTRITION_STORE_DB, altrimenti athletes.sqlite nella cartella corrente."""
+    return AthleteStore(os.environ.get(STORE_DB_ENV) or DEFAULT_STORE_PATH)
+
+
+# =========================
+#  RIGA DI COMANDO
+# =========================
+
+def athletes_from_lines(lines):
+    """Atleti da righe JSONL (record di ``nutrition.schema`` con ``id`` e ``name`` opzionale)."""
+    athletes = []
+    for line_no, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+            if not isinstance(record, dict):
+                raise ValueError("il record deve essere un oggetto JSON")
+            record = dict(record)
+            name = record.pop("name", None)
+            athlete_id, profile, training = inputs_from_record(record)
+            if athlete_id is None:
+                raise ValueError("manca l'id dell'atleta")
+        except ValueError as exc:
+            raise ValueError(f"riga {line_no}: {exc}") from None
+        athletes.append(Athlete(str(athlete_id), str(name or athlete_id), profile, training))
+    return athletes
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m nutrition.store", description="Registro atleti e piani")
+    commands = parser.add_subparsers(dest="command", required=True)
+    import_cmd = commands.add_parser("import", help="importa (o aggiorna) atleti da JSONL")
+    import_cmd.add_argument("db")
+    import_cmd.add_argument("input", help="file JSONL, - per stdin")
+    info_cmd = commands.add_parser("info", help="conteggi del registro")
+    info_cmd.add_argument("db")
+    args = parser.parse_args(argv)
+
+    store = AthleteStore(args.db)
+    if args.command == "import":
+        source = sys.stdin if args.input == "-" else open(args.input, encoding="utf-8")
+        with source:
+            try:
+                athletes = athletes_from_lines(source)
+            except ValueError as exc:
+                print(exc, file=sys.stderr)
+                return 1
+        print(f"{store.upsert_athletes(athletes)} atleti importati in {args.db}", file=sys.stderr)
+    else:
+        n_athletes, n_plans = store.counts()
+        print(f"{args.db}: {n_athletes} atleti, {n_plans} piani")
+    store.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
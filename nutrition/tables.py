@@ -0,0 +1,173 @@
+"""
+Tabelle di decisione precalcolate per le funzioni categoriali.
+
+Tutte le combinazioni delle opzioni (più una voce "sconosciuto" per i valori
+fuori elenco, che riproduce i default della logica originale) vengono
+valutate una sola volta con ``nutrition.reference`` al caricamento del
+modulo. Le funzioni del motore diventano un accesso ``INDEX.get(valore)``
+più una lettura in tabella (per le funzioni a più chiavi, un solo lookup
+su tupla per le combinazioni note).
+
+I valori numerici sono in ``memoryview`` di sola lettura su ``array('d')``:
+compatti, immutabili e leggibili da NumPy senza copie
+(``np.frombuffer``). Le tabelle multidimensionali sono appiattite in
+ordine C; gli helper ``*_offset`` calcolano la posizione.
+
+``python -m nutrition.tables`` esegue ``verify_tables`` e confronta ogni
+voce con la logica di riferimento.
+"""
+
+import sys
+from array import array
+from types import MappingProxyType
+
+from . import reference
+from .options import (
+    ACTIVITY_LEVELS,
+    GOALS,
+    IMPORTANCE_LEVELS,
+    SWEAT_RATES,
+    TEMP_CONDITIONS,
+    TRAINING_TIMES,
+    TRAINING_TYPES,
+)
+
+# Chiave usata per calcolare la voce "sconosciuto": non appartiene a nessuna opzione
+_UNKNOWN = None
+
+
+def _index(options):
+    return MappingProxyType({option: i for i, option in enumerate(options)})
+
+
+def _keys(options):
+    return tuple(options) + (_UNKNOWN,)
+
+
+def _frozen(values):
+    return memoryview(array("d", values)).toreadonly()
+
+
+ACTIVITY_INDEX = _index(ACTIVITY_LEVELS)
+GOAL_INDEX = _index(GOALS)
+TRAINING_TYPE_INDEX = _index(TRAINING_TYPES)
+IMPORTANCE_INDEX = _index(IMPORTANCE_LEVELS)
+TRAINING_TIME_INDEX = _index(TRAINING_TIMES)
+TEMP_INDEX = _index(TEMP_CONDITIONS)
+SWEAT_INDEX = _index(SWEAT_RATES)
+
+# Numero di voci per dimensione (opzioni + "sconosciuto")
+N_ACTIVITY = len(ACTIVITY_LEVELS) + 1
+N_GOALS = len(GOALS) + 1
+N_TRAINING_TYPES = len(TRAINING_TYPES) + 1
+N_IMPORTANCE = len(IMPORTANCE_LEVELS) + 1
+N_TRAINING_TIMES = len(TRAINING_TIMES) + 1
+N_TEMP = len(TEMP_CONDITIONS) + 1
+N_SWEAT = len(SWEAT_RATES) + 1
+
+
+def cho_offset(type_code, importance_code, goal_code):
+    """Posizione in CHO_G_PER_KG per i codici (tipo, importanza, obiettivo)."""
+    return (type_code * N_IMPORTANCE + importance_code) * N_GOALS + goal_code
+
+
+def hydration_offset(temp_code, sweat_code):
+    """Posizione in HYDRATION_RATE per i codici (temperatura, sudorazione)."""
+    return temp_code * N_SWEAT + sweat_code
+
+
+ACTIVITY_FACTOR = _frozen(reference.activity_factor(k) for k in _keys(ACTIVITY_LEVELS))
+# MET per tipo di allenamento = costo per 1 kg e 1 h
+TRAINING_MET = _frozen(reference.training_energy_cost(1.0, 1.0, k) for k in _keys(TRAINING_TYPES))
+PRO_G_PER_KG = _frozen(reference.choose_protein_g_per_kg(k) for k in _keys(GOALS))
+FAT_G_PER_KG = _frozen(reference.choose_fat_g_per_kg(k) for k in _keys(GOALS))
+GOAL_KCAL_DELTA = _frozen(reference.goal_kcal_delta(k) for k in _keys(GOALS))
+SODIUM_RATE = _frozen(reference.sodium_rate(k) for k in _keys(SWEAT_RATES))
+
+# [tipo allenamento, importanza, obiettivo]
+CHO_G_PER_KG = _frozen(
+    reference.choose_cho_g_per_kg(t, imp, goal)
+    for t in _keys(TRAINING_TYPES)
+    for imp in _keys(IMPORTANCE_LEVELS)
+    for goal in _keys(GOALS)
+)
+
+# [temperatura, sudorazione]
+HYDRATION_RATE = _frozen(
+    reference.hydration_rate(temp, sweat)
+    for temp in _keys(TEMP_CONDITIONS)
+    for sweat in _keys(SWEAT_RATES)
+)
+
+# Accesso diretto per le combinazioni note: un solo lookup su tupla
+CHO_BY_KEY = MappingProxyType({
+    (t, imp, goal): CHO_G_PER_KG[cho_offset(t_i, imp_i, g_i)]
+    for t_i, t in enumerate(TRAINING_TYPES)
+    for imp_i, imp in enumerate(IMPORTANCE_LEVELS)
+    for g_i, goal in enumerate(GOALS)
+})
+HYDRATION_BY_KEY = MappingProxyType({
+    (temp, sweat): HYDRATION_RATE[hydration_offset(temp_i, sweat_i)]
+    for temp_i, temp in enumerate(TEMP_CONDITIONS)
+    for sweat_i, sweat in enumerate(SWEAT_RATES)
+})
+
+# Per orario di allenamento: tupla immutabile di (pasto, %) e mappa degli
+# orari; nomi e orari internati (``sys.intern``), condivisi da tutti i piani
+MEAL_PATTERNS = tuple(
+    tuple((sys.intern(name), perc) for name, perc in reference.meal_pattern(k)) for k in _keys(TRAINING_TIMES)
+)
+MEAL_TIMES = tuple(
+    MappingProxyType({
+        sys.intern(name): sys.intern(time) for name, time in reference.meal_times_suggestion(k).items()
+    })
+    for k in _keys(TRAINING_TIMES)
+)
+
+
+def verify_tables():
+    """
+    Confronta ogni voce delle tabelle con la logica di riferimento.
+    Ritorna il numero di voci controllate; solleva AssertionError alla prima
+    differenza.
+    """
+    checks = 0
+
+    def check(name, key, got, expected):
+        nonlocal checks
+        checks += 1
+        if got != expected:
+            raise AssertionError(f"{name}{key}: tabella {got!r}, riferimento {expected!r}")
+
+    for i, k in enumerate(_keys(ACTIVITY_LEVELS)):
+        check("activity_factor", (k,), ACTIVITY_FACTOR[i], reference.activity_factor(k))
+    for i, k in enumerate(_keys(TRAINING_TYPES)):
+        check("training_met", (k,), TRAINING_MET[i], reference.training_energy_cost(1.0, 1.0, k))
+    for i, k in enumerate(_keys(GOALS)):
+        check("choose_protein_g_per_kg", (k,), PRO_G_PER_KG[i], reference.choose_protein_g_per_kg(k))
+        check("choose_fat_g_per_kg", (k,), FAT_G_PER_KG[i], reference.choose_fat_g_per_kg(k))
+        check("goal_kcal_delta", (k,), GOAL_KCAL_DELTA[i], reference.goal_kcal_delta(k))
+    for i, k in enumerate(_keys(SWEAT_RATES)):
+        check("sodium_rate", (k,), SODIUM_RATE[i], reference.sodium_rate(k))
+    for t_i, t in enumerate(_keys(TRAINING_TYPES)):
+        for imp_i, imp in enumerate(_keys(IMPORTANCE_LEVELS)):
+            for g_i, goal in enumerate(_keys(GOALS)):
+                check("choose_cho_g_per_kg", (t, imp, goal), CHO_G_PER_KG[cho_offset(t_i, imp_i, g_i)],
+                      reference.choose_cho_g_per_kg(t, imp, goal))
+    for temp_i, temp in enumerate(_keys(TEMP_CONDITIONS)):
+        for sweat_i, sweat in enumerate(_keys(SWEAT_RATES)):
+            check("hydration_rate", (temp, sweat), HYDRATION_RATE[hydration_offset(temp_i, sweat_i)],
+                  reference.hydration_rate(temp, sweat))
+    for key, value in CHO_BY_KEY.items():
+        check("choose_cho_g_per_kg", key, value, reference.choose_cho_g_per_kg(*key))
+    for key, value in HYDRATION_BY_KEY.items():
+        check("hydration_rate", key, value, reference.hydration_rate(*key))
+    for i, k in enumerate(_keys(TRAINING_TIMES)):
+        check("meal_pattern", (k,), list(MEAL_PATTERNS[i]), [tuple(m) for m in reference.meal_pattern(k)])
+        check("meal_times_suggestion", (k,), dict(MEAL_TIMES[i]), reference.meal_times_suggestion(k))
+    return checks
+
+
+if __name__ == "__main__":
+    print(f"tabelle verificate: {verify_tables()} voci")
+    sys.exit(0)
@@ -0,0 +1,199 @@
+"""
+Timeline dei rifornimenti durante la seduta: gel, borracce e compresse di
+sodio in ordine di tempo, minuto per minuto.
+
+    for intake in fueling_timeline(training):
+        print(intake.minute, intake.kind, intake.number)
+
+La seduta è una sequenza di ``Segment`` (durata, CHO/ora, temperatura,
+sudorazione, intensità); senza segmenti è un unico tratto con i valori di
+``Training``. Per ogni tratto i fabbisogni orari sono quelli del motore:
+``cho_per_hour``, ``hydration_rate`` e ``sodium_rate`` (acqua e sodio
+scalati per l'intensità, perché la sudorazione cresce con lo sforzo).
+
+Ogni tipo di assunzione è un'unità fissa (gel da ``GEL_CHO_G`` g, borraccia
+da ``BOTTLE_SIZE_L`` L, compressa da ``PILL_NA_MG`` mg): l'unità n si
+prende quando il fabbisogno cumulato raggiunge (n - 1 + anticipo) unità.
+Gel e compresse hanno anticipo 0.5 (a metà del fabbisogno che coprono, il
+totale è il fabbisogno arrotondato all'unità); le borracce 0 (la borraccia
+n si inizia quando la precedente dovrebbe essere finita).
+
+Tutto è pigro: ``fueling_timeline`` è un generatore che unisce per tempo
+(``heapq.merge``) un generatore per tipo; i segmenti possono a loro volta
+essere un generatore. La memoria non dipende dalla durata né dal numero di
+assunzioni (ultra con migliaia di punti di rifornimento).
+
+Da riga di comando (una riga TSV per assunzione, scritta man mano):
+
+    python -m nutrition.timeline '{"duration_hours": 3, "cho_per_hour": 80}'
+    python -m nutrition.timeline --segment 240:60:Temperato --segment 480:90:Caldo:Alta:1.2
+"""
+
+import argparse
+import heapq
+import json
+import sys
+from dataclasses import dataclass
+from itertools import tee
+from typing import Optional
+
+from .engine import BOTTLE_SIZE_L, PILL_NA_MG, hydration_rate, sodium_rate
+
+# Carboidrati per gel (g)
+GEL_CHO_G = 25.0
+
+# (tipo, unità di misura, anticipo, colonna di _rates), in ordine di
+# priorità a parità di minuto
+KINDS = (
+    ("borraccia", "ml", 0.0, 1),
+    ("gel", "g CHO", 0.5, 0),
+    ("sodio", "mg Na", 0.5, 2),
+)
+
+
+@dataclass(frozen=True)
+class Segment:
+    """
+    Tratto della seduta. I campi None prendono il valore dell'allenamento
+    (``Training``); ``intensity`` scala acqua e sodio (1 = come da tabella).
+    """
+    minutes: float
+    cho_per_hour: Optional[float] = None
+    temp_condition: Optional[str] = None
+    sweat_rate: Optional[str] = None
+    intensity: float = 1.0
+
+
+@dataclass(frozen=True)
+class Intake:
+    """Un'assunzione: minuto dall'inizio, tipo, progressivo del tipo, quantità e tratto."""
+    minute: float
+    kind: str
+    number: int
+    amount: float
+    unit: str
+    segment: int
+
+
+def _rates(segment, training):
+    """(CHO g/h, acqua ml/h, sodio mg/h) di un tratto."""
+    cho = training.cho_per_hour if segment.cho_per_hour is None else segment.cho_per_hour
+    temp = training.temp_condition if segment.temp_condition is None else segment.temp_condition
+    sweat = training.sweat_rate if segment.sweat_rate is None else segment.sweat_rate
+    return (
+        cho,
+        hydration_rate(temp, sweat) * 1000.0 * segment.intensity,
+        sodium_rate(sweat) * segment.intensity,
+    )
+
+
+def _unit_intakes(segments, training, column, kind, unit_size, unit, lead):
+    """Assunzioni di un tipo: unità n quando il fabbisogno cumulato arriva a (n - 1 + lead) unità."""
+    start = 0.0
+    need = 0.0  # fabbisogno cumulato all'inizio del tratto
+    number = 1
+    for index, segment in enumerate(segments):
+        if segment.minutes <= 0:
+            raise ValueError("ogni tratto deve durare più di 0 minuti")
+        per_minute = _rates(segment, training)[column] / 60.0
+        end_need = need + per_minute * segment.minutes
+        if per_minute > 0:
+            while (number - 1 + lead) * unit_size <= end_need:
+                threshold = (number - 1 + lead) * unit_size
+                minute = start + max(threshold - need, 0.0) / per_minute
+                if minute >= start + segment.minutes:
+                    break
+                yield Intake(minute, kind, number, unit_size, unit, index)
+                number += 1
+        start += segment.minutes
+        need = end_need
+
+
+def session_segments(training):
+    """Un solo tratto con durata e valori dell'allenamento (nessun tratto a riposo)."""
+    if not training.has_session:
+        return ()
+    return (Segment(minutes=training.duration_hours * 60.0),)
+
+
+def fueling_timeline(training, segments=None, gel_g=GEL_CHO_G, bottle_l=BOTTLE_SIZE_L, pill_mg=PILL_NA_MG):
+    """
+    Generatore di ``Intake`` in ordine di minuto per la seduta.
+    ``segments``: iterabile (anche pigro) di ``Segment``; None = ``session_segments(training)``.
+    Le unità (``gel_g``, ``bottle_l``, ``pill_mg``) devono essere > 0 (ValueError).
+    """
+    if segments is None:
+        segments = session_segments(training)
+    sizes = {"borraccia": bottle_l * 1000.0, "gel": gel_g, "sodio": pill_mg}
+    for name, size in (("gel_g", gel_g), ("bottle_l", bottle_l), ("pill_mg", pill_mg)):
+        # "not >" scarta anche NaN: un'unità nulla non farebbe mai avanzare il fabbisogno
+        if not size > 0:
+            raise ValueError(f"{name}: l'unità deve essere maggiore di 0, trovato {size!r}")
+    # Una copia dei segmenti per tipo: tee tiene in memoria solo i tratti
+    # tra il tipo più avanti e quello più indietro nel tempo
+    streams = [
+        _unit_intakes(copy, training, column, kind, sizes[kind], unit, lead)
+        for copy, (kind, unit, lead, column) in zip(tee(segments, len(KINDS)), KINDS)
+    ]
+    return heapq.merge(*streams, key=lambda intake: intake.minute)
+
+
+# =========================
+#  RIGA DI COMANDO
+# =========================
+
+def _parse_segment(text):
+    """MINUTI[:CHO_ORA[:TEMPERATURA[:SUDORAZIONE[:INTENSITÀ]]]]; campi vuoti = allenamento."""
+    parts = text.split(":")
+    if not 1 <= len(parts) <= 5:
+        raise argparse.ArgumentTypeError(f"tratto non valido: {text!r}")
+    parts += [""] * (5 - len(parts))
+    try:
+        return Segment(
+            minutes=float(parts[0]),
+            cho_per_hour=float(parts[1]) if parts[1] else None,
+            temp_condition=parts[2] or None,
+            sweat_rate=parts[3] or None,
+            intensity=float(parts[4]) if parts[4] else 1.0,
+        )
+    except ValueError as exc:
+        raise argparse.ArgumentTypeError(f"tratto non valido: {text!r} ({exc})")
+
+
+def _positive_float(text):
+    try:
+        value = float(text)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"numero non valido: {text!r}") from None
+    if not value > 0:
+        raise argparse.ArgumentTypeError(f"deve essere maggiore di 0: {text!r}")
+    return value
+
+
+def main(argv=None):
+    from .schema import training_from_dict
+
+    parser = argparse.ArgumentParser(prog="python -m nutrition.timeline", description="Timeline dei rifornimenti")
+    parser.add_argument("training", nargs="?", default="{}", help="allenamento JSON (campi di Training)")
+    parser.add_argument("--segment", type=_parse_segment, action="append", default=None,
+                        help="tratto MINUTI[:CHO_ORA[:TEMPERATURA[:SUDORAZIONE[:INTENSITÀ]]]], ripetibile")
+    parser.add_argument("--gel", type=_positive_float, default=GEL_CHO_G, help="g di CHO per gel")
+    args = parser.parse_args(argv)
+
+    try:
+        training = training_from_dict(json.loads(args.training))
+        out = sys.stdout
+        out.write("minuto\ttipo\tn\tquantità\tunità\ttratto\n")
+        for intake in fueling_timeline(training, args.segment, gel_g=args.gel):
+            out.write(
+                f"{intake.minute:.1f}\t{intake.kind}\t{intake.number}\t"
+                f"{intake.amount:g}\t{intake.unit}\t{intake.segment}\n"
+            )
+    except ValueError as exc:
+        print(exc, file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,275 @@
+"""
+Bande di incertezza Monte Carlo per energia e idratazione.
+
+I parametri del motore sono stime puntuali: l'errore della formula di
+Mifflin-St Jeor, i fattori di attività, i MET per tipo di allenamento, le
+mappe di sudorazione e sodio. ``simulate`` li campiona da distribuzioni
+configurabili (``UncertaintyModel``) e propaga i campioni lungo la stessa
+catena di ``plan_energy``/``plan_hydration`` in un solo passaggio vettoriale
+NumPy, poi riassume ogni grandezza in percentili (``Band``).
+
+    bands = simulate(profile, training)                    # 100k campioni
+    bands.energy.target_kcal.p5, bands.energy.target_kcal.p95   # banda al 90%
+
+``energy_bands`` e ``hydration_bands`` calcolano le due parti separatamente
+(sezione 3 e frammento 4B dell'app).
+
+Ogni parametro incerto è moltiplicato per un fattore con media 1 e
+coefficiente di variazione ``cv`` (``Spread``); lo stesso fattore vale per
+tutta la catena del campione (es. l'errore del BMR entra in TDEE, kcal
+target e scostamento dei macro). Il sodio è sudorazione × concentrazione:
+il fattore di sudorazione è lo stesso dell'acqua, la concentrazione ha il
+suo. I macro (g/kg da linee guida) restano fissi: varia il loro scostamento
+dal target calorico.
+
+Il generatore ha un seed fisso: stessi input → stesse bande a ogni rerun,
+e i risultati restano in cache. Con i default (100k campioni) ogni parte
+costa poche decine di ms.
+"""
+
+import argparse
+import json
+import sys
+import time
+from dataclasses import dataclass, field, replace
+from functools import lru_cache
+from typing import Optional
+
+import numpy as np
+
+from .engine import plan_energy, plan_hydration
+from .profiling import span
+
+DEFAULT_SAMPLES = 100_000
+DEFAULT_SEED = 0
+PERCENTILES = (5, 25, 50, 75, 95)
+SPREAD_KINDS = ("normal", "lognormal", "uniform", "triangular")
+
+
+@dataclass(frozen=True)
+class Spread:
+    """
+    Fattore moltiplicativo con media 1 e deviazione standard ``cv``.
+    ``kind``: normal (troncata a 0), lognormal, uniform, triangular (simmetrica).
+    """
+    kind: str = "normal"
+    cv: float = 0.1
+
+    def __post_init__(self):
+        if self.kind not in SPREAD_KINDS:
+            raise ValueError(f"distribuzione sconosciuta: {self.kind!r} (ammesse: {', '.join(SPREAD_KINDS)})")
+        if self.cv < 0:
+            raise ValueError("cv deve essere >= 0")
+
+    def sample(self, rng, n):
+        if self.kind == "normal":
+            return np.maximum(1.0 + self.cv * rng.standard_normal(n), 0.0)
+        if self.kind == "lognormal":
+            sigma = np.sqrt(np.log1p(self.cv ** 2))
+            return np.exp(sigma * rng.standard_normal(n) - sigma ** 2 / 2)
+        if self.kind == "uniform":
+            half_width = self.cv * np.sqrt(3.0)
+            return rng.uniform(1.0 - half_width, 1.0 + half_width, n)
+        half_width = self.cv * np.sqrt(6.0)
+        return rng.triangular(1.0 - half_width, 1.0, 1.0 + half_width, n)
+
+
+@dataclass(frozen=True)
+class UncertaintyModel:
+    """Distribuzione di ogni parametro incerto (valori indicativi dalla letteratura)."""
+    # Mifflin-St Jeor: ~±10% sul singolo individuo
+    bmr: Spread = field(default_factory=lambda: Spread("normal", 0.10))
+    activity: Spread = field(default_factory=lambda: Spread("normal", 0.05))
+    # MET di tabella contro costo reale della seduta
+    met: Spread = field(default_factory=lambda: Spread("lognormal", 0.20))
+    sweat: Spread = field(default_factory=lambda: Spread("lognormal", 0.30))
+    sodium_concentration: Spread = field(default_factory=lambda: Spread("lognormal", 0.35))
+
+
+DEFAULT_MODEL = UncertaintyModel()
+
+
+@dataclass(frozen=True)
+class Band:
+    """Valore del motore (``point``) e percentili dei campioni."""
+    point: float
+    p5: float
+    p25: float
+    p50: float
+    p75: float
+    p95: float
+
+
+@dataclass(frozen=True)
+class EnergyBands:
+    bmr: Band
+    base_tdee: Band
+    training_kcal: Band
+    day_tdee: Band
+    target_kcal: Band
+    # kcal dei macro - kcal target
+    energy_gap: Band
+
+
+@dataclass(frozen=True)
+class HydrationBands:
+    l_per_hour: Band
+    total_liters: Band
+    na_mg_per_hour: Band
+    total_na_mg: Band
+
+
+@dataclass(frozen=True)
+class UncertaintyPlan:
+    """Risultato di ``simulate``: ``hydration`` è None senza allenamento."""
+    samples: int
+    energy: EnergyBands
+    hydration: Optional[HydrationBands]
+
+
+def _percentiles(samples):
+    """
+    Percentili (interpolazione lineare, come ``np.percentile``) di ogni riga
+    di ``samples`` (n_grandezze, n_campioni): un solo sort per riga, più
+    veloce di ``np.percentile`` con più percentili.
+    """
+    ordered = np.sort(samples, axis=1)
+    position = np.array(PERCENTILES) / 100.0 * (samples.shape[1] - 1)
+    lower = np.floor(position).astype(np.int64)
+    upper = np.minimum(lower + 1, samples.shape[1] - 1)
+    frac = position - lower
+    return ordered[:, lower] * (1.0 - frac) + ordered[:, upper] * frac
+
+
+def _band(point, values, scale=1.0, offset=0.0):
+    """Band di ``scale * x + offset`` dai percentili di x (scale < 0 inverte l'ordine)."""
+    values = scale * np.asarray(values) + offset
+    if scale < 0:
+        values = values[::-1]
+    return Band(float(point), *map(float, values))
+
+
+def _sample_count(samples):
+    samples = int(samples)
+    if samples < 1:
+        raise ValueError(f"samples: serve almeno un campione, trovato {samples}")
+    return samples
+
+
+def simulate(profile, training, model=DEFAULT_MODEL, samples=DEFAULT_SAMPLES, seed=DEFAULT_SEED):
+    """Bande di energia (sezione 3) e idratazione (4B) per una giornata (``samples`` >= 1)."""
+    samples = _sample_count(samples)
+    return UncertaintyPlan(
+        samples=samples,
+        energy=energy_bands(profile, training, model, samples, seed),
+        hydration=hydration_bands(training, model, samples, seed),
+    )
+
+
+def energy_bands(profile, training, model=DEFAULT_MODEL, samples=DEFAULT_SAMPLES, seed=DEFAULT_SEED):
+    """Bande di ``plan_energy``: BMR → TDEE → kcal target → scostamento dei macro."""
+    # Solo i campi che entrano nell'energia: chiave di cache stabile tra CHO/ora e idratazione
+    training = replace(training, cho_per_hour=0, temp_condition="", sweat_rate="")
+    return _energy_bands(profile, training, model, _sample_count(samples), int(seed))
+
+
+def hydration_bands(training, model=DEFAULT_MODEL, samples=DEFAULT_SAMPLES, seed=DEFAULT_SEED):
+    """Bande di ``plan_hydration`` (acqua e sodio); None senza allenamento."""
+    if not training.has_session:
+        return None
+    return _hydration_bands(replace(training, cho_per_hour=0), model, _sample_count(samples), int(seed))
+
+
+@lru_cache(maxsize=64)
+def _energy_bands(profile, training, model, samples, seed):
+    with span("uncertainty_energy", samples=samples):
+        energy = plan_energy(profile, training)
+        rng = np.random.default_rng([seed, 0])
+
+        # Un fattore per parametro e per campione, condiviso lungo la catena
+        bmr = energy.bmr * model.bmr.sample(rng, samples)
+        base_tdee = bmr * (energy.act_factor * model.activity.sample(rng, samples))
+        training_kcal = energy.training_kcal * model.met.sample(rng, samples)
+
+        # Percentili solo delle grandezze indipendenti: kcal target e
+        # scostamento dei macro sono trasformazioni affini del TDEE
+        pct = _percentiles(np.stack([bmr, base_tdee, training_kcal, base_tdee + training_kcal]))
+        return EnergyBands(
+            bmr=_band(energy.bmr, pct[0]),
+            base_tdee=_band(energy.base_tdee, pct[1]),
+            training_kcal=_band(energy.training_kcal, pct[2]),
+            day_tdee=_band(energy.day_tdee, pct[3]),
+            target_kcal=_band(energy.target_kcal, pct[3], offset=energy.delta_kcal),
+            energy_gap=_band(
+                energy.macro_total_kcal - energy.target_kcal, pct[3],
+                scale=-1.0, offset=energy.macro_total_kcal - energy.delta_kcal,
+            ),
+        )
+
+
+@lru_cache(maxsize=64)
+def _hydration_bands(training, model, samples, seed):
+    with span("uncertainty_hydration", samples=samples):
+        hydration = plan_hydration(training)
+        rng = np.random.default_rng([seed, 1])
+
+        sweat = model.sweat.sample(rng, samples)
+        l_per_hour = hydration.l_per_hour * sweat
+        na_mg_per_hour = hydration.na_mg_per_hour * sweat * model.sodium_concentration.sample(rng, samples)
+
+        # I totali della seduta sono i valori orari per la durata
+        pct = _percentiles(np.stack([l_per_hour, na_mg_per_hour]))
+        hours = training.duration_hours
+        return HydrationBands(
+            l_per_hour=_band(hydration.l_per_hour, pct[0]),
+            total_liters=_band(hydration.total_liters, pct[0], scale=hours),
+            na_mg_per_hour=_band(hydration.na_mg_per_hour, pct[1]),
+            total_na_mg=_band(hydration.total_na_mg, pct[1], scale=hours),
+        )
+
+
+# =========================
+#  RIGA DI COMANDO
+# =========================
+
+def _positive_int(text):
+    try:
+        value = int(text)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"intero non valido: {text!r}") from None
+    if value < 1:
+        raise argparse.ArgumentTypeError(f"deve essere almeno 1: {text!r}")
+    return value
+
+
+def main(argv=None):
+    from .schema import inputs_from_record
+
+    parser = argparse.ArgumentParser(prog="python -m nutrition.uncertainty", description="Bande di incertezza Monte Carlo")
+    parser.add_argument("record", nargs="?", default="{}", help="record JSON (vedi nutrition.schema), default: valori dell'app")
+    parser.add_argument("-n", "--samples", type=_positive_int, default=DEFAULT_SAMPLES)
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED)
+    args = parser.parse_args(argv)
+
+    try:
+        _, profile, training = inputs_from_record(json.loads(args.record))
+    except ValueError as exc:
+        print(exc, file=sys.stderr)
+        return 1
+
+    start = time.perf_counter()
+    result = simulate(profile, training, samples=args.samples, seed=args.seed)
+    elapsed = (time.perf_counter() - start) * 1e3
+
+    groups = [result.energy] + ([result.hydration] if result.hydration is not None else [])
+    print(f"{'grandezza':<16}{'motore':>10}" + "".join(f"{'p' + str(p):>10}" for p in PERCENTILES))
+    for group in groups:
+        for name, band in vars(group).items():
+            values = [band.point, band.p5, band.p25, band.p50, band.p75, band.p95]
+            print(f"{name:<16}" + "".join(f"{v:>10.2f}" for v in values))
+    print(f"{result.samples} campioni in {elapsed:.1f} ms", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,745 +1,747 @@
-import streamlit as st
-import math
-
-# =========================
-#  DATABASE ALIMENTI & TEMPLATE PASTI
-# =========================
-
-# Valori nutrizionali indicativi per 100 g (o per unità indicata)
-# Sono stime semplificate per uso pratico, non valori da etichetta al milligrammo.
-FOODS_DB = {
-    "fiocchi di avena":        {"cho": 60, "pro": 13, "fat": 7},
-    "farina di avena":         {"cho": 60, "pro": 13, "fat": 7},
-    "banana":                  {"cho": 23, "pro": 1,  "fat": 0},
-    "kiwi":                    {"cho": 15, "pro": 1,  "fat": 0.5},
-    "mandorle":                {"cho": 22, "pro": 21, "fat": 50},
-    "albume":                  {"cho": 1,  "pro": 11, "fat": 0},
-    "riso basmati cotto":      {"cho": 28, "pro": 3,  "fat": 0.3},
-    "pasta integrale cotta":   {"cho": 25, "pro": 5,  "fat": 1.5},
-    "yogurt greco magro":        {"cho": 4,  "pro": 10, "fat": 0},
-    "petto di pollo":          {"cho": 0,  "pro": 31, "fat": 3},
-    "fesa di tacchino":        {"cho": 0,  "pro": 29, "fat": 2},
-    "merluzzo":                {"cho": 0,  "pro": 18, "fat": 0.8},
-    "uova intere":             {"cho": 1,  "pro": 13, "fat": 11},  # valori per 100 g (~2 uova medie)
-    "passata di pomodoro":     {"cho": 5,  "pro": 1.5,"fat": 0.5},
-    "tonno in scatola sgocciolato": {"cho": 0, "pro": 25, "fat": 8},
-    "patate dolci cotte":      {"cho": 20, "pro": 2,  "fat": 0.1},
-    "finocchi":                {"cho": 3,  "pro": 1,  "fat": 0},
-    "radicchio rosso":         {"cho": 3,  "pro": 1,  "fat": 0},
-    "minestrone leggerezza":   {"cho": 5,  "pro": 2,  "fat": 0.5},
-    "olio extravergine di oliva": {"cho": 0, "pro": 0, "fat": 100},
-    "miele":                   {"cho": 82, "pro": 0,  "fat": 0},
-    "marmellata":              {"cho": 60, "pro": 0,  "fat": 0},
-    "whey proteine":           {"cho": 6,  "pro": 80, "fat": 6},   # per 100 g di polvere
-    "legumi cotti":            {"cho": 16, "pro": 8,  "fat": 1.5}, # media ceci/fagioli/lenticchie
-    "ricotta senza lattosio":  {"cho": 3,  "pro": 9,  "fat": 10},
-    "fiocchi di latte":        {"cho": 3,  "pro": 13, "fat": 4},
-    "parmigiano grattugiato":  {"cho": 0,  "pro": 35, "fat": 28},
-    "latte senza lattosio":    {"cho": 5,  "pro": 3.5,"fat": 1.5},
-    "gallette di riso":        {"cho": 80, "pro": 7,  "fat": 2},
-}
-
-# Template di base per tipo di pasto
-# Ogni template è una lista di alimenti del FOODS_DB.
-MEAL_TEMPLATES = {
-    "colazione": ["fiocchi di avena", "yogurt greco magro", "banana", "mandorle"],
-    "spuntino": ["gallette di riso", "whey proteine", "mandorle"],
-    "post-allenamento": ["riso basmati cotto", "petto di pollo", "passata di pomodoro"],
-    "pranzo": ["riso basmati cotto", "petto di pollo", "olio extravergine di oliva", "finocchi"],
-    "cena": ["pasta integrale cotta", "tonno in scatola sgocciolato", "olio extravergine di oliva", "radicchio rosso"],
-}
-
-# =========================
-#  FUNZIONI DI SUPPORTO
-# =========================
-
-def calculate_bmr(weight, height, age, sex):
-    """
-    Calcolo BMR con Mifflin-St Jeor.
-    weight in kg, height in cm, age in anni
-    """
-    if sex == "Maschio":
-        bmr = 10 * weight + 6.25 * height - 5 * age + 5
-    else:  # Femmina
-        bmr = 10 * weight + 6.25 * height - 5 * age - 161
-    return bmr
+import io
+import json
+from dataclasses import replace
+from datetime import date
 
-def activity_factor(level):
-    """
-    Fattore di attività quotidiana NON sportiva.
-    """
-    mapping = {
-        "Basso (sedentario)": 1.2,
-        "Medio": 1.4,
-        "Alto (molto attivo)": 1.6,
-    }
-    return mapping.get(level, 1.4)
-
-def training_energy_cost(weight, duration_hours, training_type):
-    """
-    Stima molto semplificata del costo energetico dell'allenamento.
-   # Qui usiamo MET grezzi per tipo di attività, moltiplicati per peso e durata.
-    1 MET ~ 1 kcal/kg/h
-    """
-    # Valori indicativi, puoi affinarli
-    met_map = {
-        "Nessun allenamento / Riposo": 0.0,
-        "Z2 / Endurance moderato": 7.0,   # es. corsa/bici moderata
-        "HIIT / Intervalli": 9.0,         # intensità più alta
-        "Forza": 6.0,                     # sala pesi
-        "Lungo / Gara / Uscita chiave": 8.0,  # endurance lunga
-    }
-    met = met_map.get(training_type, 0.0)
-    kcal = met * weight * duration_hours
-    return kcal
-
-def choose_cho_g_per_kg(training_type, session_importance, goal):
-    """
-    Sceglie i g/kg di CHO in base al tipo di giorno,
-    importanza della seduta e obiettivo (mantenimento/dimagrimento/costruzione).
-    I range sono indicativi e basati sulle linee guida classiche.
-    """
-
-    # Range base per tipo di giorno (min, max)
-    base_ranges = {
-        "Nessun allenamento / Riposo": (3.0, 4.0),
-        "Z2 / Endurance moderato": (5.0, 6.0),
-        "HIIT / Intervalli": (5.5, 7.0),
-        "Forza": (5.0, 6.5),
-        "Lungo / Gara / Uscita chiave": (7.0, 9.0),
-    }
-
-    low, high = base_ranges.get(training_type, (4.0, 5.0))
-
-    # Scala in base all'importanza
-    if session_importance == "Bassa":
-        cho_g_per_kg = low
-    elif session_importance == "Media":
-        cho_g_per_kg = (low + high) / 2
-    else:  # Alta / Chiave
-        cho_g_per_kg = high
-
-    # Aggiustamento in base all'obiettivo
-    # Dimagrimento → abbassiamo leggermente, Costruzione → alziamo leggermente (entro range realistico)
-    if goal == "Leggero dimagrimento":
-        cho_g_per_kg = max(low, cho_g_per_kg - 0.3)
-    elif goal == "Leggera costruzione":
-        cho_g_per_kg = min(high, cho_g_per_kg + 0.3)
-
-    return cho_g_per_kg
-
-def choose_protein_g_per_kg(goal):
-    """
-    Proteine g/kg: valori per atleta endurance volume alto, >40 anni, con obiettivo di controllo peso.
-    """
-    if goal == "Leggera costruzione":
-        return 2.0
-    elif goal == "Leggero dimagrimento":
-        return 1.9
-    else:
-        return 1.8
-
-def choose_fat_g_per_kg(goal):
-    """
-    Grassi g/kg: minimo per salute + piccolo aggiustamento in base all'obiettivo.
-    """
-    if goal == "Leggera costruzione":
-        return 1.0
-    elif goal == "Leggero dimagrimento":
-        return 0.8
-    else:
-        return 0.9
+import streamlit as st
 
-def meal_pattern(training_time):
-    """
-    Ritorna la lista dei pasti e le percentuali di CHO_fuori allenamento
-    in base all'orario principale dell'allenamento.
-    Le percentuali sommano a 1.0.
-    """
-    if training_time in ["Mattina presto", "Metà mattina"]:
-        # Allenamento mattutino
-        meals = [
-            ("Colazione (pre-allenamento)", 0.20),
-            ("Post-allenamento", 0.25),
-            ("Pranzo", 0.25),
-            ("Cena", 0.20),
-            ("Spuntini", 0.10),
-        ]
-    elif training_time == "Pausa pranzo":
-        meals = [
-            ("Colazione", 0.20),
-            ("Pranzo (pre o post)", 0.25),
-            ("Spuntino pomeriggio", 0.15),
-            ("Cena", 0.30),
-            ("Spuntini", 0.10),
-        ]
-    elif training_time in ["Pomeriggio", "Sera"]:
-        # Allenamento pomeridiano/serale
-        meals = [
-            ("Colazione", 0.15),
-            ("Pranzo", 0.25),
-            ("Spuntino pre-allenamento", 0.20),
-            ("Cena / Post-allenamento", 0.30),
-            ("Spuntini", 0.10),
-        ]
-    else:
-        # Nessun allenamento o orario non specificato → distribuzione più uniforme
-        meals = [
-            ("Colazione", 0.25),
-            ("Pranzo", 0.30),
-            ("Cena", 0.30),
-            ("Spuntini", 0.15),
-        ]
-    return meals
-
-def meal_times_suggestion(training_time):
-    """
-    Suggerisce orari indicativi per i pasti in base all'orario principale dell'allenamento.
-    Ritorna un dizionario {nome_pasto: orario_stringa}.
-    Gli orari sono indicativi e pensati per una routine "classica" (puoi poi personalizzarli).
-    """
-    if training_time in ["Mattina presto", "Metà mattina"]:
-        times = {
-            "Colazione (pre-allenamento)": "circa 60–90 min prima dell'allenamento (es. 5:30–6:00 se ti alleni alle 7:00)",
-            "Post-allenamento": "entro 60 min dalla fine (es. 8:30–9:00)",
-            "Pranzo": "12:30–13:30",
-            "Cena": "19:30–21:00",
-            "Spuntini": "a metà mattina/pomeriggio se serve, lontano >2 h dal sonno",
-        }
-    elif training_time == "Pausa pranzo":
-        times = {
-            "Colazione": "7:00–8:00",
-            "Pranzo (pre o post)": "subito dopo l'allenamento, idealmente entro 60 min (es. 13:30–14:30)",
-            "Spuntino pomeriggio": "16:00–17:00",
-            "Cena": "19:30–21:00",
-            "Spuntini": "eventuale spuntino serale leggero, 2–3 h prima di dormire",
-        }
-    elif training_time in ["Pomeriggio", "Sera"]:
-        times = {
-            "Colazione": "7:00–8:00",
-            "Pranzo": "12:30–13:30",
-            "Spuntino pre-allenamento": "60–120 min prima dell'allenamento (es. 16:30–17:00 se ti alleni alle 18:30)",
-            "Cena / Post-allenamento": "entro 1–2 h dalla fine dell'allenamento (es. 20:30–21:30)",
-            "Spuntini": "eventuale spuntino mattina o metà pomeriggio, a seconda della fame",
-        }
-    else:
-        # Nessun allenamento / generico
-        times = {
-            "Colazione": "7:00–8:30",
-            "Pranzo": "12:30–13:30",
-            "Cena": "19:30–21:00",
-            "Spuntini": "a metà mattina/pomeriggio se serve",
-        }
-    return times
-
-def split_protein_fat_across_meals(total_pro, total_fat, meals):
-    """
+from nutrition import profiling
+from nutrition.alternatives import alternative_meals
+from nutrition.cache import get_plan_cache
+from nutrition.engine import (
+    ACTIVITY_LEVELS,
+    BOTTLE_SIZE_L,
+    GOALS,
+    IMPORTANCE_LEVELS,
+    PILL_NA_MG,
+    REST_DAY,
+    SEX_OPTIONS,
+    SWEAT_RATES,
+    TEMP_CONDITIONS,
+    TRAINING_TIMES,
+    TRAINING_TYPES,
+    Profile,
+    Training,
+    plan_energy,
+    plan_hydration,
 )
-    Distribuisce proteine e grassi in modo semplice:
-    - proteine: più uniformi
-    - grassi: leggermente più su pasti principali (colazione/pranzo/cena)
-    """
-    n_meals = len(meals)
-    pro_per_meal = total_pro / n_meals
-
-    # Distribuzione grassi: pasti principali un po' più alti
-    # Peso base per ogni pasto
-    weights = []
-    for name, _ in meals:
-        if "Spuntino" in name:
-            weights.append(0.5)
-        else:
-            weights.append(1.0)
-    weight_sum = sum(weights)
-    fat_per_unit = total_fat / weight_sum
-    fat_allocation = [w * fat_per_unit for w in weights]
-
-    return pro_per_meal, fat_allocation
-def hydration_rate(temp_condition, sweat_rate):
-    """Stima dei litri di acqua/ora in base a temperatura e sudorazione.
-    Ritorna L/h."""
-    # Base per sudorazione
-    base_map = {
-        "Bassa": 0.45,
-        "Media": 0.65,
-        "Alta": 0.85,
-    }
-    base = base_map.get(sweat_rate, 0.65)
-
-    # Fattore temperatura
-    temp_factor_map = {
-        "Freddo": 0.9,
-        "Temperato": 1.0,
-        "Caldo": 1.15,
-        "Molto caldo": 1.3,
-    }
-    temp_factor = temp_factor_map.get(temp_condition, 1.0)
-
-    return base * temp_factor
-
-
-def sodium_rate(sweat_rate):
-    """
-    Stima dei mg di sodio/ora in base alla sudorazione.
-    Ritorna mg/h.
-    """
-    sodium_map = {
-        "Bassa": 350,
-        "Media": 550,
-        "Alta": 800,
-    }
-    return sodium_map.get(sweat_rate, 550)
-def classify_meal_type(meal_name, training_time):
-    """
-    Classifica il tipo di pasto in base al nome e all'orario allenamento,
-    per scegliere il template corretto.
-    """
-    name_lower = meal_name.lower()
-    if "colazione" in name_lower:
-        return "colazione"
-    if "post-allenamento" in name_lower or "Cena / Post-allenamento".lower() in name_lower:
-        return "post-allenamento"
-    if "spuntino" in name_lower:
-        return "spuntino"
-    # Pranzo/cena generici
-    if "pranzo" in name_lower:
-        return "pranzo"
-    if "cena" in name_lower:
-        return "cena"
-    # fallback
-    return "pranzo"
-
-
-def suggest_meal(meal_name, cho_target, pro_target, fat_target, training_time):
-    """
-    Genera un 'piatto unico' indicativo per il pasto, usando i tuoi alimenti preferiti.
-    Ritorna:
-      - lista di tuple (alimento, grammi)
-      - macro stimati totali (cho, pro, fat)
-    """
-
-    meal_type = classify_meal_type(meal_name, training_time)
-    template_foods = MEAL_TEMPLATES.get(meal_type, MEAL_TEMPLATES["pranzo"])
-
-    # Impostiamo porzioni base in grammi per ogni alimento nel template
-    # (valori iniziali che poi scalarliamo)
-    base_portions = {}
-    for food in template_foods:
-        if meal_type == "colazione":
-            if "fiocchi di avena" in food or "farina di avena" in food:
-                base_portions[food] = 50
-            elif "yogurt" in food:
-                base_portions[food] = 150
-            elif "banana" in food or "kiwi" in food:
-                base_portions[food] = 100
-            elif "mandorle" in food:
-                base_portions[food] = 10
-            else:
-                base_portions[food] = 50
-        elif meal_type == "spuntino":
-            if "gallette" in food:
-                base_portions[food] = 20  # ~2-3 gallette
-            elif "whey" in food:
-                base_portions[food] = 30  # ~1 misurino
-            elif "mandorle" in food:
-                base_portions[food] = 10
-            else:
-                base_portions[food] = 50
-        elif meal_type == "post-allenamento":
-            if "riso basmati" in food:
-                base_portions[food] = 120
-            elif "petto di pollo" in food:
-                base_portions[food] = 120
-            elif "passata di pomodoro" in food:
-                base_portions[food] = 80
-            else:
-                base_portions[food] = 50
-        else:  # pranzo/cena
-            if "riso basmati" in food or "pasta integrale" in food or "patate dolci" in food:
-                base_portions[food] = 120
-            elif "petto di pollo" in food or "fesa di tacchino" in food or "merluzzo" in food or "tonno" in food or "legumi" in food:
-                base_portions[food] = 120
-            elif "olio extravergine" in food:
-                base_portions[food] = 10  # ~1 cucchiaio
-            elif "parmigiano" in food:
-                base_portions[food] = 10
-            else:
-                base_portions[food] = 80
-
-    # Calcoliamo macro per le porzioni base
-    def macros_for_portions(portions_dict):
-        total_cho = total_pro = total_fat = 0
-        for food, grams in portions_dict.items():
-            data = FOODS_DB.get(food, None)
-            if not data:
-                continue
-            factor = grams / 100.0
-            total_cho += data["cho"] * factor
-            total_pro += data["pro"] * factor
-            total_fat += data["fat"] * factor
-        return total_cho, total_pro, total_fat
-
-    base_cho, base_pro, base_fat = macros_for_portions(base_portions)
-
-    # Se i target sono molto diversi, scalare le porzioni tutte insieme
-    # in base ai carboidrati (priorità), con limiti per non uscire da proporzioni ragionevoli.
-    scale_factor = 1.0
-    if base_cho > 0 and cho_target > 0:
-        scale_factor = cho_target / base_cho
-
-    # Limitiamo lo scaling per evitare numeri assurdi
-    scale_factor = max(0.6, min(scale_factor, 1.8))
-
-    scaled_portions = {food: grams * scale_factor for food, grams in base_portions.items()}
-    final_cho, final_pro, final_fat = macros_for_portions(scaled_portions)
-
-    return scaled_portions, (final_cho, final_pro, final_fat)
+from nutrition.export import write_csv, write_html, write_ics
+from nutrition.fooddb import get_food_table
+from nutrition.roster import DEFAULT_PAGE_SIZE, ROSTER_COLUMNS, query_roster, roster_targets
+from nutrition.search import get_food_index, substitutes
+from nutrition.store import Athlete, get_store
+from nutrition.timeline import GEL_CHO_G, fueling_timeline
+from nutrition.uncertainty import DEFAULT_SAMPLES, energy_bands, hydration_bands
 
 # =========================
 #  INTERFACCIA STREAMLIT
 # =========================
+# Vista sottile sopra nutrition.engine: qui si raccolgono gli input e si
+# mostrano i risultati di plan_day. Tabelle e funzioni di calcolo vivono nel
+# pacchetto e vengono caricate una sola volta per processo.
 
 st.set_page_config(page_title="Smart Nutrition & Training Day Planner", layout="wide")
 
+# Profilazione opzionale (pannello di debug nella barra laterale): senza
+# Trace attiva gli span del motore e delle sezioni non costano nulla.
+profiling.serve_metrics_from_env()
+trace = None
+if st.session_state.get("profiling", profiling.enabled_by_env()):
+    trace = profiling.Trace("rerun").start()
+
 st.title("Smart Nutrition & Training Day Planner")
 st.write(
     "App per pianificare i macro giornalieri e il timing dei carboidrati "
     "in base a profilo atleta, allenamento del giorno e obiettivi."
 )
 
-# -------------------------
-# COLONNE PRINCIPALI
-# -------------------------
-col1, col2 = st.columns(2)
+# Lo script è diviso in sezioni con input espliciti. Profilo e allenamento
+# alimentano tutto il resto e restano nel corpo principale (un loro cambio
+# riesegue l'intera pagina); le sezioni con widget propri sono frammenti
+# (``st.fragment``) che si rieseguono da soli:
+#
+#   corpo     1. profilo, 2. allenamento, 3. energia e macro (plan_energy),
+#             bande di incertezza opzionali (nutrition.uncertainty)
+#   frammento 4. CHO/ora → pasti e suggerimenti (plan_day), 5. riepilogo
+#   frammento 4B. temperatura/sudorazione → idratazione (plan_hydration),
+#             annidato nel precedente: non ricalcola i pasti; chiude con i
+#             download del piano (nutrition.export), così l'idratazione
+#             esportata è quella mostrata
+#   frammento alternative per pasto (nutrition.alternatives), annidato
+#             anch'esso: scegliere pasto e numero di opzioni non ricalcola il piano
+#   frammenti barra laterale: registro atleti, ricerca alimenti
+#
+# L'interruttore "Vista allenatore" sostituisce le sezioni 1–5 con la rosa
+# del registro (nutrition.roster): un frammento con ricerca, filtri,
+# ordinamento e pagine; i pasti di un atleta si calcolano solo aprendolo.
+
+# Valori iniziali dei widget delle sezioni 1–2, 4 e 4B (chiave → valore). Stanno in
+# st.session_state così che caricare un atleta dal registro possa sostituirli.
+# L'orario ha una chiave diversa nei giorni di riposo: passando a "Riposo"
+# torna a "Nessun allenamento".
+INPUT_DEFAULTS = {
+    "age": 35,
+    "sex": SEX_OPTIONS[0],
+    "weight": 70.0,
+    "height": 175.0,
+    "activity_level": ACTIVITY_LEVELS[1],
+    "goal": GOALS[1],
+    "training_type": TRAINING_TYPES[1],
+    "session_importance": IMPORTANCE_LEVELS[1],
+    "duration_hours": 1,
+    "duration_minutes": 30,
+    "training_time": TRAINING_TIMES[1],
+    "training_time_rest": TRAINING_TIMES[0],
+    "cho_per_hour": 60,
+    "temp_condition": TEMP_CONDITIONS[1],
+    "sweat_rate": SWEAT_RATES[1],
+}
+for _key, _value in INPUT_DEFAULTS.items():
+    st.session_state.setdefault(_key, _value)
+
 
 # -------------------------
-# SEZIONE 1 – PROFILO ATLETA
+# SEZIONE 1 – PROFILO ATLETA (input)
 # -------------------------
-with col1:
+def profile_inputs():
     st.header("1. Profilo atleta")
 
-    age = st.number_input("Età (anni)", min_value=10, max_value=90, value=35, step=1)
-    sex = st.selectbox("Sesso", ["Maschio", "Femmina"])
-    weight = st.number_input("Peso attuale (kg)", min_value=35.0, max_value=150.0, value=70.0, step=0.5)
-    height = st.number_input("Altezza (cm)", min_value=140.0, max_value=210.0, value=175.0, step=1.0)
+    age = st.number_input("Età (anni)", min_value=10, max_value=90, step=1, key="age")
+    sex = st.selectbox("Sesso", SEX_OPTIONS, key="sex")
+    weight = st.number_input("Peso attuale (kg)", min_value=35.0, max_value=150.0, step=0.5, key="weight")
+    height = st.number_input("Altezza (cm)", min_value=140.0, max_value=210.0, step=1.0, key="height")
 
     activity_level = st.selectbox(
         "Livello di attività quotidiana (non sportiva)",
-        ["Basso (sedentario)", "Medio", "Alto (molto attivo)"],
-        index=1
+        ACTIVITY_LEVELS,
+        key="activity_level"
     )
 
     weight_goal = st.selectbox(
         "Obiettivo di composizione corporea",
-        ["Mantenimento", "Leggero dimagrimento", "Leggera costruzione"],
-        index=1
+        GOALS,
+        key="goal"
     )
 
-    bmr = calculate_bmr(weight, height, age, sex)
-    act_factor = activity_factor(activity_level)
-    base_tdee = bmr * act_factor
+    return Profile(
+        age=age,
+        sex=sex,
+        weight=weight,
+        height=height,
+        activity_level=activity_level,
+        goal=weight_goal,
+    )
 
-    st.markdown(f"**BMR stimato**: {bmr:.0f} kcal")
-    st.markdown(f"**TDEE base (senza allenamento)**: {base_tdee:.0f} kcal")
 
 # -------------------------
-# SEZIONE 2 – ALLENAMENTO DEL GIORNO
+# SEZIONE 2 – ALLENAMENTO DEL GIORNO (input)
 # -------------------------
-with col2:
+def training_inputs():
+    """Allenamento senza i parametri delle sezioni 4/4B (scelti nei frammenti)."""
     st.header("2. Allenamento del giorno")
 
     training_type = st.selectbox(
         "Tipo di allenamento",
-        [
-            "Nessun allenamento / Riposo",
-            "Z2 / Endurance moderato",
-            "HIIT / Intervalli",
-            "Forza",
-            "Lungo / Gara / Uscita chiave",
-        ],
-        index=1
+        TRAINING_TYPES,
+        key="training_type"
     )
 
     session_importance = st.selectbox(
         "Importanza della seduta",
-        ["Bassa", "Media", "Alta / Chiave"],
-        index=1
+        IMPORTANCE_LEVELS,
+        key="session_importance"
     )
 
     st.subheader("Durata allenamento principale")
-    duration_hours = st.number_input("Ore", min_value=0, max_value=6, value=1, step=1)
-    duration_minutes = st.number_input("Minuti", min_value=0, max_value=59, value=30, step=5)
+    duration_hours = st.number_input("Ore", min_value=0, max_value=6, step=1, key="duration_hours")
+    duration_minutes = st.number_input("Minuti", min_value=0, max_value=59, step=5, key="duration_minutes")
     total_duration_hours = duration_hours + duration_minutes / 60.0
 
     training_time = st.selectbox(
         "Orario principale dell'allenamento",
-        [
-            "Nessun allenamento / Non specificato",
-            "Mattina presto",
-            "Metà mattina",
-            "Pausa pranzo",
-            "Pomeriggio",
-            "Sera",
-        ],
-        index=1 if training_type != "Nessun allenamento / Riposo" else 0
+        TRAINING_TIMES,
+        key="training_time" if training_type != REST_DAY else "training_time_rest"
     )
 
-    training_kcal = training_energy_cost(weight, total_duration_hours, training_type)
-    st.markdown(f"**Stima costo energetico allenamento**: {training_kcal:.0f} kcal")
-
-# -------------------------
-# SEZIONE 3 – ENERGIA & MACRO TOTALI
-# -------------------------
-st.header("3. Obiettivo energetico e macro totali")
-
-# TDEE del giorno = TDEE base + costo allenamento
-day_tdee = base_tdee + training_kcal
-
-# Aggiustamento in base all'obiettivo
-if weight_goal == "Mantenimento":
-    delta_kcal = 0
-elif weight_goal == "Leggero dimagrimento":
-    delta_kcal = -300  # deficit moderato
-else:  # Leggera costruzione
-    delta_kcal = 200   # surplus moderato
-
-target_kcal = day_tdee + delta_kcal
-
-st.markdown(f"**TDEE del giorno (incluso allenamento)**: {day_tdee:.0f} kcal")
-st.markdown(f"**Kcal target (dopo obiettivo)**: {target_kcal:.0f} kcal")
-
-# Proteine
-pro_g_per_kg = choose_protein_g_per_kg(weight_goal)
-total_pro_g = pro_g_per_kg * weight
-pro_kcal = total_pro_g * 4
-
-# Grassi
-fat_g_per_kg = choose_fat_g_per_kg(weight_goal)
-total_fat_g = fat_g_per_kg * weight
-fat_kcal = total_fat_g * 9
-
-# Carboidrati (da linee guida in g/kg per tipo giorno)
-cho_g_per_kg = choose_cho_g_per_kg(training_type, session_importance, weight_goal)
-total_cho_g = cho_g_per_kg * weight
-cho_kcal = total_cho_g * 4
-
-macro_total_kcal = pro_kcal + fat_kcal + cho_kcal
-
-st.subheader("Macro teorici da linee guida (prima verifica kcal)")
-colm1, colm2, colm3, colm4 = st.columns(4)
-with colm1:
-    st.markdown(f"**CHO**: {total_cho_g:.0f} g  \n({cho_g_per_kg:.1f} g/kg)")
-with colm2:
-    st.markdown(f"**PRO**: {total_pro_g:.0f} g  \n({pro_g_per_kg:.1f} g/kg)")
-with colm3:
-    st.markdown(f"**FAT**: {total_fat_g:.0f} g  \n({fat_g_per_kg:.1f} g/kg)")
-with colm4:
-    st.markdown(f"**Kcal da macro**: {macro_total_kcal:.0f} kcal")
-
-# Avviso se lo scostamento kcal è grande
-diff_kcal = macro_total_kcal - target_kcal
-if abs(diff_kcal) > 200:
-    st.warning(
-        f"Attenzione: le kcal derivate dai macro ({macro_total_kcal:.0f}) "
-        f"si discostano di circa {diff_kcal:.0f} kcal dal target ({target_kcal:.0f}). "
-        "Puoi accettare questo margine o valutare un aggiustamento manuale."
+    return Training(
+        training_type=training_type,
+        session_importance=session_importance,
+        duration_hours=total_duration_hours,
+        training_time=training_time,
+        cho_per_hour=0,
     )
 
-st.markdown(
-    "Per semplicità in questa v1 manteniamo i macro come da linee guida, "
-    "accettando un piccolo scostamento dal target calorico quando necessario."
-)
 
 # -------------------------
-# SEZIONE 4 – TIMING E DISTRIBUZIONE DEI CHO
+# SEZIONE 3 – ENERGIA & MACRO TOTALI
 # -------------------------
-st.header("4. Timing dei carboidrati e distribuzione per pasti")
+def show_energy(energy):
+    st.header("3. Obiettivo energetico e macro totali")
+
+    st.markdown(f"**TDEE del giorno (incluso allenamento)**: {energy.day_tdee:.0f} kcal")
+    st.markdown(f"**Kcal target (dopo obiettivo)**: {energy.target_kcal:.0f} kcal")
+
+    st.subheader("Macro teorici da linee guida (prima verifica kcal)")
+    colm1, colm2, colm3, colm4 = st.columns(4)
+    with colm1:
+        st.markdown(f"**CHO**: {energy.total_cho_g:.0f} g  \n({energy.cho_g_per_kg:.1f} g/kg)")
+    with colm2:
+        st.markdown(f"**PRO**: {energy.total_pro_g:.0f} g  \n({energy.pro_g_per_kg:.1f} g/kg)")
+    with colm3:
+        st.markdown(f"**FAT**: {energy.total_fat_g:.0f} g  \n({energy.fat_g_per_kg:.1f} g/kg)")
+    with colm4:
+        st.markdown(f"**Kcal da macro**: {energy.macro_total_kcal:.0f} kcal")
+
+    # Avviso se lo scostamento kcal è grande
+    diff_kcal = energy.macro_total_kcal - energy.target_kcal
+    if abs(diff_kcal) > 200:
+        st.warning(
+            f"Attenzione: le kcal derivate dai macro ({energy.macro_total_kcal:.0f}) "
+            f"si discostano di circa {diff_kcal:.0f} kcal dal target ({energy.target_kcal:.0f}). "
+            "Puoi accettare questo margine o valutare un aggiustamento manuale."
+        )
 
-if training_type == "Nessun allenamento / Riposo" or total_duration_hours <= 0:
     st.markdown(
-        "Oggi non è previsto allenamento, quindi non consideriamo CHO durante l'esercizio. "
-        "I CHO vengono distribuiti tra i pasti principali e gli eventuali spuntini."
+        "Per semplicità in questa v1 manteniamo i macro come da linee guida, "
+        "accettando un piccolo scostamento dal target calorico quando necessario."
     )
-    cho_during_total = 0.0
-else:
-    st.subheader("CHO durante allenamento")
-    cho_per_hour = st.slider(
-        "Quanti g di CHO/ora vuoi assumere durante l'allenamento?",
-        min_value=20,
-        max_value=120,
-        value=60,
-        step=5
+
+
+def bands_table(rows):
+    """Tabella markdown di (etichetta, Band, decimali): stima del motore e percentili."""
+    return (
+        "| | Stima | 5% | 25% | Mediana | 75% | 95% |\n|---|---:|---:|---:|---:|---:|---:|\n"
+        + "\n".join(
+            f"| {label} | "
+            + " | ".join(f"{v:.{digits}f}" for v in (b.point, b.p5, b.p25, b.p50, b.p75, b.p95))
+            + " |"
+            for label, b, digits in rows
+        )
     )
-    cho_during_total = cho_per_hour * total_duration_hours
-    st.markdown(
-        f"- Durata allenamento: **{total_duration_hours:.2f} h**  \n"
-        f"- CHO durante: **{cho_during_total:.0f} g** "
-        f"({cho_per_hour} g/h)"
+
+
+def show_uncertainty(profile, training):
+    """Bande Monte Carlo delle stime della sezione 3 (attivabili con un interruttore)."""
+    if not st.toggle("Mostra bande di incertezza (Monte Carlo)", key="uncertainty"):
+        return
+    profiling.section("uncertainty")
+    bands = energy_bands(profile, training)
+
+    profiling.section("render: 3. bande di incertezza")
+    st.markdown(bands_table([
+        ("BMR (kcal)", bands.bmr, 0),
+        ("TDEE base (kcal)", bands.base_tdee, 0),
+        ("Allenamento (kcal)", bands.training_kcal, 0),
+        ("TDEE del giorno (kcal)", bands.day_tdee, 0),
+        ("Kcal target", bands.target_kcal, 0),
+        ("Kcal da macro − target", bands.energy_gap, 0),
+    ]))
+    st.caption(
+        f"{DEFAULT_SAMPLES:,}".replace(",", ".") + " simulazioni: errore della formula di Mifflin-St Jeor, fattore di attività "
+        "e MET dell'allenamento campionati attorno ai valori usati dal piano. "
+        f"Nel 90% dei casi le kcal target stanno tra {bands.target_kcal.p5:.0f} e {bands.target_kcal.p95:.0f}."
     )
 
-# CHO rimanenti da distribuire fuori allenamento
-cho_outside = max(total_cho_g - cho_during_total, 0)
 
-st.subheader("Distribuzione CHO fuori allenamento")
+# -------------------------
+# SEZIONE 4 – TIMING E DISTRIBUZIONE DEI CHO
+# -------------------------
+@st.fragment
+def cho_section(profile, training):
+    """
+    Sezioni 4, 4B e 5. Lo slider CHO/ora riesegue solo questo frammento:
+    energia e macro (sezione 3) non vengono ricalcolati.
+    """
+    profiling.section("ui: 4. input CHO")
+    st.header("4. Timing dei carboidrati e distribuzione per pasti")
+
+    cho_per_hour = 0
+    if not training.has_session:
+        st.markdown(
+            "Oggi non è previsto allenamento, quindi non consideriamo CHO durante l'esercizio. "
+            "I CHO vengono distribuiti tra i pasti principali e gli eventuali spuntini."
+        )
+    else:
+        st.subheader("CHO durante allenamento")
+        cho_per_hour = st.slider(
+            "Quanti g di CHO/ora vuoi assumere durante l'allenamento?",
+            min_value=20,
+            max_value=120,
+            step=5,
+            key="cho_per_hour"
+        )
 
-meals = meal_pattern(training_time if training_type != "Nessun allenamento / Riposo" else "Nessun allenamento / Non specificato")
+    # Piani già calcolati (da questa o da altre sessioni) vengono dalla cache
+    profiling.section("plan_day")
+    plan = get_plan_cache().plan_day(profile, replace(training, cho_per_hour=cho_per_hour))
+    st.session_state["last_plan"] = plan  # per "Salva profilo e piano" nella barra laterale
 
-st.markdown(f"**CHO totali giorno**: {total_cho_g:.0f} g")
-st.markdown(f"**CHO durante allenamento**: {cho_during_total:.0f} g")
-st.markdown(f"**CHO fuori allenamento**: {cho_outside:.0f} g")
+    profiling.section("render: 4. pasti e suggerimenti")
+    show_meals(plan)
 
-# Distribuzione CHO per pasto
-meal_rows = []
-for name, perc in meals:
-    cho_meal = cho_outside * perc
-    meal_rows.append((name, perc, cho_meal))
+    meal_alternatives(plan)
 
-# Distribuzione PRO e FAT tra i pasti
-pro_per_meal, fat_allocation = split_protein_fat_across_meals(total_pro_g, total_fat_g, meals)
+    hydration_section(plan)
 
-# Mostra tabella riassuntiva
+    profiling.section("render: 5. riepilogo")
+    show_summary(plan)
 
-st.subheader("Piano giornaliero per pasti")
 
-# Orari consigliati per i pasti
-meal_times = meal_times_suggestion(
-    training_time if training_type != "Nessun allenamento / Riposo" else "Nessun allenamento / Non specificato"
-)
+def show_meals(plan):
+    training = plan.training
+    if training.has_session:
+        st.markdown(
+            f"- Durata allenamento: **{training.duration_hours:.2f} h**  \n"
+            f"- CHO durante: **{plan.cho_during_total:.0f} g** "
+            f"({training.cho_per_hour} g/h)"
+        )
+
+    st.subheader("Distribuzione CHO fuori allenamento")
 
-st.markdown(
-    "| Pasto | Orario consigliato | % CHO_fuori | CHO (g) | PRO (g) | FAT (g) |\n"
-    "|-------|--------------------|------------:|--------:|--------:|--------:|\n"
-)
-for i, (name, perc, cho_meal) in enumerate(meal_rows):
-    fat_meal = fat_allocation[i]
-    time_str = meal_times.get(name, "")
     st.markdown(
-        f"| {name} | {time_str} | {perc*100:.0f}% | {cho_meal:.0f} | {pro_per_meal:.0f} | {fat_meal:.0f} |"
+        f"**CHO totali giorno**: {plan.total_cho_g:.0f} g  \n"
+        f"**CHO durante allenamento**: {plan.cho_during_total:.0f} g  \n"
+        f"**CHO fuori allenamento**: {plan.cho_outside:.0f} g"
     )
 
-# -------------------------
-# SUGGERIMENTI DI PASTI (PIATTO UNICO)
-# -------------------------
-st.subheader("Suggerimenti di pasti (piatto unico)")
+    st.subheader("Piano giornaliero per pasti")
 
-for i, (name, perc, cho_meal) in enumerate(meal_rows):
-    fat_meal = fat_allocation[i]
-    pro_meal = pro_per_meal  # proteine distribuite uniformemente tra i pasti
-
-    st.markdown(f"**{name}**")
-
-    # Genera piatto unico per questo pasto
-    portions, (m_cho, m_pro, m_fat) = suggest_meal(
-        name,
-        cho_meal,
-        pro_meal,
-        fat_meal,
-        training_time
+    # Una sola tabella markdown (intestazione e righe nello stesso elemento)
+    st.markdown(
+        "| Pasto | Orario consigliato | % CHO_fuori | CHO (g) | PRO (g) | FAT (g) |\n"
+        "|-------|--------------------|------------:|--------:|--------:|--------:|\n"
+        + "\n".join(
+            f"| {meal.name} | {meal.time} | {meal.perc*100:.0f}% | {meal.cho:.0f} | {meal.pro:.0f} | {meal.fat:.0f} |"
+            for meal in plan.meals
+        )
     )
 
-    # Elenco alimenti con grammi
+    # -------------------------
+    # SUGGERIMENTI DI PASTI (PIATTO UNICO)
+    # -------------------------
+    st.subheader("Suggerimenti di pasti (piatto unico)")
+
+    # Tutti i pasti in un unico blocco markdown: un elemento per rerun
+    blocks = []
+    for meal in plan.meals:
+        m_cho, m_pro, m_fat = meal.macros
+        foods_str = "\n".join(f"- {grams:.0f} g di {food}" for food, grams in meal.portions.items())
+        blocks.append(
+            f"**{meal.name}**\n\n"
+            f"{foods_str}\n\n"
+            f"_Macro stimati per questo pasto_: "
+            f"**{m_cho:.0f} g CHO**, **{m_pro:.0f} g PRO**, **{m_fat:.0f} g FAT** "
+            f"(target teorico: {meal.cho:.0f} CHO / {meal.pro:.0f} PRO / {meal.fat:.0f} FAT)"
+        )
+    st.markdown("\n\n---\n\n".join(blocks) + "\n\n---")
+
+
+@st.fragment
+def meal_alternatives(plan):
+    """Le k combinazioni di alimenti più vicine ai target di un pasto."""
+    profiling.section("ui: 4. alternative")
+    st.subheader("Alternative per pasto")
+
+    meals = {meal.name: meal for meal in plan.meals}
+    meal_name = st.selectbox("Pasto", list(meals), key="alternatives_meal")
+    k = st.slider("Numero di alternative", min_value=1, max_value=10, value=5, key="alternatives_k")
+    meal = meals.get(meal_name, plan.meals[0])
+
+    profiling.section("alternative_meals")
+    options = alternative_meals(meal.name, meal.cho, meal.pro, meal.fat, k=k)
+
+    profiling.section("render: 4. alternative")
+    if not options:
+        st.info("Nessuna combinazione di alimenti disponibile per questo pasto.")
+        return
     lines = []
-    for food, grams in portions.items():
-        lines.append(f"- {grams:.0f} g di {food}")
-    foods_str = "\n".join(lines)
-
-    st.markdown(foods_str)
+    for rank, option in enumerate(options, 1):
+        foods = ", ".join(f"{grams:.0f} g di {food}" for food, grams in option.portions.items())
+        o_cho, o_pro, o_fat = option.macros
+        lines.append(f"{rank}. {foods} — {o_cho:.0f} CHO / {o_pro:.0f} PRO / {o_fat:.0f} FAT")
     st.markdown(
-        f"_Macro stimati per questo pasto_: "
-        f"**{m_cho:.0f} g CHO**, **{m_pro:.0f} g PRO**, **{m_fat:.0f} g FAT** "
-        f"(target teorico: {cho_meal:.0f} CHO / {pro_meal:.0f} PRO / {fat_meal:.0f} FAT)"
+        f"Target di **{meal.name}**: {meal.cho:.0f} g CHO, {meal.pro:.0f} g PRO, {meal.fat:.0f} g FAT\n\n"
+        + "\n".join(lines)
     )
-    st.markdown("---")
+
+
 # -------------------------
 # SEZIONE 4B – IDRATAZIONE & SALI
 # -------------------------
-st.header("4B. Idratazione ed elettroliti (opzionale)")
+@st.fragment
+def hydration_section(plan):
+    """Temperatura e sudorazione rieseguono solo questo frammento (nessun pasto)."""
+    profiling.section("ui: 4B. input idratazione")
+    st.header("4B. Idratazione ed elettroliti (opzionale)")
+
+    training = plan.training
+    if not training.has_session:
+        st.markdown("Nessun allenamento previsto: nessuna raccomandazione specifica su idratazione/sodio.")
+        plan_downloads(plan)
+        return
 
-if training_type == "Nessun allenamento / Riposo" or total_duration_hours <= 0:
-    st.markdown("Nessun allenamento previsto: nessuna raccomandazione specifica su idratazione/sodio.")
-else:
     st.subheader("Parametri ambientali e personali")
 
     temp_condition = st.selectbox(
         "Condizioni di temperatura",
-        ["Freddo", "Temperato", "Caldo", "Molto caldo"],
-        index=1
+        TEMP_CONDITIONS,
+        key="temp_condition"
     )
 
     sweat_rate = st.selectbox(
         "Quanto sudi in genere?",
-        ["Bassa", "Media", "Alta"],
-        index=1
+        SWEAT_RATES,
+        key="sweat_rate"
     )
 
-    l_per_hour = hydration_rate(temp_condition, sweat_rate)
-    total_liters = l_per_hour * total_duration_hours
-
-    na_mg_per_hour = sodium_rate(sweat_rate)
-    total_na_mg = na_mg_per_hour * total_duration_hours
-
-    # Traduzione pratica in borracce da 500 ml e compresse da 300 mg
-    bottle_size_l = 0.5
-    bottles = total_liters / bottle_size_l
-
-    pill_na_mg = 300
-    pills = total_na_mg / pill_na_mg
-
+    profiling.section("render: 4B. idratazione")
+    training = replace(training, temp_condition=temp_condition, sweat_rate=sweat_rate)
+    hydration = plan_hydration(training)
     st.markdown(
-        f"- Durata allenamento: **{total_duration_hours:.2f} h**  \n"
-        f"- Acqua consigliata: **{l_per_hour:.2f} L/h**, totale **{total_liters:.2f} L**.  \n"
-        f"- Sodio consigliato: **{na_mg_per_hour:.0f} mg/h**, totale **{total_na_mg:.0f} mg**."
+        f"- Durata allenamento: **{training.duration_hours:.2f} h**  \n"
+        f"- Acqua consigliata: **{hydration.l_per_hour:.2f} L/h**, totale **{hydration.total_liters:.2f} L**.  \n"
+        f"- Sodio consigliato: **{hydration.na_mg_per_hour:.0f} mg/h**, totale **{hydration.total_na_mg:.0f} mg**."
     )
 
     st.markdown(
-        f"In pratica, per questa seduta equivale circa a **{bottles:.1f} borracce** da 500 ml "
-        f"e **{pills:.1f} compresse** da {pill_na_mg} mg di sodio."
+        f"In pratica, per questa seduta equivale circa a **{hydration.bottles:.1f} borracce** da 500 ml "
+        f"e **{hydration.pills:.1f} compresse** da {PILL_NA_MG} mg di sodio."
     )
 
+    if st.session_state.get("uncertainty"):
+        profiling.section("uncertainty: 4B")
+        bands = hydration_bands(training)
+        st.markdown(bands_table([
+            ("Acqua (L/h)", bands.l_per_hour, 2),
+            ("Acqua totale (L)", bands.total_liters, 2),
+            ("Sodio (mg/h)", bands.na_mg_per_hour, 0),
+            ("Sodio totale (mg)", bands.total_na_mg, 0),
+        ]))
+        st.caption("Sudorazione e concentrazione di sodio nel sudore variano molto da persona a persona.")
+
+    with st.expander("Timeline dei rifornimenti"):
+        profiling.section("render: 4B. timeline")
+        labels = {"borraccia": "Inizia la borraccia", "gel": "Gel", "sodio": "Compressa di sodio"}
+        rows = "\n".join(
+            f"| {int(intake.minute) // 60}:{int(intake.minute) % 60:02d} | {labels[intake.kind]} {intake.number} "
+            f"| {intake.amount:.0f} {intake.unit} |"
+            for intake in fueling_timeline(training)
+        )
+        st.markdown("| Tempo (h:mm) | Assunzione | Quantità |\n|---|---|---:|\n" + rows)
+        st.caption(
+            f"Gel da {GEL_CHO_G:.0f} g di CHO ({training.cho_per_hour} g/h), borracce da "
+            f"{BOTTLE_SIZE_L * 1000:.0f} ml, compresse da {PILL_NA_MG} mg di sodio."
+        )
+
     st.info(
         "Questi sono valori indicativi: adatta sempre idratazione e sali alle tue sensazioni, "
         "alla frequenza urinaria, al peso pre/post allenamento e a eventuali consigli medici."
     )
+
+    # Il piano mostrato (CHO/ora, temperatura e sudorazione scelti) è quello che si salva
+    plan = replace(plan, training=training, hydration=hydration)
+    st.session_state["last_plan"] = plan
+    plan_downloads(plan)
+
+
+def plan_downloads(plan):
+    """Download del piano mostrato per la data del registro: CSV, calendario, report stampabile."""
+    profiling.section("export")
+    day = st.session_state.get("plan_date") or date.today()
+    name = st.session_state.get("athlete_name", "").strip() or None
+    entries = [(name, day, plan)]
+    files = {}
+    for fmt, writer in (("csv", write_csv), ("ics", write_ics), ("html", write_html)):
+        out = io.StringIO(newline="")
+        writer(entries, out)
+        files[fmt] = out.getvalue()
+
+    st.subheader("Esporta il piano")
+    stem = f"piano_{day:%Y%m%d}"
+    columns = st.columns(3)
+    columns[0].download_button("CSV (pasti e porzioni)", data=files["csv"], file_name=f"{stem}.csv", mime="text/csv")
+    columns[1].download_button("Calendario (.ics)", data=files["ics"], file_name=f"{stem}.ics", mime="text/calendar")
+    columns[2].download_button("Report (HTML)", data=files["html"], file_name=f"{stem}.html", mime="text/html")
+    st.caption("Il report si stampa o si salva in PDF dal browser (una pagina A4 per piano).")
+
+
 # -------------------------
 # RIEPILOGO FINALE
 # -------------------------
-st.header("5. Riepilogo in linguaggio umano")
+def show_summary(plan):
+    profile, training = plan.profile, plan.training
+    training_type = training.training_type
+    cho_per_hour = training.cho_per_hour
+    st.header("5. Riepilogo in linguaggio umano")
 
-st.markdown(
-    f"- Oggi: **{sex}**, {age} anni, {weight:.1f} kg, {height:.0f} cm.  \n"
-    f"- Allenamento: **{training_type}**, durata **{total_duration_hours:.2f} h**, "
-    f"importanza **{session_importance}**, orario **{training_time}**.  \n"
-    f"- Obiettivo: **{weight_goal}**."
-)
+    st.markdown(
+        f"- Oggi: **{profile.sex}**, {profile.age} anni, {profile.weight:.1f} kg, {profile.height:.0f} cm.  \n"
+        f"- Allenamento: **{training_type}**, durata **{training.duration_hours:.2f} h**, "
+        f"importanza **{training.session_importance}**, orario **{training.training_time}**.  \n"
+        f"- Obiettivo: **{profile.goal}**."
+    )
 
-st.markdown(
-    f"- Kcal target del giorno (stima): **{target_kcal:.0f} kcal**.  \n"
-    f"- Macro teorici: **{total_cho_g:.0f} g CHO**, **{total_pro_g:.0f} g PRO**, "
-    f"**{total_fat_g:.0f} g FAT**."
-)
+    st.markdown(
+        f"- Kcal target del giorno (stima): **{plan.target_kcal:.0f} kcal**.  \n"
+        f"- Macro teorici: **{plan.total_cho_g:.0f} g CHO**, **{plan.total_pro_g:.0f} g PRO**, "
+        f"**{plan.total_fat_g:.0f} g FAT**."
+    )
+
+    if plan.cho_during_total > 0:
+        st.markdown(
+            f"- Durante l'allenamento: **{cho_per_hour} g/h** di CHO per **{training.duration_hours:.2f} h**, "
+            f"totale **{plan.cho_during_total:.0f} g**."
+        )
+    else:
+        st.markdown("- Nessun CHO specifico durante l'allenamento previsto oggi.")
 
-if cho_during_total > 0:
     st.markdown(
-        f"- Durante l'allenamento: **{cho_per_hour} g/h** di CHO per **{total_duration_hours:.2f} h**, "
-        f"totale **{cho_during_total:.0f} g**."
+        "Il resto dei carboidrati è distribuito sui pasti in modo da privilegiare quelli a ridosso dell'allenamento, "
+        "mantenendo comunque un apporto sufficiente negli altri momenti della giornata."
     )
-else:
-    st.markdown("- Nessun CHO specifico durante l'allenamento previsto oggi.")
 
-st.markdown(
-    "Il resto dei carboidrati è distribuito sui pasti in modo da privilegiare quelli a ridosso dell'allenamento, "
-    "mantenendo comunque un apporto sufficiente negli altri momenti della giornata."
-)
+    # Suggerimento/coaching
+    if training_type != REST_DAY and cho_per_hour if training_type != REST_DAY else 0 < 40:
+        st.info(
+            "Nota: per sedute endurance moderate o lunghe, 20–30 g/h possono essere pochi. "
+            "Se percepisci cali di energia o recupero lento, valuta di provare 40–60 g/h."
+        )
+
+    st.write("---")
+    st.caption(
+        "Questa app fornisce stime generali basate su linee guida. "
+        "Adatta sempre i numeri alle tue sensazioni, digestione, storia clinica e indicazioni del tuo medico/nutrizionista."
+    )
 
-# Suggerimento/coaching
-if training_type != "Nessun allenamento / Riposo" and cho_per_hour if training_type != "Nessun allenamento / Riposo" else 0 < 40:
-    st.info(
-        "Nota: per sedute endurance moderate o lunghe, 20–30 g/h possono essere pochi. "
-        "Se percepisci cali di energia o recupero lento, valuta di provare 40–60 g/h."
+
+# -------------------------
+# BARRA LATERALE – REGISTRO ATLETI
+# -------------------------
+def load_athlete(athlete):
+    """Callback: riempie i widget delle sezioni 1–2 prima del rerun."""
+    profile, training = athlete.profile, athlete.training
+    hours = min(int(training.duration_hours), 6)
+    minutes = min(round((training.duration_hours - hours) * 60), 59)
+    st.session_state.update(
+        age=profile.age,
+        sex=profile.sex,
+        weight=float(profile.weight),
+        height=float(profile.height),
+        activity_level=profile.activity_level,
+        goal=profile.goal,
+        training_type=training.training_type,
+        session_importance=training.session_importance,
+        duration_hours=hours,
+        duration_minutes=minutes,
+        athlete_name=athlete.name,
     )
+    # Parametri delle sezioni 4/4B, se salvati con una seduta
+    if training.cho_per_hour:
+        st.session_state["cho_per_hour"] = min(max(int(round(training.cho_per_hour / 5) * 5), 20), 120)
+    if training.temp_condition in TEMP_CONDITIONS:
+        st.session_state["temp_condition"] = training.temp_condition
+    if training.sweat_rate in SWEAT_RATES:
+        st.session_state["sweat_rate"] = training.sweat_rate
+    time_key = "training_time" if training.training_type != REST_DAY else "training_time_rest"
+    st.session_state[time_key] = training.training_time
+
+
+def save_athlete(profile, training):
+    """
+    Callback: salva profilo, allenamento e piano mostrato per la data scelta.
+    L'allenamento è quello del piano mostrato (CHO/ora, temperatura e
+    sudorazione delle sezioni 4/4B), non quello degli input della sezione 2.
+    """
+    name = st.session_state.get("athlete_name", "").strip()
+    if not name:
+        return
+    plan = st.session_state.get("last_plan")
+    if plan is not None:
+        training = plan.training
+    store = get_store()
+    # Stesso nome di un atleta già salvato (anche importato da file): stesso id
+    athlete_id = next((a.athlete_id for a in store.athletes() if a.name == name), name)
+    store.upsert_athletes([Athlete(athlete_id, name, profile, training)])
+    plan_date = st.session_state["plan_date"]
+    if plan is not None:
+        store.save_plans([(athlete_id, plan_date, plan)])
+    st.session_state["registry_message"] = f"Salvati profilo e piano del {plan_date:%d/%m/%Y} per {name}."
+
+
+@st.fragment
+def athlete_registry(profile, training):
+    st.header("Atleti")
+    store = get_store()
+    athletes = store.athletes()
+    if athletes:
+        chosen = st.selectbox("Atleta salvato", athletes, format_func=lambda a: a.name, key="athlete_choice")
+        # Il callback scrive i widget; il rerun completo ricalcola la pagina
+        if st.button("Carica nelle sezioni 1–2", on_click=load_athlete, args=(chosen,)):
+            st.rerun()
+    else:
+        st.caption("Nessun atleta salvato.")
+
+    st.text_input("Nome atleta", key="athlete_name")
+    st.date_input("Data del piano", key="plan_date", format="DD/MM/YYYY")
+    st.button("Salva profilo e piano", on_click=save_athlete, args=(profile, training))
+    message = st.session_state.pop("registry_message", None)
+    if message:
+        st.success(message)
+
+
+# -------------------------
+# BARRA LATERALE – RICERCA ALIMENTI E SOSTITUZIONI
+# -------------------------
+@st.fragment
+def food_search():
+    st.header("Cerca alimento")
+    food_query = st.text_input("Nome (anche parziale o con errori)", key="food_query")
+    if food_query:
+        food_table = get_food_table()
+        found_ids = get_food_index().search(food_query, limit=10)
+        if not found_ids:
+            st.caption("Nessun alimento trovato.")
+        else:
+            found_names = [food_table.names[i] for i in found_ids]
+            chosen_food = st.selectbox("Risultati", found_names, key="food_choice")
+            cho, pro, fat = food_table.macros[food_table.id_of(chosen_food)].tolist()
+            st.markdown(f"Per 100 g: **{cho:.1f} g CHO**, **{pro:.1f} g PRO**, **{fat:.1f} g FAT**")
+            st.markdown("**Sostituti con macro simili:**")
+            st.markdown("\n".join(
+                f"- {name} (distanza {dist:.1f})" for name, dist in substitutes(chosen_food, limit=5)
+            ))
+
+
+# -------------------------
+# VISTA ALLENATORE – ROSA
+# -------------------------
+@st.fragment
+def roster_dashboard():
+    """Target del giorno di tutta la rosa; solo la pagina mostrata diventa una tabella."""
+    st.header("Rosa: target del giorno")
+    profiling.section("roster_targets")
+    roster = roster_targets(get_store().athletes())
+    if not len(roster):
+        st.info("Nessun atleta nel registro: salvane uno dalla vista atleta o importa una squadra.")
+        return
+
+    profiling.section("ui: rosa")
+    labels = dict(ROSTER_COLUMNS)
+    col1, col2, col3, col4 = st.columns([3, 3, 2, 1])
+    search = col1.text_input("Cerca atleta", key="roster_search")
+    types = col2.multiselect(
+        "Allenamento", sorted(set(roster.training_type.tolist())), key="roster_types",
+    )
+    sort_by = col3.selectbox("Ordina per", list(labels), format_func=labels.get, key="roster_sort")
+    descending = col4.toggle("Decresc.", key="roster_desc")
+
+    profiling.section("query_roster")
+    result = query_roster(roster, search, types, sort_by, descending, page=st.session_state.get("roster_page", 1) - 1)
+    # Un filtro più stretto può lasciare la pagina scelta oltre l'ultima
+    st.session_state["roster_page"] = result.page + 1
+
+    profiling.section("render: rosa")
+    st.markdown(
+        "| " + " | ".join(labels.values()) + " |\n"
+        "|---|---|---:|---:|---:|---:|---:|---:|\n"
+        + "\n".join(
+            f"| {roster.name[i]} | {roster.training_type[i]} | {roster.target_kcal[i]:.0f} "
+            f"| {roster.cho_g[i]:.0f} | {roster.pro_g[i]:.0f} | {roster.fat_g[i]:.0f} "
+            f"| {roster.cho_during_g[i]:.0f} | {roster.fluid_l[i]:.2f} |"
+            for i in result.rows
+        )
+    )
+    st.number_input(f"Pagina (di {result.pages})", min_value=1, max_value=result.pages, step=1, key="roster_page")
+    st.caption(f"{result.total} atleti su {len(roster)}, {DEFAULT_PAGE_SIZE} per pagina.")
+
+    detail = st.selectbox(
+        "Apri i pasti di",
+        [None] + result.rows.tolist(),
+        format_func=lambda i: "—" if i is None else roster.athletes[i].name,
+        key="roster_detail",
+    )
+    if detail is not None:
+        athlete = roster.athletes[detail]
+        profiling.section("plan_day")
+        show_meals(get_plan_cache().plan_day(athlete.profile, athlete.training))
+
+
+# -------------------------
+# PAGINA
+# -------------------------
+if st.toggle("Vista allenatore (rosa del registro)", key="coach_view"):
+    roster_dashboard()
+    with st.sidebar:
+        food_search()
+else:
+    col1, col2 = st.columns(2)
+
+    profiling.section("ui: 1. profilo atleta")
+    with col1:
+        profile = profile_inputs()
+        profile_out = st.container()
+
+    profiling.section("ui: 2. allenamento")
+    with col2:
+        training = training_inputs()
+        training_out = st.container()
 
-st.write("---")
-st.caption(
-    "Questa app fornisce stime generali basate su linee guida. "
-    "Adatta sempre i numeri alle tue sensazioni, digestione, storia clinica e indicazioni del tuo medico/nutrizionista."
-)
\ No newline at end of file
+    profiling.section("plan_energy")
+    energy = plan_energy(profile, training)
+
+    profiling.section("render: 1–3 energia e macro")
+    with profile_out:
+        st.markdown(f"**BMR stimato**: {energy.bmr:.0f} kcal")
+        st.markdown(f"**TDEE base (senza allenamento)**: {energy.base_tdee:.0f} kcal")
+
+    with training_out:
+        st.markdown(f"**Stima costo energetico allenamento**: {energy.training_kcal:.0f} kcal")
+
+    show_energy(energy)
+    show_uncertainty(profile, training)
+
+    cho_section(profile, training)
+
+    profiling.section("render: barra laterale")
+    with st.sidebar:
+        athlete_registry(profile, training)
+        food_search()
+
+# -------------------------
+# PANNELLO DI DEBUG – TEMPI DEL RERUN
+# -------------------------
+with st.sidebar:
+    st.checkbox("Profilazione (tempi del rerun)", value=profiling.enabled_by_env(), key="profiling")
+    if trace is not None:
+        trace.stop()
+        with st.expander("Tempi dell'ultimo rerun", expanded=True):
+            rows = [
+                f"| {'&nbsp;' * 4 * depth}{name} | {ms:.2f} | {share:.0%} |"
+                for name, depth, ms, share in trace.breakdown()
+            ]
+            st.markdown(
+                "| Fase | ms | % |\n|------|---:|--:|\n" + "\n".join(rows)
+                + f"\n| **Totale** | **{trace.total_ms:.2f}** | |"
+            )
+            st.download_button(
+                "Scarica trace Chrome (JSON)",
+                data=json.dumps(trace.to_chrome()),
+                file_name="nutrition_trace.json",
+                mime="application/json",
+            )
+        with st.expander("Cache dei piani", expanded=True):
+            cache = get_plan_cache()
+            cache_stats = cache.stats()
+            rows = [
+                f"| {label} | {stats.memory_hits} | {stats.disk_hits} | {stats.misses} | {stats.hit_rate:.0%} |"
+                for label, stats in (("Piani", cache_stats["plan"]), ("Pasti", cache_stats["meal"]))
+            ]
+            st.markdown(
+                "| Voce | Hit memoria | Hit SQLite | Miss | Hit rate |\n|------|---:|---:|---:|---:|\n"
+                + "\n".join(rows)
+            )
+            st.caption(
+                f"{len(cache.memory)} voci in memoria"
+                + (f", {len(cache.disk)} in SQLite" if cache.disk is not None else " (SQLite non attivo)")
+                + f", {cache.evictions} rimosse, {cache.errors} errori."
+            )